@@ -1,4 +1,8 @@
+import argparse
+import datetime
+import heapq
 import random
+import time
 
 # ==========================================
 # CENTRAL CONFIGURATION
@@ -23,14 +27,17 @@ STATIC_SETTINGS = {
     "speed_ramp": 100.0,  
 }
 
-def generate_config():
+# CHANGED: Your requested list of durations
+DURATION_CHOICES = [30, 31, 32, 34]
+
+def generate_config(duration=None):
     """
     Generates a dictionary of unique parameters for the game.
+    duration picks the game length instead of a random one of DURATION_CHOICES.
     """
     seed = random.randint(0, 999999)
     
-    # CHANGED: Your requested list of durations
-    requested_duration = random.choice([30, 31, 32, 34])
+    requested_duration = duration or random.choice(DURATION_CHOICES)
     
     # Enforce the hard cap
     final_duration = min(requested_duration, STATIC_SETTINGS['max_duration'])
@@ -57,5 +64,110 @@ def generate_config():
     
     return config
 
+# ==========================================
+# BATCH PLANNING
+# ==========================================
+def _costed(config, model, highlight_seconds):
+    import cost_model
+    work = cost_model.render_work(config, highlight_seconds)
+    return {"config": config, "work": work, "predicted": model.predict(work, config.get("profile", "standard"))}
+
+def _pack(batch, slots, start):
+    """
+    Longest-first onto whichever slot frees up first (LPT). Sets each entry's
+    slot / start / finish and returns the batch in that order.
+    """
+    batch = sorted(batch, key=lambda b: b["predicted"]["render_seconds"], reverse=True)
+    free = [(start, slot) for slot in range(slots)]
+    heapq.heapify(free)
+    for entry in batch:
+        at, slot = heapq.heappop(free)
+        entry["slot"] = slot
+        entry["start"] = at
+        entry["finish"] = at + entry["predicted"]["render_seconds"]
+        heapq.heappush(free, (entry["finish"], slot))
+    return batch
+
+def plan_batch(count, deadline, slots=1, start=None, model=None, highlight_seconds=None):
+    """
+    Generates `count` configs and packs them onto `slots` render workers so
+    the batch finishes as early as possible, using the render cost model
+    (cost_model.CostModel) to predict each render.
+
+    If the plan finishes after `deadline` (a timestamp), the costliest
+    games are made shorter, one DURATION_CHOICES step at a time, until it
+    fits or none can be shortened further.
+
+    Returns a dict with
+      - jobs: entries with config, predicted cost, slot, start and finish,
+        longest first (queue them in this order: workers take the oldest
+        job, which is how the plan was packed)
+      - finish: when the last render is predicted to finish
+      - feasible: whether that is by the deadline
+    """
+    import cost_model
+    model = model or cost_model.CostModel()
+    start = start or time.time()
+    batch = [_costed(generate_config(), model, highlight_seconds) for _ in range(count)]
+    plan = _pack(batch, slots, start)
+    while plan and plan_finish(plan) > deadline:
+        shorter = [b for b in plan if b["config"]["duration"] > min(DURATION_CHOICES)]
+        if not shorter:
+            break
+        entry = max(shorter, key=lambda b: b["predicted"]["render_seconds"])
+        config = dict(entry["config"])
+        config["duration"] = max(d for d in DURATION_CHOICES if d < config["duration"])
+        entry.update(_costed(config, model, highlight_seconds))
+        plan = _pack(plan, slots, start)
+    finish = plan_finish(plan) if plan else start
+    return {"jobs": plan, "finish": finish, "feasible": finish <= deadline}
+
+def plan_finish(plan):
+    return max(b["finish"] for b in plan)
+
+def parse_deadline(text, now=None):
+    """A deadline as "HH:MM" (the next time the clock shows it) or an ISO date-time. Returns a timestamp."""
+    now = datetime.datetime.fromtimestamp(now or time.time())
+    try:
+        clock = datetime.datetime.strptime(text, "%H:%M").time()
+    except ValueError:
+        return datetime.datetime.fromisoformat(text).timestamp()
+    deadline = datetime.datetime.combine(now.date(), clock)
+    if deadline <= now:
+        deadline += datetime.timedelta(days=1)
+    return deadline.timestamp()
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a game config, or plan a batch of renders.")
+    parser.add_argument("--batch", type=int, default=None, help="Plan this many renders instead")
+    parser.add_argument("--deadline", default=None, help='When the batch must be done: "06:00" or an ISO date-time')
+    parser.add_argument("--slots", type=int, default=1, help="Render workers available (worker processes on this host)")
+    parser.add_argument("--highlight-seconds", type=float, default=None)
+    parser.add_argument("--enqueue", action="store_true", help="Queue the planned renders as generate_and_upload jobs")
+    args = parser.parse_args()
+    if args.batch is None:
+        print(generate_config())
+        return
+
+    now = time.time()
+    deadline = parse_deadline(args.deadline, now) if args.deadline else float("inf")
+    plan = plan_batch(args.batch, deadline, args.slots, now, highlight_seconds=args.highlight_seconds)
+    def clock(ts):
+        return datetime.datetime.fromtimestamp(ts).strftime("%H:%M:%S")
+    print(f"{'slot':>4} {'start':>8} {'finish':>8} {'dur':>4} {'render s':>9} {'MB':>6}  seed")
+    for b in plan["jobs"]:
+        print(f"{b['slot']:>4} {clock(b['start']):>8} {clock(b['finish']):>8} {b['config']['duration']:>4} "
+              f"{b['predicted']['render_seconds']:>9.1f} {b['predicted']['output_bytes'] / 2**20:>6.1f}  "
+              f"{b['config']['seed']}")
+    status = "meets" if plan["feasible"] else "MISSES"
+    print(f"{len(plan['jobs'])} renders on {args.slots} slots finish at {clock(plan['finish'])}"
+          + (f"; {status} the deadline {clock(deadline)}" if args.deadline else ""))
+    if args.enqueue:
+        import jobs
+        queue = jobs.JobQueue()
+        for b in plan["jobs"]:
+            queue.enqueue("generate_and_upload", {"config": b["config"], "highlight_seconds": args.highlight_seconds})
+        print(f"Queued {len(plan['jobs'])} jobs in {queue.path}")
+
 if __name__ == "__main__":
-    print(generate_config())
\ No newline at end of file
+    main()
\ No newline at end of file
@@ -0,0 +1,219 @@
+# cost_model.py
+# Predicts what a render costs (wall time, render-loop CPU, video size) from measured renders.
+#
+# The work a render does is found by simulating its game without drawing
+# (render_work, a few milliseconds): frames drawn and encoded, their
+# megapixels and the particles drawn across them. Workers record every
+# finished render next to the job queue (CostModel.record), and the model
+# is refitted from the most recent ones by least squares, separately for
+# each encoder profile that has enough renders of its own.
+
+import logging
+import sqlite3
+import time
+
+import jobs
+
+logger = logging.getLogger("app.cost")
+
+# Renders the model is fitted on (the most recent ones), and how many it needs before it trusts them
+FIT_WINDOW = 200
+MIN_SAMPLES = 5
+
+# Used until enough renders have been measured; from runs of the "standard"
+# profile at 240x426 .. 720x1280 on one core of a small instance.
+DEFAULT_COEFFICIENTS = {
+    # busy seconds = per_megapixel_frame * MP-frames + per_kiloparticle_frame * k-particle-frames + fixed
+    # (it includes waiting on the encoder, so it depends on the profile like the rest)
+    "busy": {"standard": {"per_megapixel_frame": 0.0095, "per_kiloparticle_frame": 0.02, "fixed": 0.3}},
+    # wall seconds = max(real time, busy) + overhead (setup, soundtrack, encoder flush, mux)
+    "overhead": {"standard": 0.5},
+    # output bytes = per_megapixel_frame * MP-frames + per_frame * frames
+    "bytes": {"standard": {"per_megapixel_frame": 5760.0, "per_frame": 2088.0}},
+}
+
+def render_work(config, highlight_seconds=None):
+    """
+    The work run_game(config, highlight_seconds=...) will do, by simulating
+    the game without drawing. Returns a dict of
+      - frames: frames drawn and encoded
+      - megapixel_frames: frames times their size in megapixels
+      - kiloparticle_frames: particles drawn over all frames, in thousands
+      - realtime_seconds: length of the video (the render loop runs no faster)
+    """
+    import pygame
+    import dodger
+    if not pygame.font.get_init():
+        pygame.font.init()
+    dodger.load_config(config)
+    game = dodger.Game(config)
+    particles = []
+    game_over_frame = None
+    while game.running:
+        game.step()
+        particles.append(len(game.particles))
+        if game.game_over and game_over_frame is None:
+            game_over_frame = game.frame_count - 1
+    start = 0
+    if highlight_seconds is not None:
+        start = max(0, game_over_frame - int(highlight_seconds * dodger.FPS))
+    frames = len(particles) - start
+    return {
+        "frames": frames,
+        "megapixel_frames": frames * dodger.WIDTH * dodger.HEIGHT / 1e6,
+        "kiloparticle_frames": sum(particles[start:]) / 1000,
+        "realtime_seconds": frames / dodger.FPS,
+    }
+
+def _least_squares(rows, targets):
+    """
+    Solves rows @ x = targets in the least-squares sense (normal equations,
+    Gaussian elimination). Returns x, or None if the system is singular.
+    """
+    n = len(rows[0])
+    a = [[sum(r[i] * r[j] for r in rows) for j in range(n)] for i in range(n)]
+    b = [sum(r[i] * t for r, t in zip(rows, targets)) for i in range(n)]
+    tolerance = 1e-9 * max(a[i][i] for i in range(n))
+    for col in range(n):
+        pivot = max(range(col, n), key=lambda r: abs(a[r][col]))
+        if abs(a[pivot][col]) <= tolerance:
+            return None
+        a[col], a[pivot] = a[pivot], a[col]
+        b[col], b[pivot] = b[pivot], b[col]
+        for r in range(n):
+            if r != col:
+                f = a[r][col] / a[col][col]
+                a[r] = [x - f * y for x, y in zip(a[r], a[col])]
+                b[r] -= f * b[col]
+    return [b[i] / a[i][i] for i in range(n)]
+
+def _fit_time(rows, busy):
+    """
+    Busy coefficients and overhead fitted on render_costs rows (at least
+    MIN_SAMPLES), starting from the coefficients `busy`.
+    """
+    busy = dict(busy)
+    # Games that time out draw no particles; fit that term only once some did
+    if any(r[3] for r in rows):
+        x = _least_squares([(r[2], r[3], 1.0) for r in rows], [r[5] for r in rows])
+        names = ("per_megapixel_frame", "per_kiloparticle_frame", "fixed")
+    else:
+        x = _least_squares([(r[2], 1.0) for r in rows], [r[5] for r in rows])
+        names = ("per_megapixel_frame", "fixed")
+    if x:
+        busy.update({name: max(0.0, value) for name, value in zip(names, x)})
+    else:
+        # All renders did about the same work (same size and length): scale the defaults to match
+        predicted = sum(busy["per_megapixel_frame"] * r[2] + busy["per_kiloparticle_frame"] * r[3]
+                        + busy["fixed"] for r in rows)
+        ratio = sum(r[5] for r in rows) / predicted
+        busy.update({name: value * ratio for name, value in busy.items()})
+    overheads = sorted(r[6] - max(r[4], r[5]) for r in rows)
+    return busy, max(0.0, overheads[len(overheads) // 2])
+
+class CostModel:
+    """
+    Render costs measured by every worker, kept in the job queue database
+    (like the upload quota ledger), and the model fitted on them.
+    """
+    def __init__(self, path=None):
+        self.path = path or jobs.DB_PATH
+        self.coefficients = None
+        db = self._connect()
+        try:
+            db.execute(
+                "CREATE TABLE IF NOT EXISTS render_costs ("
+                "id INTEGER PRIMARY KEY AUTOINCREMENT, profile TEXT NOT NULL, frames INTEGER NOT NULL, "
+                "megapixel_frames REAL NOT NULL, kiloparticle_frames REAL NOT NULL, "
+                "realtime_seconds REAL NOT NULL, busy_seconds REAL NOT NULL, wall_seconds REAL NOT NULL, "
+                "output_bytes INTEGER NOT NULL, recorded_at REAL NOT NULL)"
+            )
+        finally:
+            db.close()
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def record(self, work, busy_seconds, wall_seconds, output_bytes, profile="standard"):
+        """Stores a finished render: its render_work() and what it actually cost."""
+        db = self._connect()
+        try:
+            db.execute(
+                "INSERT INTO render_costs (profile, frames, megapixel_frames, kiloparticle_frames, "
+                "realtime_seconds, busy_seconds, wall_seconds, output_bytes, recorded_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (profile, work["frames"], work["megapixel_frames"], work["kiloparticle_frames"],
+                 work["realtime_seconds"], busy_seconds, wall_seconds, output_bytes, time.time())
+            )
+        finally:
+            db.close()
+        self.coefficients = None
+
+    def typical_render_seconds(self):
+        """Median wall time of the latest FIT_WINDOW renders, or None before any were recorded."""
+        db = self._connect()
+        try:
+            walls = sorted(r[0] for r in db.execute(
+                "SELECT wall_seconds FROM render_costs ORDER BY id DESC LIMIT ?", (FIT_WINDOW,)
+            ))
+        finally:
+            db.close()
+        return walls[len(walls) // 2] if walls else None
+
+    def fit(self):
+        """Refits the model on the latest FIT_WINDOW renders. Returns the coefficients."""
+        db = self._connect()
+        try:
+            rows = db.execute(
+                "SELECT profile, frames, megapixel_frames, kiloparticle_frames, realtime_seconds, "
+                "busy_seconds, wall_seconds, output_bytes FROM render_costs ORDER BY id DESC LIMIT ?",
+                (FIT_WINDOW,)
+            ).fetchall()
+        finally:
+            db.close()
+        coefficients = {
+            "busy": {p: dict(c) for p, c in DEFAULT_COEFFICIENTS["busy"].items()},
+            "overhead": dict(DEFAULT_COEFFICIENTS["overhead"]),
+            "bytes": {p: dict(c) for p, c in DEFAULT_COEFFICIENTS["bytes"].items()},
+            "samples": len(rows),
+        }
+        if len(rows) >= MIN_SAMPLES:
+            # All profiles together until "standard" has enough renders of its own; profiles
+            # without enough fall back to "standard", as for the output size
+            coefficients["busy"]["standard"], coefficients["overhead"]["standard"] = _fit_time(
+                rows, coefficients["busy"]["standard"])
+        for profile in {r[0] for r in rows}:
+            measured = [r for r in rows if r[0] == profile]
+            if len(measured) >= MIN_SAMPLES:
+                coefficients["busy"][profile], coefficients["overhead"][profile] = _fit_time(
+                    measured, coefficients["busy"]["standard"])
+                x = _least_squares([(r[2], r[1]) for r in measured], [r[7] for r in measured])
+                if x and min(x) >= 0:
+                    coefficients["bytes"][profile] = {"per_megapixel_frame": x[0], "per_frame": x[1]}
+                else:
+                    size = coefficients["bytes"].get(profile, coefficients["bytes"]["standard"])
+                    predicted = sum(size["per_megapixel_frame"] * r[2] + size["per_frame"] * r[1] for r in measured)
+                    ratio = sum(r[7] for r in measured) / predicted
+                    coefficients["bytes"][profile] = {name: value * ratio for name, value in size.items()}
+        self.coefficients = coefficients
+        return coefficients
+
+    def predict(self, work, profile="standard"):
+        """
+        Predicted cost of a render with render_work() `work` and encoder
+        profile `profile`: busy_seconds (render-loop CPU, waiting on the
+        encoder included), render_seconds (wall time) and output_bytes.
+        """
+        c = self.coefficients or self.fit()
+        time_c = c["busy"].get(profile, c["busy"]["standard"])
+        busy = (time_c["per_megapixel_frame"] * work["megapixel_frames"]
+                + time_c["per_kiloparticle_frame"] * work["kiloparticle_frames"]
+                + time_c["fixed"])
+        overhead = c["overhead"].get(profile, c["overhead"]["standard"])
+        size = c["bytes"].get(profile, c["bytes"]["standard"])
+        return {
+            "busy_seconds": round(busy, 2),
+            "render_seconds": round(max(work["realtime_seconds"], busy) + overhead, 2),
+            "output_bytes": int(size["per_megapixel_frame"] * work["megapixel_frames"]
+                                + size["per_frame"] * work["frames"]),
+        }
@@ -9,7 +9,14 @@ import subprocess
 import sys
 import os
 import time
+import io
 import tempfile
+import threading
+import queue
+import contextlib
+import concurrent.futures
+import json
+import gc
 import logging
 from collections import deque
 
@@ -27,6 +34,9 @@ NEON_YELLOW = (255, 220, 0)
 NEON_RED = (255, 50, 50)
 NEON_GREEN = (50, 255, 50)
 NEON_ORANGE = (255, 100, 0)
+CHAT_COLORS = [NEON_CYAN, NEON_MAGENTA, NEON_GREEN, NEON_YELLOW]
+# Index order is part of the replay format (see replay.py)
+MOOD_STATES = ('normal', 'hype', 'scared')
 
 # Check for headless environment
 if os.environ.get("SDL_VIDEODRIVER") == "dummy":
@@ -48,7 +58,197 @@ else:
 # ===========================
 # ASSET GENERATION (Audio)
 # ===========================
-def generate_tone(filename, freq, dur, vol=0.5, type='sine'):
+def wav_bytes(pcm, sr):
+    """Wraps mono 16-bit PCM samples in a WAV header."""
+    return (b'RIFF' + struct.pack('<I', 36 + len(pcm)) +
+            b'WAVEfmt ' + struct.pack('<IHHIIHH', 16, 1, 1, sr, sr * 2, 2, 16) +
+            b'data' + struct.pack('<I', len(pcm)) + bytes(pcm))
+
+def trim_wav(data, seconds):
+    """Returns a copy of a WAV made by wav_bytes that starts `seconds` in."""
+    sr = struct.unpack_from('<I', data, 24)[0]
+    return wav_bytes(data[44 + 2 * int(seconds * sr):], sr)
+
+def load_sound(data):
+    """Builds a mixer Sound straight from in-memory WAV bytes."""
+    return pygame.mixer.Sound(file=io.BytesIO(data))
+
+class FrameFeed:
+    """
+    Streams raw frames into an extra FFmpeg input pipe from a writer thread,
+    for renders that feed FFmpeg more than one frame stream. Put .input on
+    the FFmpeg command line and .pass_fds on the Popen call, then start(),
+    put() per frame and close() before waiting on FFmpeg.
+
+    The queue is unbounded on purpose: FFmpeg may hold one stream back until
+    another catches up (slow presets buffer dozens of frames), so put() must
+    never block the render loop. The backlog stays within the encoder lookahead.
+    """
+    def __init__(self):
+        if os.name == 'nt':
+            raise RuntimeError("Extra frame streams need pipe inheritance, which is not available on Windows")
+        self.read_fd, self.write_fd = os.pipe()
+        self.input = f"pipe:{self.read_fd}"
+        self.pass_fds = (self.read_fd,)
+        self.frames = queue.Queue()
+        self.thread = None
+
+    def start(self):
+        os.close(self.read_fd)
+        self.thread = threading.Thread(target=self._feed, daemon=True)
+        self.thread.start()
+
+    def put(self, frame):
+        self.frames.put(frame)
+
+    def _feed(self):
+        broken = False
+        with os.fdopen(self.write_fd, 'wb') as pipe:
+            while True:
+                frame = self.frames.get()
+                if frame is None: break
+                if broken: continue  # keep draining so put() never blocks
+                try: pipe.write(frame)
+                except (BrokenPipeError, OSError): broken = True
+
+    def close(self):
+        if self.thread:
+            self.frames.put(None)
+            self.thread.join()
+        else:
+            os.close(self.read_fd); os.close(self.write_fd)
+
+class RenderCancelled(Exception):
+    """Raised by run_game when its RenderProgress was cancelled (e.g. by a watchdog)."""
+
+class RenderProgress:
+    """
+    Live progress of one run_game call, safe to read from other threads:
+    frames simulated out of the most the game can run, render speed in
+    frames per second, the encoder speed FFmpeg reports (1.0 = real time)
+    and `busy`, the seconds the render loop spent working rather than
+    waiting for the next frame's turn (what the cost model is fitted on).
+
+    callback (if given) is called from the render loop with snapshot() about
+    every `interval` seconds. cancel() stops the render from another thread:
+    it kills FFmpeg (so a loop blocked on the pipe wakes up) and run_game
+    raises RenderCancelled.
+    """
+    def __init__(self, callback=None, interval=1.0):
+        self.callback = callback
+        self.interval = interval
+        self.stage = "starting"
+        self.frame = 0
+        self.max_frames = None
+        self.fps = 0.0
+        self.encoder_speed = None
+        self.encoder_frame = None
+        self.busy = 0.0
+        self.started = time.monotonic()
+        self.last_advance = self.started
+        self.cancelled = None
+        self.process = None
+        self._window = (self.started, 0)
+        self._reported = 0.0
+        self._read_fd = self._write_fd = None
+
+    def snapshot(self):
+        return {
+            "stage": self.stage,
+            "frame": self.frame,
+            "max_frames": self.max_frames,
+            "fps": round(self.fps, 1),
+            "encoder_speed": self.encoder_speed,
+            "encoder_frame": self.encoder_frame,
+            "busy": round(self.busy, 2),
+            "elapsed": round(time.monotonic() - self.started, 1),
+        }
+
+    def report(self, force=False):
+        now = time.monotonic()
+        if self.callback and (force or now - self._reported >= self.interval):
+            self._reported = now
+            self.callback(self.snapshot())
+
+    def set_stage(self, stage):
+        self.stage = stage
+        self.last_advance = time.monotonic()
+        self.report(force=True)
+
+    def advance(self, frame):
+        """Called by the render loop after each simulated frame."""
+        now = time.monotonic()
+        self.frame = frame
+        self.last_advance = now
+        # FPS over a sliding window of about a second
+        since, first = self._window
+        if now - since >= 1.0:
+            self.fps = (frame - first) / (now - since)
+            self._window = (now, frame)
+        self.report()
+
+    def update(self, snapshot):
+        """Takes over a snapshot() made in another process (see renderer.py) and reports it."""
+        if snapshot["frame"] != self.frame or snapshot["stage"] != self.stage:
+            self.last_advance = time.monotonic()
+        self.stage = snapshot["stage"]
+        self.frame = snapshot["frame"]
+        self.max_frames = snapshot["max_frames"]
+        self.fps = snapshot["fps"]
+        self.encoder_speed = snapshot["encoder_speed"]
+        self.encoder_frame = snapshot["encoder_frame"]
+        self.busy = snapshot["busy"]
+        self.report(force=True)
+
+    def stalled_for(self):
+        """Seconds since the render last made progress (0 outside the frame loop)."""
+        if self.stage != "rendering":
+            return 0.0
+        return time.monotonic() - self.last_advance
+
+    def cancel(self, reason):
+        self.cancelled = reason
+        if self.process and self.process.poll() is None:
+            self.process.kill()
+
+    def encoder_args(self):
+        """
+        FFmpeg options that send its progress report to this object, and the
+        fds to pass to Popen for them. Nothing on Windows (no pipe inheritance).
+        """
+        if os.name == 'nt':
+            return [], ()
+        self._read_fd, self._write_fd = os.pipe()
+        return ["-progress", f"pipe:{self._write_fd}", "-stats_period", "0.5"], (self._write_fd,)
+
+    def watch_encoder(self, process):
+        """Starts reading FFmpeg's progress report once `process` has been started."""
+        self.process = process
+        if self._write_fd is None:
+            return
+        os.close(self._write_fd)
+        threading.Thread(target=self._read_encoder, daemon=True).start()
+
+    def _read_encoder(self):
+        # key=value lines, one block per report; speed looks like "1.23x" (or "N/A")
+        with os.fdopen(self._read_fd, 'r', errors='replace') as pipe:
+            for line in pipe:
+                key, _, value = line.strip().partition('=')
+                if key == 'speed' and value.endswith('x'):
+                    try: self.encoder_speed = float(value[:-1])
+                    except ValueError: pass
+                elif key == 'frame' and value.isdigit():
+                    self.encoder_frame = int(value)
+
+    def close_encoder(self):
+        """Closes the pipe when FFmpeg never started."""
+        for fd in (self._read_fd, self._write_fd):
+            if fd is not None:
+                os.close(fd)
+        self._read_fd = self._write_fd = None
+
+def generate_tone(freq, dur, vol=0.5, type='sine', rng=random):
+    """Synthesizes a short tone. Returns it as WAV bytes."""
     sr = 22050
     frames = int(sr * dur)
     data = bytearray()
@@ -59,18 +259,26 @@ def generate_tone(filename, freq, dur, vol=0.5, type='sine'):
         elif type == 'saw':
             val = 2 * (t * freq - math.floor(t * freq + 0.5))
         elif type == 'noise':
-            val = random.uniform(-1, 1)
+            val = rng.uniform(-1, 1)
         env = 1.0
         if n < 100: env = n/100
         if n > frames - 500: env = (frames-n)/500
         val *= vol * env
         data.extend(struct.pack('<h', int(max(-1, min(1, val)) * 32767)))
-    with open(filename, 'wb') as f:
-        f.write(b'RIFF'); f.write(struct.pack('<I', 36 + len(data)))
-        f.write(b'WAVEfmt '); f.write(struct.pack('<IHHIIHH', 16, 1, 1, sr, sr * 2, 2, 16))
-        f.write(b'data'); f.write(struct.pack('<I', len(data))); f.write(data)
+    return wav_bytes(data, sr)
+
+_sfx_cache = {}
 
-def generate_dynamic_music(path_low, path_high, duration_seconds):
+def get_sfx():
+    """The death and level-up sound effects as WAV bytes, synthesized once per process."""
+    if not _sfx_cache:
+        # Neither tone draws on the rng, so they are the same for every game
+        _sfx_cache['death'] = generate_tone(150, 0.5, type='saw')
+        _sfx_cache['level'] = generate_tone(600, 0.3, type='sine')
+    return _sfx_cache['death'], _sfx_cache['level']
+
+def generate_dynamic_music(duration_seconds, rng=random):
+    """Synthesizes the low and high intensity music layers. Returns (low, high) WAV bytes."""
     sr = 44100
     bpm = 140
     # Generate enough music for the video plus a buffer
@@ -93,35 +301,243 @@ def generate_dynamic_music(path_low, path_high, duration_seconds):
         bass *= 0.5 * (1.0 - beat_pos*0.5)
         lead = 0.0
         hat = 0.0
-        if (n % (beat_samples//2)) < 1000: hat = random.uniform(-0.1, 0.1)
+        if (n % (beat_samples//2)) < 1000: hat = rng.uniform(-0.1, 0.1)
         arp_note = root * (2 if (int(t * 8) % 2) else 1)
         lead = 0.15 * math.sin(2 * math.pi * arp_note * t)
         sample_low = (kick * 0.9 + bass * 0.8) * 0.4
         sample_high = (kick * 0.8 + bass * 0.6 + lead + hat) * 0.4
         data_low.extend(struct.pack('<h', int(max(-1, min(1, sample_low)) * 32767)))
         data_high.extend(struct.pack('<h', int(max(-1, min(1, sample_high)) * 32767)))
-    def save_wav(fname, d):
-        with open(fname, 'wb') as f:
-            f.write(b'RIFF'); f.write(struct.pack('<I', 36 + len(d)))
-            f.write(b'WAVEfmt '); f.write(struct.pack('<IHHIIHH', 16, 1, 1, sr, sr * 2, 2, 16))
-            f.write(b'data'); f.write(struct.pack('<I', len(d))); f.write(d)
-    save_wav(path_low, data_low)
-    save_wav(path_high, data_high)
+    return wav_bytes(data_low, sr), wav_bytes(data_high, sr)
+
+# Encoded soundtracks, keyed by what the music depends on (seed, duration, start offset)
+SOUNDTRACK_CACHE_DIR = os.environ.get("SOUNDTRACK_CACHE_DIR", os.path.join(tempfile.gettempdir(), "dodger_soundtracks"))
+SOUNDTRACK_CACHE_FILES = int(os.environ.get("SOUNDTRACK_CACHE_FILES", 200))
+# Bump when generate_dynamic_music or the audio encoding changes, to retire cached tracks
+SOUNDTRACK_VERSION = 1
+SOUNDTRACK_AUDIO_ARGS = ["-c:a", "aac", "-b:a", "192k"]
+
+def soundtrack_path(seed, duration, offset=0.0):
+    """Where the encoded soundtrack of a game (from `offset` seconds in) is cached."""
+    samples = int(offset * 44100)
+    return os.path.join(SOUNDTRACK_CACHE_DIR, f"v{SOUNDTRACK_VERSION}_{seed}_{duration}_{samples}.m4a")
+
+def soundtrack_pcm(seed, duration, offset=0.0):
+    """A game's soundtrack (from `offset` seconds in) as WAV bytes, as it goes to the encoder."""
+    # Seeded the way run_game has always seeded its audio
+    _, music_high = generate_dynamic_music(duration, rng=random.Random(seed))
+    if offset:
+        music_high = trim_wav(music_high, offset)
+    return music_high
+
+def build_soundtrack(seed, duration, offset=0.0):
+    """
+    Synthesizes and encodes a game's soundtrack into the cache. Returns the
+    path. Usually runs in a helper process (see start_soundtrack); several
+    may run at once, as the file only appears once complete.
+    """
+    path = soundtrack_path(seed, duration, offset)
+    if os.path.exists(path):
+        return path
+    music_high = soundtrack_pcm(seed, duration, offset)
+    os.makedirs(SOUNDTRACK_CACHE_DIR, exist_ok=True)
+    temp_path = f"{path}.{os.getpid()}.tmp"
+    subprocess.run([FFMPEG_PATH, "-y", "-v", "error", "-f", "wav", "-i", "-",
+                    *SOUNDTRACK_AUDIO_ARGS, "-f", "mp4", temp_path],
+                   input=music_high, check=True)
+    os.replace(temp_path, path)
+    _prune_soundtracks()
+    return path
+
+def _prune_soundtracks():
+    try:
+        entries = [os.path.join(SOUNDTRACK_CACHE_DIR, name) for name in os.listdir(SOUNDTRACK_CACHE_DIR)
+                   if name.endswith(".m4a")]
+        entries.sort(key=os.path.getmtime)
+        for old in entries[:-SOUNDTRACK_CACHE_FILES]:
+            os.remove(old)
+    except OSError as e:
+        logger.warning(f"Failed to prune soundtrack cache: {e}")
+
+_soundtrack_threads = concurrent.futures.ThreadPoolExecutor(max_workers=2, thread_name_prefix="soundtrack")
+
+def start_soundtrack(seed, duration, offset=0.0):
+    """
+    Gets a game's encoded soundtrack ready off the render path. A cached
+    track is used as is; otherwise it is built by a helper interpreter (the
+    synthesis is pure Python, so in-process it would compete with the frame
+    loop for the GIL).
+
+    Returns:
+        Future: Resolves to the path of the encoded track.
+    """
+    path = soundtrack_path(seed, duration, offset)
+    if os.path.exists(path):
+        os.utime(path)  # keep it fresh for pruning
+        future = concurrent.futures.Future()
+        future.set_result(path)
+        return future
+    return _soundtrack_threads.submit(_build_soundtrack_process, seed, duration, offset)
+
+def _build_soundtrack_process(seed, duration, offset):
+    code = "import sys, json; sys.path.insert(0, sys.argv[1]); import dodger; dodger.build_soundtrack(*json.loads(sys.argv[2]))"
+    subprocess.run([sys.executable, "-c", code, os.path.dirname(os.path.abspath(__file__)),
+                    json.dumps([seed, duration, offset])],
+                   stdout=subprocess.DEVNULL, check=True)
+    return soundtrack_path(seed, duration, offset)
+
+class SoundtrackMux:
+    """
+    Puts the soundtrack next to a video as FFmpeg encodes it, copying both
+    streams, so the video is written to disk once. Put .output on the
+    encoder's command line as the video's output and .pass_fds on the Popen
+    call, then start(), and close() once the encoder has exited.
+
+    The encoder writes the video stream into a pipe (NUT container). A
+    second FFmpeg copies it into output_file together with the soundtrack
+    (a Future from start_soundtrack) as soon as that is ready; until then the
+    encoded stream, a small fraction of the raw frames, waits in memory.
+    """
+    def __init__(self, soundtrack, output_file):
+        if os.name == 'nt':
+            raise RuntimeError("Muxing while encoding needs pipe inheritance, which is not available on Windows")
+        self.soundtrack = soundtrack
+        self.output_file = output_file
+        self.read_fd, self.write_fd = os.pipe()
+        self.output = ["-f", "nut", f"pipe:{self.write_fd}"]
+        self.pass_fds = (self.write_fd,)
+        self.thread = None
+        self.process = None
+        self.aborted = False
+        self.error = None
+        self.lock = threading.Lock()
+
+    def start(self):
+        os.close(self.write_fd)
+        self.thread = threading.Thread(target=self._mux, daemon=True)
+        self.thread.start()
+
+    def _start_muxer(self):
+        """Starts the muxing FFmpeg once the soundtrack is ready. Returns it, or None if that failed or was aborted."""
+        try:
+            while True:
+                try:
+                    audio_path = self.soundtrack.result(timeout=0.5)
+                    break
+                except concurrent.futures.TimeoutError:
+                    if self.aborted:
+                        return None
+            with self.lock:
+                if self.aborted:
+                    return None
+                self.process = subprocess.Popen(
+                    [FFMPEG_PATH, "-y", "-v", "error", "-f", "nut", "-i", "-", "-i", audio_path,
+                     "-map", "0:v", "-map", "1:a", "-c", "copy", "-shortest", self.output_file],
+                    stdin=subprocess.PIPE
+                )
+                return self.process
+        except Exception as e:
+            self.error = e
+            return None
+
+    def _mux(self):
+        pending = []  # encoded video waiting for the soundtrack; None once the muxer is started (or failed to)
+        muxer = None
+        with os.fdopen(self.read_fd, 'rb') as pipe:
+            while True:
+                chunk = pipe.read1(1 << 16)
+                # Mux once the soundtrack is ready, or wait for it once the video is complete
+                if pending is not None and (not chunk or self.soundtrack.done()):
+                    muxer = self._start_muxer()
+                    if muxer:
+                        pending.append(chunk)
+                        chunk = b"".join(pending)
+                    pending = None
+                if not chunk:
+                    break
+                if pending is not None:
+                    pending.append(chunk)
+                elif muxer:
+                    try: muxer.stdin.write(chunk)
+                    except (BrokenPipeError, OSError): pass  # its exit code tells
+                # else: failed or aborted; keep draining so the encoder never blocks
+        if muxer:
+            try: muxer.stdin.close()
+            except (BrokenPipeError, OSError): pass
+            if muxer.wait() != 0 and self.error is None:
+                self.error = RuntimeError(f"FFmpeg exited with code {muxer.returncode} while muxing {self.output_file}")
+
+    def close(self):
+        """Waits for the muxed file. Raises if the soundtrack or the mux failed."""
+        if self.thread is None:
+            os.close(self.read_fd); os.close(self.write_fd)
+            return
+        self.thread.join()
+        if self.error is not None:
+            raise self.error
+
+    def abort(self):
+        """Stops muxing (after a failed or cancelled encode); output_file is left for the caller to delete."""
+        with self.lock:
+            self.aborted = True
+            if self.process and self.process.poll() is None:
+                self.process.kill()
+        try:
+            self.close()
+        except Exception:
+            pass
 
 # ===========================
 # CLASSES
 # ===========================
 
+class Pool:
+    """
+    Free list of entities that are recycled instead of re-allocated.
+    Pooled classes implement reset() with the same arguments as __init__.
+    """
+    __slots__ = ('cls', 'free')
+
+    def __init__(self, cls):
+        self.cls = cls
+        self.free = []
+
+    def acquire(self, *args):
+        if self.free:
+            obj = self.free.pop()
+            obj.reset(*args)
+            return obj
+        return self.cls(*args)
+
+    def release(self, obj):
+        self.free.append(obj)
+
+# Translucent dots are blitted hundreds of times per video; build each
+# (radius, colour, alpha) once instead of a fresh SRCALPHA surface per blit.
+_dot_cache = {}
+
+def get_dot(radius, color, alpha):
+    key = (radius, color, alpha)
+    s = _dot_cache.get(key)
+    if s is None:
+        s = pygame.Surface((radius*2, radius*2), pygame.SRCALPHA)
+        pygame.draw.circle(s, (*color, alpha), (radius, radius), radius)
+        _dot_cache[key] = s
+    return s
+
 class CartoonPlayer:
-    def __init__(self):
+    def __init__(self, rng=random):
         # Use Global HEIGHT
         self.rect = pygame.Rect(100, HEIGHT//2, 50, 50)
+        self.rng = rng
         self.y_float = float(self.rect.y)
         self.velocity = 0.0
-        self.trail = []
-        self.face_seed = random.randint(0, 1000)
+        self.trail = deque(maxlen=10)  # (x, y, size) tuples, oldest first
+        self.face_seed = rng.randint(0, 1000)
         self.blink_timer = 0
+        self.blinking = False
         self.wobble = 0
+        self.age = 0
         
     def update(self, target_y, smooth_factor):
         diff = target_y - self.rect.centery
@@ -131,25 +547,34 @@ class CartoonPlayer:
         if self.y_float < 0: self.y_float = 0; self.velocity = -self.velocity * 0.5
         if self.y_float > HEIGHT - self.rect.height: self.y_float = HEIGHT - self.rect.height; self.velocity = -self.velocity * 0.5
         self.rect.y = int(self.y_float)
+        trail_size = None
         if abs(self.velocity) > 1:
-            self.trail.append((self.rect.centerx, self.rect.centery, random.randint(5, 10)))
-        if len(self.trail) > 10: self.trail.pop(0)
-        self.wobble = math.sin(time.time() * 10) * 3
+            trail_size = self.rng.randint(5, 10)
+            self.add_trail(trail_size)
+        self.animate()
+        return trail_size
+
+    def add_trail(self, size):
+        self.trail.append((self.rect.centerx, self.rect.centery, size))
+
+    def animate(self):
+        # Cosmetic timers only; driven by frames so re-renders match the original
+        self.age += 1
+        self.wobble = math.sin(self.age / FPS * 10) * 3
+        self.blink_timer += 1
+        self.blinking = self.blink_timer > 150
+        if self.blink_timer > 160: self.blink_timer = 0
 
     def draw(self, surface):
         cx, cy = self.rect.centerx, self.rect.centery + self.wobble
         for i, (tx, ty, tr) in enumerate(self.trail):
             alpha = int(150 * (i/10))
-            s = pygame.Surface((tr*2, tr*2), pygame.SRCALPHA)
-            pygame.draw.circle(s, (*NEON_CYAN, alpha), (tr, tr), tr)
-            surface.blit(s, (tx - tr, ty - tr))
+            surface.blit(get_dot(tr, NEON_CYAN, alpha), (tx - tr, ty - tr))
         pygame.draw.circle(surface, (0, 100, 100), (cx, cy), 28)
         pygame.draw.circle(surface, NEON_CYAN, (cx, cy), 24)
         pygame.draw.circle(surface, (200, 255, 255), (cx - 8, cy - 8), 8)
-        self.blink_timer += 1
-        if self.blink_timer > 150:
+        if self.blinking:
             pygame.draw.line(surface, (0,0,0), (cx + 6, cy - 2), (cx + 14, cy - 2), 3)
-            if self.blink_timer > 160: self.blink_timer = 0
         else:
             pygame.draw.circle(surface, (0,0,0), (cx + 10, cy - 2), 4)
         pygame.draw.circle(surface, (0,0,0), (cx + 18, cy - 2), 3)
@@ -158,12 +583,20 @@ class CartoonPlayer:
         pygame.draw.circle(surface, NEON_RED, (cx, cy - 35), 4)
 
 class Obstacle:
+    __slots__ = ('rect', 'x_float', 'color', 'passed')
+
     def __init__(self, x, y, w, h, color):
         self.rect = pygame.Rect(x, y, w, h)
         self.x_float = float(x)
         self.color = color
         self.passed = False
 
+    def reset(self, x, y, w, h, color):
+        self.rect.update(x, y, w, h)
+        self.x_float = float(x)
+        self.color = color
+        self.passed = False
+
     def update(self, speed):
         self.x_float -= speed
         self.rect.x = int(self.x_float)
@@ -174,10 +607,15 @@ class Obstacle:
         pygame.draw.line(surface, (255, 255, 255), (self.rect.centerx, self.rect.top), (self.rect.centerx, self.rect.bottom), 1)
 
 class Particle:
-    def __init__(self, x, y, color):
+    __slots__ = ('x', 'y', 'vx', 'vy', 'life', 'color')
+
+    def __init__(self, x, y, color, rng=random):
+        self.reset(x, y, color, rng)
+
+    def reset(self, x, y, color, rng=random):
         self.x = x; self.y = y
-        self.vx = random.uniform(-5, 5)
-        self.vy = random.uniform(-5, 5)
+        self.vx = rng.uniform(-5, 5)
+        self.vy = rng.uniform(-5, 5)
         self.life = 40
         self.color = color
     
@@ -187,9 +625,7 @@ class Particle:
     def draw(self, surface):
         if self.life > 0:
             alpha = int(255 * (self.life/40))
-            s = pygame.Surface((6,6), pygame.SRCALPHA)
-            pygame.draw.circle(s, (*self.color, alpha), (3,3), 3)
-            surface.blit(s, (self.x, self.y))
+            surface.blit(get_dot(3, self.color, alpha), (self.x, self.y))
 
 class LevelManager:
     def __init__(self):
@@ -212,8 +648,80 @@ class LevelManager:
     def get_color(self):
         return self.colors[(self.level - 1) % len(self.colors)]
 
+class ChatMessage:
+    """One chat line. The name and text are rendered once, when the message arrives."""
+    __slots__ = ('user', 'color', 'text', 'slide', 'alpha', 'life', 'user_surf', 'text_surf')
+
+    def __init__(self, user, color, text, font):
+        self.user = user
+        self.color = color
+        self.text = text
+        self.slide = -50
+        self.alpha = 0
+        self.life = 300
+        self.user_surf = font.render(user, True, (200, 200, 200))
+        self.text_surf = font.render(text, True, (255, 255, 255))
+
+_chat_backdrop = None
+
+def get_chat_backdrop():
+    global _chat_backdrop
+    if _chat_backdrop is None:
+        _chat_backdrop = pygame.Surface((250, 200), pygame.SRCALPHA)
+        for i in range(200):
+            pygame.draw.line(_chat_backdrop, (0,0,0, int(150 * (i/200))), (0, i), (250, i))
+    return _chat_backdrop
+
+_overlay_cache = {}
+
+def get_overlay(size):
+    """The dark full-canvas overlay of the game-over screen, made once per canvas size."""
+    s = _overlay_cache.get(size)
+    if s is None:
+        s = pygame.Surface(size, pygame.SRCALPHA)
+        s.fill((0,0,0, 180))
+        _overlay_cache[size] = s
+    return s
+
+_backdrop_cache = {}
+
+def get_backdrop(theme):
+    """
+    The theme's background with its grid lines, one grid cell (50 px) wider
+    than the game: blitted at x = -grid_offset it is the scrolled grid.
+    """
+    key = (tuple(theme['bg']), tuple(theme['grid']), WIDTH, HEIGHT)
+    s = _backdrop_cache.get(key)
+    if s is None:
+        s = pygame.Surface((WIDTH + 50, HEIGHT))
+        s.fill(theme['bg'])
+        for x in range(0, WIDTH + 50, 50): pygame.draw.line(s, theme['grid'], (x, 0), (x, HEIGHT))
+        _backdrop_cache[key] = s
+    return s
+
+# Fonts are only valid while pygame is initialized; quit_pygame() empties this
+_font_cache = {}
+
+def get_font(name, size, bold=False):
+    """
+    pygame.font.SysFont, looked up once per process (the lookup scans the
+    system fonts). In deterministic mode, pygame's bundled font instead.
+    """
+    key = (name, size, bold)
+    font = _font_cache.get(key)
+    if font is None:
+        if DETERMINISTIC:
+            # What SysFont falls back to when the font is not installed
+            font = pygame.font.Font(None, size)
+            font.set_bold(bold)
+        else:
+            font = pygame.font.SysFont(name, size, bold=bold)
+        _font_cache[key] = font
+    return font
+
 class EnhancedChat:
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng
         self.messages = [] 
         self.users = [
             "NeonNinja", "CyberWolf", "PixelPusher", "GlitchGamer", "RetroRex", 
@@ -224,81 +732,120 @@ class EnhancedChat:
         self.comments_scared = ["monkaS", "Close one", "Sweating", "Careful!", "Heart rate 📈"]
         self.timer = 0
         self.next_msg_time = 0
-        self.font = pygame.font.SysFont("Arial", 16, bold=True)
+        self.font = get_font("Arial", 16, bold=True)
+
+    def get_comments(self, type):
+        if type == 'hype': return self.comments_hype
+        elif type == 'scared': return self.comments_scared
+        else: return self.comments_normal
 
     def add_message(self, type='normal'):
-        user = random.choice(self.users)
-        color = random.choice([NEON_CYAN, NEON_MAGENTA, NEON_GREEN, NEON_YELLOW])
-        
-        if type == 'hype': text = random.choice(self.comments_hype)
-        elif type == 'scared': text = random.choice(self.comments_scared)
-        else: text = random.choice(self.comments_normal)
-        
-        self.messages.append({
-            'user': user, 'color': color, 'text': text, 
-            'slide': -50, 'alpha': 0, 'life': 300
-        })
+        """Adds a random message. Returns the (user, color, type, text) indices picked."""
+        user_i = self.rng.randrange(len(self.users))
+        color_i = self.rng.randrange(len(CHAT_COLORS))
+        text_i = self.rng.randrange(len(self.get_comments(type)))
+        self.push(user_i, color_i, type, text_i)
+        return user_i, color_i, type, text_i
+
+    def push(self, user_i, color_i, type, text_i):
+        self.messages.append(ChatMessage(
+            self.users[user_i], CHAT_COLORS[color_i], self.get_comments(type)[text_i], self.font
+        ))
         if len(self.messages) > 7: self.messages.pop(0)
 
     def update(self, state='normal'):
+        """Spawns the next message when due and animates the rest. Returns the new message's indices, if any."""
+        added = None
         self.timer += 1
         if self.timer >= self.next_msg_time:
             self.timer = 0
-            self.next_msg_time = random.randint(30, 100)
-            self.add_message(state)
-            
+            self.next_msg_time = self.rng.randint(30, 100)
+            added = self.add_message(state)
+        self.animate()
+        return added
+
+    def animate(self):
         for m in self.messages:
-            if m['slide'] < 0: m['slide'] += 5 
-            if m['alpha'] < 255: m['alpha'] += 15 
-            m['life'] -= 1
+            if m.slide < 0: m.slide += 5 
+            if m.alpha < 255: m.alpha += 15 
+            m.life -= 1
 
     def draw(self, surface, x, y):
-        s = pygame.Surface((250, 200), pygame.SRCALPHA)
-        for i in range(200):
-            pygame.draw.line(s, (0,0,0, int(150 * (i/200))), (0, i), (250, i))
-        surface.blit(s, (x, y))
+        surface.blit(get_chat_backdrop(), (x, y))
         
         curr_y = y + 180
         for m in reversed(self.messages):
-            if m['life'] <= 0: continue
+            if m.life <= 0: continue
             
-            pygame.draw.circle(surface, m['color'], (x + 15 + int(m['slide']), curr_y + 8), 8)
+            pygame.draw.circle(surface, m.color, (x + 15 + int(m.slide), curr_y + 8), 8)
             
-            u_surf = self.font.render(m['user'], True, (200, 200, 200))
-            t_surf = self.font.render(m['text'], True, (255, 255, 255))
+            u_surf = m.user_surf
+            t_surf = m.text_surf
             
-            u_surf.set_alpha(m['alpha'])
-            t_surf.set_alpha(m['alpha'])
+            u_surf.set_alpha(m.alpha)
+            t_surf.set_alpha(m.alpha)
             
-            surface.blit(u_surf, (x + 30 + int(m['slide']), curr_y))
-            surface.blit(t_surf, (x + 30 + u_surf.get_width() + 10 + int(m['slide']), curr_y))
+            surface.blit(u_surf, (x + 30 + int(m.slide), curr_y))
+            surface.blit(t_surf, (x + 30 + u_surf.get_width() + 10 + int(m.slide), curr_y))
             
             curr_y -= 25
             if curr_y < y: break
 
+    def bounds(self, x, y):
+        """The area draw(surface, x, y) paints, as a Rect."""
+        rect = get_chat_backdrop().get_rect(topleft=(x, y))
+        curr_y = y + 180
+        for m in reversed(self.messages):
+            if m.life <= 0: continue
+            left = x + 7 + int(m.slide)
+            right = x + 30 + m.user_surf.get_width() + 10 + m.text_surf.get_width() + int(m.slide)
+            rect.union_ip(pygame.Rect(left, curr_y, right - left, max(17, m.text_surf.get_height(), m.user_surf.get_height())))
+            curr_y -= 25
+            if curr_y < y: break
+        return rect
+
 class ExpressiveFacecam:
-    def __init__(self):
+    def __init__(self, rng=random):
+        self.rng = rng
         self.state = 'normal'
         self.color = NEON_CYAN
         self.blink_timer = 0
+        self.blinking = False
         self.bob_timer = 0
         self.shake = 0
+        # Set on the game-over screen: the expression stops moving
+        self.frozen = False
         
     def update(self, player, obstacles, level_just_up):
-        self.state = 'normal'
-        self.shake = 0
+        state = 'normal'
+        shake = 0
         
         if level_just_up:
-            self.state = 'hype'
+            state = 'hype'
         else:
             p_rect = player.rect.inflate(50, 50)
             for o in obstacles:
                 if p_rect.colliderect(o.rect):
-                    self.state = 'scared'
-                    self.shake = random.randint(-2, 2)
+                    state = 'scared'
+                    shake = self.rng.randint(-2, 2)
                     break
         
+        self.set_state(state, shake)
+
+    def set_state(self, state, shake):
+        self.state = state
+        if self.frozen: return
+        self.shake = shake
         self.bob_timer += 0.2 if self.state == 'normal' else 0.5
+        self.blink_timer += 1
+        self.blinking = self.state == 'normal' and self.blink_timer > 200
+        if self.blinking and self.blink_timer > 210: self.blink_timer = 0
+
+    def bounds(self, x, y):
+        """The area draw(surface, x, y) paints, as a Rect: the frame and the body below it."""
+        cx = x + 80 + self.shake
+        cy = y + 120 + math.sin(self.bob_timer) * 5
+        return pygame.Rect(x, y, 160, 120).union(pygame.Rect(cx - 40, int(cy) - 20, 81, 82))
 
     def draw(self, surface, x, y):
         w, h = 160, 120
@@ -317,12 +864,6 @@ class ExpressiveFacecam:
         head_y = cy - 30
         pygame.draw.circle(surface, (200, 180, 150), (cx, int(head_y)), 25)
         
-        self.blink_timer += 1
-        blink = False
-        if self.state == 'normal' and self.blink_timer > 200:
-            blink = True
-            if self.blink_timer > 210: self.blink_timer = 0
-            
         eye_y = int(head_y)
         if self.state == 'scared':
             pygame.draw.circle(surface, (255, 255, 255), (cx - 8, eye_y), 6)
@@ -334,7 +875,7 @@ class ExpressiveFacecam:
             pygame.draw.line(surface, (0,0,0), (cx - 10, eye_y + 3), (cx - 4, eye_y - 3), 2)
             pygame.draw.line(surface, (0,0,0), (cx + 4, eye_y - 3), (cx + 10, eye_y + 3), 2)
             pygame.draw.line(surface, (0,0,0), (cx + 4, eye_y + 3), (cx + 10, eye_y - 3), 2)
-        elif blink:
+        elif self.blinking:
             pygame.draw.line(surface, (0,0,0), (cx - 10, eye_y), (cx - 4, eye_y), 2)
             pygame.draw.line(surface, (0,0,0), (cx + 4, eye_y), (cx + 10, eye_y), 2)
         else:
@@ -345,146 +886,266 @@ class ExpressiveFacecam:
         pygame.draw.rect(surface, (30,30,30), (cx - 30, int(head_y) - 5, 10, 20))
         pygame.draw.rect(surface, (30,30,30), (cx + 20, int(head_y) - 5, 10, 20))
 
-def run_game(config, output_file="output.mp4"):
+# Video encoder settings by name. "standard" is what run_game has always used.
+ENCODER_PROFILES = {
+    "standard": ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "ultrafast"],
+    "quality":  ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "medium", "-crf", "20"],
+    "archive":  ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "slow", "-crf", "16"],
+    # Lower quality target than "standard" (already the fastest preset): less to write and upload
+    "draft":    ["-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "ultrafast", "-crf", "30"],
+}
+
+# Set by pygame_session(): pygame stays initialized across renders
+_session_active = False
+
+# Deterministic mode: a render's frames and soundtrack depend on its config
+# alone. Renders run unthrottled with no live audio, and text uses pygame's
+# bundled font rather than whatever system fonts are installed (see golden.py).
+DETERMINISTIC = os.environ.get("DODGER_DETERMINISTIC") == "1"
+
+def set_deterministic(enabled=True):
+    """Turns deterministic mode on or off for this process."""
+    global DETERMINISTIC
+    DETERMINISTIC = enabled
+    _font_cache.clear()
+
+def init_pygame(mixer=False):
+    """Initializes pygame for a render (nothing to do inside a pygame_session)."""
+    if _session_active:
+        return
+    pygame.init()
+    if mixer:
+        pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
+    pygame.font.init()
+
+def quit_pygame():
+    """Shuts pygame down after a render, unless a pygame_session keeps it open."""
+    if _session_active:
+        return
+    pygame.quit()
+    _font_cache.clear()
+
+def get_display(size):
+    """The display surface at `size`, only re-created when the size changes."""
+    screen = pygame.display.get_surface()
+    if screen is None or screen.get_size() != size:
+        screen = pygame.display.set_mode(size)
+    return screen
+
+@contextlib.contextmanager
+def pygame_session():
     """
-    Runs the game with the provided configuration and saves the video.
+    Keeps pygame (display, mixer, fonts) up for every render in the block,
+    so a long-lived renderer (see renderer.py) sets it up once instead of
+    per game. Fonts, sound effects and the other asset caches carry over
+    from game to game; each game still starts from a fresh Game.
+    """
+    global _session_active
+    init_pygame(mixer=True)
+    _session_active = True
+    try:
+        yield
+    finally:
+        _session_active = False
+        quit_pygame()
+
+@contextlib.contextmanager
+def gc_paused():
+    """
+    Keeps cyclic garbage collection out of the frame loop. Everything alive on
+    entry is frozen and automatic collection is off until the block exits.
+    Entities are pooled and don't form cycles, so one collection afterwards
+    catches anything left over, instead of collections landing mid-frame.
+    """
+    was_enabled = gc.isenabled()
+    gc.freeze()
+    gc.disable()
+    try:
+        yield
+    finally:
+        gc.unfreeze()
+        if was_enabled: gc.enable()
+        gc.collect()
+
+DEFAULT_THEME = {'bg': (10, 10, 18), 'grid': (40, 0, 60), 'accent': (0, 255, 255)}
+GAMEOVER_DURATION = 3
+# Particles in the burst when the player dies (config "particles")
+BURST_PARTICLES = 100
+
+def load_config(config):
+    """
+    Loads the resolution and frame rate from config into the module globals
+    that the entity classes read.
     """
-    # 1. LOAD CONFIG INTO GLOBALS
     global WIDTH, HEIGHT, FPS
     WIDTH = config.get('width', 854)
     HEIGHT = config.get('height', 480)
     FPS = config.get('fps', 30)
-    DURATION = config.get('duration', 15)
-    
-    # NEW SPEED CONFIGS
-    BASE_SPEED = config.get('base_speed', 10.0)    # Default to fast if missing
-    SPEED_RAMP = config.get('speed_ramp', 200.0)   # Default to fast ramp if missing
-    
-    SEED = config.get('seed', 12345)
-    AI_SKILL = config.get('ai_skill', 1.0)
-    THEME = config.get('theme', {'bg': (10, 10, 18), 'grid': (40, 0, 60), 'accent': (0, 255, 255)})
-    
-    random.seed(SEED)
-    print(f"Starting Game | Res: {WIDTH}x{HEIGHT} | Speed: {BASE_SPEED} | Duration: {DURATION}s")
-    
-    # Initialize Pygame (Headless check)
-    if os.environ.get("SDL_VIDEODRIVER") == "dummy":
-        print("Running in Headless Mode")
-    
-    pygame.init()
-    pygame.mixer.init(frequency=44100, size=-16, channels=2, buffer=512)
-    pygame.font.init()
-    
-    screen = pygame.display.set_mode((WIDTH, HEIGHT))
-    clock = pygame.time.Clock()
-    
-    # Assets
-    temp_dir = tempfile.mkdtemp()
-    music_low = os.path.join(temp_dir, "bgm_low.wav")
-    music_high = os.path.join(temp_dir, "bgm_high.wav")
-    
-    generate_dynamic_music(music_low, music_high, DURATION) 
-    
-    sfx_death = os.path.join(temp_dir, "death.wav")
-    generate_tone(sfx_death, 150, 0.5, type='saw')
-    sfx_level = os.path.join(temp_dir, "level.wav")
-    generate_tone(sfx_level, 600, 0.3, type='sine')
-    
-    chan_music_low = pygame.mixer.Channel(0)
-    chan_music_high = pygame.mixer.Channel(1)
-    snd_low = pygame.mixer.Sound(music_low)
-    snd_high = pygame.mixer.Sound(music_high)
-    snd_death = pygame.mixer.Sound(sfx_death)
-    snd_level = pygame.mixer.Sound(sfx_level)
-    
-    chan_music_low.play(snd_low, loops=-1)
-    chan_music_high.play(snd_high, loops=-1)
-    chan_music_high.set_volume(0)
-    
-    # Objects
-    player = CartoonPlayer()
-    obstacles = []
-    particles = []
-    level_mgr = LevelManager()
-    chat = EnhancedChat()
-    facecam = ExpressiveFacecam()
-    
-    # Apply Theme
-    facecam.color = THEME['accent']
-    
-    font_huge = pygame.font.SysFont("Impact", 80)
-    font_big = pygame.font.SysFont("Impact", 50)
-    font_med = pygame.font.SysFont("Arial", 24)
-    
-    frame_count = 0
-    score = 0
-    speed = BASE_SPEED * AI_SKILL # Initialize speed variable
-    spawn_timer = 0
-    game_over = False
-    game_over_timer = 0
-    level_just_up = False
-    
-    MAX_FRAMES = FPS * DURATION
-    GAMEOVER_DURATION = 3
-    
-    cmd = [
-        FFMPEG_PATH, "-y",
-        "-f", "rawvideo", "-pix_fmt", "rgb24",
-        "-s", f"{WIDTH}x{HEIGHT}", "-r", str(FPS),
-        "-i", "-", "-i", music_high,
-        "-c:v", "libx264", "-pix_fmt", "yuv420p", "-preset", "ultrafast",
-        "-c:a", "aac", "-b:a", "192k", "-shortest",
-        output_file
-    ]
-    
-    try:
-        ffmpeg = subprocess.Popen(cmd, stdin=subprocess.PIPE)
-    except FileNotFoundError:
-        print(f"Error: FFmpeg not found at {FFMPEG_PATH}")
-        return None
 
-    running = True
-    while running:
-        # Event Pump (Required even in headless)
-        pygame.event.pump()
-                
-        if not game_over:
+class Layout:
+    """
+    Placement of the playfield and HUD on an output canvas of a given size.
+
+    The playfield is always simulated and drawn at the game's own resolution
+    and scaled into `field`; the HUD (score, chat, facecam, WASTED) is drawn at
+    the canvas resolution so text stays sharp. A canvas with the game's aspect
+    ratio gets the original full-frame overlay. A wider one pillarboxes the
+    playfield with chat and facecam in the side panels; a taller one puts the
+    playfield on top and chat and facecam below it.
+    """
+    def __init__(self, width, height):
+        self.size = (width, height)
+        game_aspect = WIDTH / HEIGHT
+        aspect = width / height
+        if abs(aspect - game_aspect) <= 0.01 * game_aspect:
+            self.field = pygame.Rect(0, 0, width, height)
+            self.chat_pos = (20, height - 220)
+            self.facecam_pos = (width - 180, height - 140)
+        elif aspect > game_aspect:
+            fw = round(WIDTH * height / HEIGHT)
+            self.field = pygame.Rect((width - fw) // 2, 0, fw, height)
+            panel = self.field.left
+            self.chat_pos = (max(10, (panel - 250) // 2), height - 220)
+            self.facecam_pos = (self.field.right + max(10, (panel - 160) // 2), 20)
+        else:
+            fh = round(HEIGHT * width / WIDTH)
+            self.field = pygame.Rect(0, 0, width, fh)
+            self.chat_pos = (20, height - 220)
+            self.facecam_pos = (width - 180, height - 140)
+
+    def is_native(self):
+        return self.size == (WIDTH, HEIGHT)
+
+    def chat_rect(self):
+        """The box the chat is drawn in (its backdrop)."""
+        return pygame.Rect(self.chat_pos, (250, 200))
+
+    def facecam_rect(self):
+        """The facecam's frame."""
+        return pygame.Rect(self.facecam_pos, (160, 120))
+
+class Game:
+    """
+    State of a single seeded game. step() advances the simulation by one
+    frame and draw() renders the current frame, so a caller can skip drawing
+    (previews, fast-forward) without changing how the game plays out.
+    Requires pygame (and its font module) to be initialized.
+    """
+    def __init__(self, config):
+        self.duration = config.get('duration', 15)
+        self.base_speed = config.get('base_speed', 10.0)    # Default to fast if missing
+        self.speed_ramp = config.get('speed_ramp', 200.0)   # Default to fast ramp if missing
+        self.ai_skill = config.get('ai_skill', 1.0)
+        self.theme = config.get('theme', DEFAULT_THEME)
+        self.burst_size = config.get('particles', BURST_PARTICLES)
+        self.max_frames = FPS * self.duration
+
+        # The game's own generator: nothing else drawing random numbers (in
+        # another thread, say) can change how it plays
+        self.rng = random.Random(config.get('seed', 12345))
+
+        # Objects
+        self.player = CartoonPlayer(self.rng)
+        self.obstacles = []
+        self.particles = []
+        self.obstacle_pool = Pool(Obstacle)
+        self.particle_pool = Pool(Particle)
+        self.level_mgr = LevelManager()
+        self.chat = EnhancedChat(self.rng)
+        self.facecam = ExpressiveFacecam(self.rng)
+
+        # Apply Theme
+        self.facecam.color = self.theme['accent']
+
+        self.font_huge = get_font("Impact", 80)
+        self.font_big = get_font("Impact", 50)
+        self.font_med = get_font("Arial", 24)
+
+        self.frame_count = 0
+        self.score = 0
+        self.speed = self.base_speed * self.ai_skill
+        self.grid_offset = 0
+        self.spawn_timer = 0
+        self.game_over = False
+        self.game_over_timer = 0
+        self.level_just_up = False
+        self.running = True
+        # Decisions made during the last step(), in order (see replay.py)
+        self.log = []
+        self.text_cache = {}
+        # Game-over screen: the frozen scene composited once (see draw_tail)
+        self.tail_base = None
+        self.tail_base_key = None
+        self.tail_key = None
+
+    def compute_speed(self):
+        # Speed starts at BASE_SPEED and increases by 1 every 'SPEED_RAMP' frames
+        return (self.base_speed * self.ai_skill) + (self.level_mgr.level * 1.5) + (self.frame_count / self.speed_ramp)
+
+    def spawn_pair(self, gap_y, gap, color_i):
+        col = self.level_mgr.colors[color_i]
+        self.obstacles.append(self.obstacle_pool.acquire(WIDTH, 0, 60, gap_y, col))
+        self.obstacles.append(self.obstacle_pool.acquire(WIDTH, gap_y + gap, 60, HEIGHT - (gap_y + gap), col))
+
+    def spawn_burst(self, seed):
+        rng = random.Random(seed)
+        for _ in range(self.burst_size):
+            self.particles.append(self.particle_pool.acquire(self.player.rect.centerx, self.player.rect.centery, NEON_RED, rng))
+
+    def update_particles(self):
+        alive = []
+        for p in self.particles:
+            p.update()
+            if p.life > 0: alive.append(p)
+            else: self.particle_pool.release(p)
+        self.particles = alive
+
+    def step(self):
+        """
+        Advances the game by one frame.
+
+        Returns:
+            list: Events raised this frame ('level_up', 'near_miss', 'death').
+        """
+        events = []
+        log = self.log = []
+        level_mgr = self.level_mgr
+
+        if not self.game_over:
             # --- SPEED LOGIC UPDATE ---
-            # Speed starts at BASE_SPEED and increases by 1 every 'SPEED_RAMP' frames
-            speed = (BASE_SPEED * AI_SKILL) + (level_mgr.level * 1.5) + (frame_count / SPEED_RAMP)
-            
-            # Dynamic Music Mix based on speed
-            mix = min(1.0, max(0.0, (speed - (BASE_SPEED + 2)) / 5.0))
-            chan_music_low.set_volume(1.0 - mix)
-            chan_music_high.set_volume(mix)
-            
-            spawn_timer += 1
-            if spawn_timer > max(20, 60 - int(speed*2)):
-                spawn_timer = 0
+            self.speed = self.compute_speed()
+
+            self.spawn_timer += 1
+            if self.spawn_timer > max(20, 60 - int(self.speed*2)):
+                self.spawn_timer = 0
                 gap = 250 - (level_mgr.level * 10)
-                gap_y = random.randint(50, HEIGHT - 50 - gap)
-                col = level_mgr.get_color()
-                obstacles.append(Obstacle(WIDTH, 0, 60, gap_y, col))
-                obstacles.append(Obstacle(WIDTH, gap_y + gap, 60, HEIGHT - (gap_y + gap), col))
-            
-            for o in obstacles: o.update(speed)
-            
+                gap_y = self.rng.randint(50, HEIGHT - 50 - gap)
+                color_i = (level_mgr.level - 1) % len(level_mgr.colors)
+                self.spawn_pair(gap_y, gap, color_i)
+                log.append(('spawn', gap_y, gap, color_i))
+
+            for o in self.obstacles: o.update(self.speed)
+
             active_obstacles = []
-            for o in obstacles:
+            for o in self.obstacles:
                 if o.rect.right >= 0:
                     active_obstacles.append(o)
                 else:
                     if o.rect.y == 0:
-                        score += 100
+                        self.score += 100
+                        log.append(('score', self.score))
                         if level_mgr.add_xp(100):
-                            snd_level.play()
-                            level_just_up = True
-                            chat.add_message('hype')
-            obstacles = active_obstacles
-            
+                            events.append('level_up')
+                            log.append(('level_up',))
+                            self.level_just_up = True
+                            log.append(('chat', *self.chat.add_message('hype')))
+                    self.obstacle_pool.release(o)
+            self.obstacles = active_obstacles
+
             # AI Logic
+            player = self.player
             target_y = HEIGHT // 2
-            visible = [o for o in obstacles if o.rect.right > player.rect.left]
+            visible = [o for o in self.obstacles if o.rect.right > player.rect.left]
             if visible:
                 visible.sort(key=lambda x: x.rect.left)
                 nearest = visible[0]
@@ -492,86 +1153,581 @@ def run_game(config, output_file="output.mp4"):
                 if len(pair) >= 2:
                     pair.sort(key=lambda x: x.rect.top)
                     target_y = (pair[0].rect.bottom + pair[1].rect.top) / 2
-            
-            base_jitter = math.sin(frame_count/10) * 30
-            jitter = base_jitter * (2.0 - AI_SKILL) * 0.5
-            player.update(target_y + jitter, 0.15)
-            
+
+            base_jitter = math.sin(self.frame_count/10) * 30
+            jitter = base_jitter * (2.0 - self.ai_skill) * 0.5
+            trail_size = player.update(target_y + jitter, 0.15)
+            if trail_size is not None: log.append(('trail', trail_size))
+
             p_hitbox = player.rect.inflate(-15, -15)
-            for o in obstacles:
+            for o in self.obstacles:
                 if p_hitbox.colliderect(o.rect):
-                    game_over = True
-                    snd_death.play()
-                    chat.add_message('scared')
-                    for _ in range(100):
-                        particles.append(Particle(player.rect.centerx, player.rect.centery, NEON_RED))
+                    self.game_over = True
+                    events.append('death')
+                    log.append(('chat', *self.chat.add_message('scared')))
+                    seed = self.rng.getrandbits(32)
+                    self.spawn_burst(seed)
+                    log.append(('burst', seed))
                     break
-            
-            if frame_count > MAX_FRAMES: game_over = True
-            
+
+            if self.frame_count > self.max_frames: self.game_over = True
+            if self.game_over: log.append(('game_over',))
+
         else:
-            game_over_timer += 1
-            if game_over_timer > (GAMEOVER_DURATION * FPS): running = False
-        
-        for p in particles: p.update()
-        facecam.update(player, obstacles, level_just_up)
-        chat.update(facecam.state)
-        level_just_up = False
-        
-        # Draw
-        screen.fill(THEME['bg']) 
-        off = (frame_count * speed) % 50
-        for x in range(int(-off), WIDTH, 50): pygame.draw.line(screen, THEME['grid'], (x, 0), (x, HEIGHT))
-        for o in obstacles: o.draw(screen)
-        if not game_over: player.draw(screen)
-        for p in particles: p.draw(screen)
-        
+            self.game_over_timer += 1
+            if self.game_over_timer > (GAMEOVER_DURATION * FPS): self.running = False
+
+        self.update_particles()
+        was_scared = self.facecam.state == 'scared'
+        # The scene freezes behind WASTED; only particles and chat keep moving
+        self.facecam.frozen = self.game_over_timer > 0
+        self.facecam.update(self.player, self.obstacles, self.level_just_up)
+        if self.facecam.state == 'scared' and not was_scared and not self.game_over:
+            events.append('near_miss')
+        added = self.chat.update(self.facecam.state)
+        if added: log.append(('chat', *added))
+        self.level_just_up = False
+        if level_mgr.level_text_timer > 0: level_mgr.level_text_timer -= 1
+
+        if self.game_over_timer == 0: self.grid_offset = (self.frame_count * self.speed) % 50
+        self.frame_count += 1
+        return events
+
+    def draw(self, surface):
+        """
+        Draws the current frame onto surface (WIDTH x HEIGHT).
+
+        Returns:
+            bool: False if surface already holds this frame (an unchanged
+            game-over frame), so the caller can reuse the last frame's bytes.
+        """
+        if self.game_over and self.level_mgr.level_text_timer == 0:
+            return self.draw_tail(surface)
+        self.tail_key = None
+        self.draw_playfield(surface)
+        self.draw_hud(surface, Layout(WIDTH, HEIGHT))
+        return True
+
+    def draw_tail(self, surface):
+        """
+        Draws a game-over frame. Behind WASTED the scene is frozen, so it is
+        composited once without particles and chat (tail_base); each frame
+        copies it and redraws, clipped, only the areas the particles and chat
+        cover. Pixels match a full draw. Returns False, drawing nothing, when
+        the frame is the same as the one last drawn onto surface.
+        """
+        layout = Layout(WIDTH, HEIGHT)
+        facecam = self.facecam
+        base_key = (facecam.state, facecam.shake, facecam.bob_timer, facecam.blinking, surface.get_size())
+        if base_key != self.tail_base_key:
+            particles, messages = self.particles, self.chat.messages
+            self.particles, self.chat.messages = [], []
+            self.tail_base = pygame.Surface(surface.get_size())
+            self.draw_playfield(self.tail_base)
+            self.draw_hud(self.tail_base, layout)
+            self.particles, self.chat.messages = particles, messages
+            self.tail_base_key = base_key
+            self.tail_key = None
+
+        chat_key = tuple((m.user, m.text, m.slide, m.alpha) for m in self.chat.messages if m.life > 0)
+        key = (id(surface), chat_key, len(self.particles))
+        if not self.particles and key == self.tail_key:
+            return False
+        self.tail_key = key
+
+        surface.blit(self.tail_base, (0, 0))
+        dirty = [self.chat.bounds(*layout.chat_pos)]
+        if self.particles:
+            # Dots are blitted at float positions; pad for the rounding
+            xs = [p.x for p in self.particles]
+            ys = [p.y for p in self.particles]
+            dirty.append(pygame.Rect(min(xs) - 1, min(ys) - 1, max(xs) - min(xs) + 8, max(ys) - min(ys) + 8))
+        # A bordered pygame.draw.rect fills the whole clip when the clip leaves
+        # 6 px or less of it, so each clip takes in every outlined shape it cuts
+        outlined = [o.rect for o in self.obstacles] + [facecam.bounds(*layout.facecam_pos)]
+        for i, rect in enumerate(dirty):
+            grown = True
+            while grown:
+                grown = False
+                for shape in outlined:
+                    if rect.colliderect(shape) and not rect.contains(shape):
+                        rect = rect.union(shape)
+                        grown = True
+            dirty[i] = rect
+        for rect in dirty:
+            surface.set_clip(rect)
+            self.draw_playfield(surface)
+            self.draw_hud(surface, layout)
+        surface.set_clip(None)
+        return True
+
+    def render_text(self, font, text, color):
+        """font.render with a cache, for HUD text redrawn every frame."""
+        key = (id(font), text, color)
+        s = self.text_cache.get(key)
+        if s is None:
+            s = self.text_cache[key] = font.render(text, True, color)
+        return s
+
+    def draw_layouts(self, surface, canvases):
+        """
+        Draws the current frame onto surface (as draw() does) and onto each
+        (canvas, layout) pair, reusing one playfield render for all of them.
+        """
+        self.tail_key = None
+        self.draw_playfield(surface)
+        for canvas, layout in canvases:
+            canvas.fill(self.theme['bg'])
+            canvas.blit(pygame.transform.smoothscale(surface, layout.field.size), layout.field.topleft)
+            self.draw_hud(canvas, layout)
+        self.draw_hud(surface, Layout(WIDTH, HEIGHT))
+
+    def draw_playfield(self, surface):
+        surface.blit(get_backdrop(self.theme), (int(-self.grid_offset), 0))
+        for o in self.obstacles: o.draw(surface)
+        if not self.game_over: self.player.draw(surface)
+        for p in self.particles: p.draw(surface)
+
+    def draw_hud(self, surface, layout):
+        level_mgr = self.level_mgr
+        field = layout.field
+        width, height = layout.size
+
         # UI
-        s_surf = font_big.render(f"{score}", True, NEON_YELLOW)
-        screen.blit(s_surf, (WIDTH//2 - s_surf.get_width()//2, 20))
-        
+        s_surf = self.render_text(self.font_big, f"{self.score}", NEON_YELLOW)
+        surface.blit(s_surf, (field.centerx - s_surf.get_width()//2, field.top + 20))
+
         if level_mgr.level_text_timer > 0:
-            level_mgr.level_text_timer -= 1
             scale = 1.0 + math.sin(level_mgr.level_text_timer * 0.2) * 0.2
             txt = f"LEVEL {level_mgr.level}"
             col = level_mgr.get_color()
-            l_surf = font_huge.render(txt, True, col)
+            l_surf = self.render_text(self.font_huge, txt, col)
             w = int(l_surf.get_width() * scale)
             h = int(l_surf.get_height() * scale)
             l_surf = pygame.transform.scale(l_surf, (w, h))
-            screen.blit(l_surf, (WIDTH//2 - w//2, HEIGHT//3))
-            
-        chat.draw(screen, 20, HEIGHT - 220)
-        facecam.draw(screen, WIDTH - 180, HEIGHT - 140)
+            surface.blit(l_surf, (field.centerx - w//2, field.top + field.height//3))
+
+        self.chat.draw(surface, *layout.chat_pos)
+        self.facecam.draw(surface, *layout.facecam_pos)
+
+        if self.game_over:
+            surface.blit(get_overlay((width, height)), (0,0))
+            t1 = self.render_text(self.font_huge, "WASTED", NEON_RED)
+            t2 = self.render_text(self.font_big, f"FINAL SCORE: {self.score}", NEON_CYAN)
+            surface.blit(t1, (width//2 - t1.get_width()//2, height//2 - 60))
+            surface.blit(t2, (width//2 - t2.get_width()//2, height//2 + 40))
+
+def plan_renditions(renditions):
+    """
+    Works out which frame streams a set of renditions needs. Renditions with
+    the game's aspect ratio, no larger than it (and thumbnails), are cut from
+    the native stream, which FFmpeg scales down as needed; every other output
+    size gets its own stream drawn with a Layout for that size. Upscaled
+    outputs get one too, so the HUD keeps its size and stays sharp instead of
+    being blown up with the playfield (see main.degrade_config).
+
+    Returns:
+        tuple: (layouts, stream_of) - a Layout per extra stream (stream 0, the
+        native one, has none) and the stream index of each rendition.
+    """
+    layouts = []
+    sizes = {}
+    stream_of = []
+    for r in renditions:
+        w, h = r.get('width'), r.get('height')
+        if r.get('kind', 'video') == 'video' and w and h:
+            layout = Layout(w, h)
+            if layout.field.size != layout.size or w > WIDTH:
+                if (w, h) not in sizes:
+                    layouts.append(layout)
+                    sizes[(w, h)] = len(layouts)
+                stream_of.append(sizes[(w, h)])
+                continue
+        stream_of.append(0)
+    return layouts, stream_of
+
+def rendition_args(renditions, stream_of, thumb_every, outputs, native=True):
+    """
+    Builds the FFmpeg filter graph and output options that cut every rendition
+    from its frame stream in a single process, writing each to its entry in
+    outputs (the FFmpeg arguments naming where it goes: a path, or a format
+    and a pipe). Video outputs carry no audio (see SoundtrackMux). native:
+    whether input 0 is the game's own frame stream (else a laid-out one).
+    """
+    graph = []
+    sources = {}
+    for i in sorted(set(stream_of)):
+        uses = stream_of.count(i)
+        if uses > 1:
+            labels = [f"[s{i}_{k}]" for k in range(uses)]
+            graph.append(f"[{i}:v]split={uses}" + "".join(labels))
+            sources[i] = labels
+        else:
+            sources[i] = [f"[{i}:v]"]
+
+    args = []
+    for n, (r, i) in enumerate(zip(renditions, stream_of)):
+        src = sources[i].pop(0)
+        if r.get('kind', 'video') == 'thumbnails':
+            count = r.get('count', 5)
+            graph.append(f"{src}select='not(mod(n,{thumb_every}))',scale={r.get('width', 160)}:-2,"
+                         f"tile={count}x1[o{n}]")
+            args += ["-map", f"[o{n}]", "-frames:v", "1", "-update", "1", *outputs[n]]
+            continue
+
+        w, h = r.get('width'), r.get('height')
+        if native and i == 0 and (w or h) and (w, h) != (WIDTH, HEIGHT):
+            # yuv420p needs even dimensions
+            graph.append(f"{src}scale={w // 2 * 2 if w else -2}:{h // 2 * 2 if h else -2}[o{n}]")
+            video = f"[o{n}]"
+        else:
+            video = src if src.startswith("[s") else f"{i}:v"
+        args += [
+            "-map", video,
+            *ENCODER_PROFILES[r.get('profile', 'standard')],
+            *outputs[n]
+        ]
+    return (["-filter_complex", ";".join(graph)] if graph else []) + args
+
+def find_game_over_frame(config):
+    """
+    Simulates the game without drawing and returns the index of the frame on
+    which it ends (death or time-out). Requires pygame to be initialized.
+    """
+    load_config(config)
+    game = Game(config)
+    while not game.game_over:
+        game.step()
+    return game.frame_count - 1
+
+def run_game(config, output_file="output.mp4", replay_file=None,
+             start_frame=0, end_frame=None, highlight_seconds=None, renditions=None,
+             progress=None, frame_hook=None):
+    """
+    Runs the game with the provided configuration and saves the video.
+    If replay_file is given, a compact replay is written there as well
+    (see replay.render_replay to re-render it).
+
+    Windowed render: frames before start_frame are simulated but neither drawn
+    nor encoded, and the video stops before end_frame (default: the end of the
+    game). highlight_seconds picks start_frame automatically, that many seconds
+    before the game over, so the clip is the run-up plus the WASTED screen.
+    Music and sound effects are offset to match the window.
+
+    The soundtrack is encoded separately from the video (see start_soundtrack)
+    and muxed into every video output by stream copy as it is encoded (see
+    SoundtrackMux). If the render fails or is cancelled, its outputs are deleted.
+
+    Multi-output: renditions lists extra outputs cut from the same run by the
+    same FFmpeg process, each a dict with
+      - path: output file
+      - width / height: output size (default: the game's own)
+      - profile: a name from ENCODER_PROFILES (default "standard")
+      - kind: "video" (default) or "thumbnails", a strip of `count` frames
+        (default 5) spread over the gameplay, each `width` px wide (default 160)
+    Sizes with a different aspect ratio than the game get their own frame
+    stream, laid out for that shape (see Layout). The main output uses the
+    config's `profile` (default "standard") and, if the config sets
+    output_width / output_height, is scaled to that size from the game's own.
+
+    progress: a RenderProgress to report frames, render FPS and encoder
+    speed to while the video renders (and to cancel it with).
+
+    frame_hook: called as frame_hook(game, screen) after each frame of the
+    main output has been drawn and sent to FFmpeg (see golden.py).
+    """
+    # 1. LOAD CONFIG INTO GLOBALS
+    load_config(config)
+    DURATION = config.get('duration', 15)
+    BASE_SPEED = config.get('base_speed', 10.0)
+    SEED = config.get('seed', 12345)
+
+    print(f"Starting Game | Res: {WIDTH}x{HEIGHT} | Speed: {BASE_SPEED} | Duration: {DURATION}s")
+    
+    # Initialize Pygame (Headless check)
+    if os.environ.get("SDL_VIDEODRIVER") == "dummy":
+        print("Running in Headless Mode")
+    
+    init_pygame(mixer=True)
+    screen = get_display((WIDTH, HEIGHT))
+    clock = pygame.time.Clock()
+    
+    # The main output may be encoded at a larger size than the game is drawn at (upscaled by FFmpeg)
+    main_output = {"path": output_file, "profile": config.get('profile', 'standard')}
+    if config.get('output_width') and config.get('output_height'):
+        main_output.update(width=config['output_width'], height=config['output_height'])
+    renditions = [main_output] + list(renditions or [])
+    layouts, stream_of = plan_renditions(renditions)
+    wants_thumbnails = any(r.get('kind') == 'thumbnails' for r in renditions)
+    
+    game_over_frame = None
+    if highlight_seconds is not None or wants_thumbnails:
+        game_over_frame = find_game_over_frame(config)
+    if highlight_seconds is not None:
+        start_frame = max(0, game_over_frame - int(highlight_seconds * FPS))
+    audio_offset = start_frame / FPS
+    if start_frame:
+        print(f"Windowed render | Frames: {start_frame}-{end_frame if end_frame is not None else 'end'}")
+    
+    # The soundtrack of the video is encoded on its own, in parallel with the
+    # frames (or taken from the cache), and muxed in at the end
+    soundtrack = start_soundtrack(SEED, DURATION, audio_offset)
+    
+    # Live mix through the mixer, only when there is a sound device to hear it
+    # (in memory; seeded separately so the game plays the same with or without audio)
+    live_audio = os.environ.get("SDL_AUDIODRIVER") != "dummy" and not DETERMINISTIC
+    if live_audio:
+        audio_rng = random.Random(SEED)
+        music_low, music_high = generate_dynamic_music(DURATION, rng=audio_rng)
+        sfx_death, sfx_level = get_sfx()
+        if start_frame:
+            music_low = trim_wav(music_low, audio_offset)
+            music_high = trim_wav(music_high, audio_offset)
         
-        if game_over:
-            overlay = pygame.Surface((WIDTH, HEIGHT), pygame.SRCALPHA)
-            overlay.fill((0,0,0, 180))
-            screen.blit(overlay, (0,0))
-            t1 = font_huge.render("WASTED", True, NEON_RED)
-            t2 = font_big.render(f"FINAL SCORE: {score}", True, NEON_CYAN)
-            screen.blit(t1, (WIDTH//2 - t1.get_width()//2, HEIGHT//2 - 60))
-            screen.blit(t2, (WIDTH//2 - t2.get_width()//2, HEIGHT//2 + 40))
+        chan_music_low = pygame.mixer.Channel(0)
+        chan_music_high = pygame.mixer.Channel(1)
+        snd_low = load_sound(music_low)
+        snd_high = load_sound(music_high)
+        snd_death = load_sound(sfx_death)
+        snd_level = load_sound(sfx_level)
+    
+    game = Game(config)
+    recorder = None
+    if replay_file:
+        import replay
+        recorder = replay.ReplayRecorder(config)
+    
+    # FFmpeg reads its stdin (input 0) before its other inputs whether or not
+    # an output uses it, so it gets the game's own frames only if some output
+    # is cut from them, and the first laid-out stream otherwise
+    native = 0 in stream_of
+    if not native:
+        stream_of = [i - 1 for i in stream_of]
+    canvases = [(pygame.Surface(layout.size), layout) for layout in layouts]
+    # Frame streams besides stdin
+    feeds = [FrameFeed() for _ in canvases[0 if native else 1:]]
+    stdin_size = (WIDTH, HEIGHT) if native else layouts[0].size
+    thumb_every = 1
+    if wants_thumbnails:
+        count = max(r.get('count', 5) for r in renditions if r.get('kind') == 'thumbnails')
+        last = game_over_frame if end_frame is None else min(game_over_frame, end_frame - 1)
+        thumb_every = max(1, (last - start_frame) // count)
+    
+    cmd = [
+        FFMPEG_PATH, "-y",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "-s", "{}x{}".format(*stdin_size), "-r", str(FPS),
+        *(["-probesize", "32", "-analyzeduration", "0"] if feeds else []),
+        "-i", "-",
+    ]
+    for feed, layout in zip(feeds, layouts[0 if native else 1:]):
+        # FFmpeg opens inputs one after another; don't let it probe ahead on
+        # a stream while we are blocked writing the previous one
+        cmd += [
+            "-probesize", "32", "-analyzeduration", "0",
+            "-f", "rawvideo", "-pix_fmt", "rgb24",
+            "-s", "{}x{}".format(*layout.size), "-r", str(FPS),
+            "-i", feed.input,
+        ]
+    # Video outputs go through a SoundtrackMux each, which adds the soundtrack
+    muxes = [SoundtrackMux(soundtrack, r['path']) if r.get('kind', 'video') == 'video' else None
+             for r in renditions]
+    cmd += rendition_args(renditions, stream_of, thumb_every,
+                          [mux.output if mux else [r['path']] for r, mux in zip(renditions, muxes)], native)
+    
+    pass_fds = tuple(fd for feed in feeds for fd in feed.pass_fds)
+    pass_fds += tuple(fd for mux in muxes if mux for fd in mux.pass_fds)
+    if progress:
+        progress_args, progress_fds = progress.encoder_args()
+        cmd[1:1] = progress_args
+        pass_fds += progress_fds
+        # Simulated frames go up to the end of the game plus the game over screen
+        progress.max_frames = game.max_frames + GAMEOVER_DURATION * FPS + 2
+        if end_frame is not None:
+            progress.max_frames = min(progress.max_frames, end_frame)
+    try:
+        ffmpeg = subprocess.Popen(cmd, stdin=subprocess.PIPE, pass_fds=pass_fds)
+    except FileNotFoundError:
+        print(f"Error: FFmpeg not found at {FFMPEG_PATH}")
+        for feed in feeds: feed.close()
+        for mux in muxes:
+            if mux: mux.close()
+        if progress: progress.close_encoder()
+        soundtrack.cancel()
+        return None
+    for feed in feeds: feed.start()
+    for mux in muxes:
+        if mux: mux.start()
+    if progress:
+        progress.watch_encoder(ffmpeg)
+        progress.set_stage("rendering")
+
+    finished = False
+    try:
+        frame = None
+        with gc_paused():
+            while game.running:
+                # Event Pump (Required even in headless)
+                pygame.event.pump()
             
-        pygame.display.flip()
-        if ffmpeg:
-            try: ffmpeg.stdin.write(pygame.image.tostring(screen, 'RGB'))
-            except: pass
-        frame_count += 1
-        clock.tick(FPS)
-        
-    if ffmpeg: ffmpeg.stdin.close(); ffmpeg.wait()
-    pygame.quit()
-    try: 
-        import shutil
-        shutil.rmtree(temp_dir)
-        logger.info(f"Cleaned up temp directory: {temp_dir}")
-    except Exception as e:
-        logger.warning(f"Failed to clean up temp directory {temp_dir}: {e}")
+                index = game.frame_count
+                if end_frame is not None and index >= end_frame: break
+                if progress and progress.cancelled: break
+                events = game.step()
+                if recorder: recorder.record(game)
+                if progress: progress.advance(game.frame_count)
+                # Fast-forward: simulate only until the window starts
+                if index < start_frame: continue
+                if live_audio:
+                    if index == start_frame:
+                        chan_music_low.play(snd_low, loops=-1)
+                        chan_music_high.play(snd_high, loops=-1)
+                        chan_music_high.set_volume(0)
+                
+                    if 'level_up' in events: snd_level.play()
+                    if 'death' in events: snd_death.play()
+                
+                    # Dynamic Music Mix based on speed
+                    mix = min(1.0, max(0.0, (game.speed - (BASE_SPEED + 2)) / 5.0))
+                    chan_music_low.set_volume(1.0 - mix)
+                    chan_music_high.set_volume(mix)
+            
+                if canvases:
+                    game.draw_layouts(screen, canvases)
+                    changed = True
+                else:
+                    changed = game.draw(screen)
+                pygame.display.flip()
+                # Unchanged game-over frames are sent again as they are
+                if changed or frame is None:
+                    frame = pygame.image.tostring(screen if native else canvases[0][0], 'RGB')
+                try: ffmpeg.stdin.write(frame)
+                except (BrokenPipeError, OSError): pass  # its exit code tells
+                for feed, (canvas, _) in zip(feeds, canvases[0 if native else 1:]):
+                    feed.put(pygame.image.tostring(canvas, 'RGB'))
+                if frame_hook: frame_hook(game, screen)
+                # Real-time pacing keeps the live mix in step; nothing is heard in deterministic mode
+                clock.tick(0 if DETERMINISTIC else FPS)
+                if progress: progress.busy += clock.get_rawtime() / 1000
+            
+        try: ffmpeg.stdin.close()
+        except BrokenPipeError: pass  # FFmpeg was killed
+        for feed in feeds: feed.close()
+        ffmpeg.wait()
+        if progress and progress.cancelled:
+            raise RenderCancelled(progress.cancelled)
+        if ffmpeg.returncode != 0:
+            raise RuntimeError(f"FFmpeg exited with code {ffmpeg.returncode} while encoding {output_file}")
+        if progress: progress.set_stage("muxing")
+        for mux in muxes:
+            if mux: mux.close()
+        finished = True
+    finally:
+        if not finished:
+            if ffmpeg.poll() is None: ffmpeg.kill()
+            try: ffmpeg.stdin.close()
+            except (BrokenPipeError, OSError): pass
+            for feed in feeds: feed.close()
+            ffmpeg.wait()
+            for mux in muxes:
+                if mux: mux.abort()
+            soundtrack.cancel()
+            for r in renditions:
+                if os.path.exists(r['path']): os.remove(r['path'])
+        quit_pygame()
+    if recorder:
+        recorder.save(replay_file)
+        logger.info(f"Saved replay: {replay_file}")
     print(f"Done. Saved {output_file}")
     return output_file
 
+PREVIEW_FORMATS = {
+    # GIF needs a per-clip palette for the neon colours to survive
+    "gif": ["-vf", "split[a][b];[a]palettegen=max_colors=128[p];[b][p]paletteuse=dither=none", "-loop", "0"],
+    "webp": ["-c:v", "libwebp", "-lossless", "0", "-q:v", "50", "-loop", "0"],
+}
+
+def run_preview(config, output_file="preview.gif", thumbnail_file="preview.jpg",
+                scale=0.25, fps=10, keyframes_only=False):
+    """
+    Renders a cheap preview of the game that run_game would produce for config.
+
+    The game is simulated frame by frame as usual, but only sampled frames are
+    drawn, shrunk by scale and encoded as an animated GIF/WebP (chosen by the
+    extension of output_file). No audio is synthesized and nothing is throttled
+    to real time, so a preview takes a small fraction of a full render.
+
+    Args:
+        config: Game config (same dict run_game takes).
+        output_file: Path of the animated preview (.gif or .webp).
+        thumbnail_file: Path of the poster frame (the death / game over moment).
+        scale: Size of the preview relative to the configured resolution.
+        fps: Preview frame rate when sampling at regular intervals.
+        keyframes_only: If True, only frames with a level-up, near-miss or the
+            death moment are drawn (plus the first frame), shown 2 per second.
+
+    Returns:
+        tuple: (output_file, thumbnail_file), or None if FFmpeg is missing.
+    """
+    load_config(config)
+    fmt = os.path.splitext(output_file)[1].lstrip('.').lower()
+    if fmt not in PREVIEW_FORMATS:
+        raise ValueError(f"Unsupported preview format: {fmt}")
+
+    init_pygame()
+
+    canvas = pygame.Surface((WIDTH, HEIGHT))
+    size = (max(2, int(WIDTH * scale)) // 2 * 2, max(2, int(HEIGHT * scale)) // 2 * 2)
+    frame_step = max(1, round(FPS / fps))
+    out_fps = 2 if keyframes_only else FPS / frame_step
+
+    game = Game(config)
+
+    cmd = [
+        FFMPEG_PATH, "-y", "-loglevel", "error",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "-s", f"{size[0]}x{size[1]}", "-r", str(out_fps),
+        "-i", "-", *PREVIEW_FORMATS[fmt],
+        output_file
+    ]
+    try:
+        ffmpeg = subprocess.Popen(cmd, stdin=subprocess.PIPE)
+    except FileNotFoundError:
+        print(f"Error: FFmpeg not found at {FFMPEG_PATH}")
+        return None
+
+    poster_saved = False
+    with gc_paused():
+        while game.running:
+            index = game.frame_count
+            events = game.step()
+
+            if keyframes_only:
+                wanted = index == 0 or bool(events)
+            else:
+                wanted = index % frame_step == 0
+            poster = game.game_over and not poster_saved
+            if not (wanted or poster):
+                continue
+
+            game.draw(canvas)
+            if poster:
+                thumb_size = (int(WIDTH * min(1.0, scale * 2)), int(HEIGHT * min(1.0, scale * 2)))
+                pygame.image.save(pygame.transform.smoothscale(canvas, thumb_size), thumbnail_file)
+                poster_saved = True
+            if wanted:
+                small = pygame.transform.smoothscale(canvas, size)
+                try: ffmpeg.stdin.write(pygame.image.tostring(small, 'RGB'))
+                except BrokenPipeError: break
+
+    ffmpeg.stdin.close(); ffmpeg.wait()
+    quit_pygame()
+    if ffmpeg.returncode != 0:
+        raise RuntimeError(f"FFmpeg exited with code {ffmpeg.returncode} while encoding preview")
+    print(f"Preview saved {output_file} (poster {thumbnail_file})")
+    return output_file, thumbnail_file
+
 if __name__ == "__main__":
     import config_generator
     cfg = config_generator.generate_config()
-    run_game(cfg, "recording_test.mp4")
\ No newline at end of file
+    run_game(cfg, "recording_test.mp4")
@@ -0,0 +1,193 @@
+# fake_youtube.py
+# A local stand-in for the YouTube upload endpoint, for exercising uploads without Google.
+#
+#   python fake_youtube.py --port 8099 --quota 10000
+#   YOUTUBE_API_ENDPOINT=http://127.0.0.1:8099 python worker.py
+#
+# Speaks the resumable upload protocol used by youtube_uploader (session
+# start, chunked PUTs answered with 308 until the last one), charges every
+# videos.insert to a daily quota and answers quotaExceeded once it is spent.
+# --failure-rate makes that share of requests fail with a 503, to exercise retries.
+
+import argparse
+import json
+import random
+import re
+import threading
+import time
+import uuid
+import logging
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+logger = logging.getLogger("app.fake_youtube")
+
+class FakeYouTube:
+    """State of the fake service: open upload sessions, finished videos, quota spent."""
+    def __init__(self, quota=10000, upload_cost=1600, latency=0.0, bandwidth=None, failure_rate=0.0):
+        self.quota = quota
+        self.upload_cost = upload_cost
+        self.latency = latency
+        self.bandwidth = bandwidth  # bytes per second, None for unlimited
+        self.failure_rate = failure_rate
+        self.failures = 0
+        self.quota_used = 0
+        self.sessions = {}
+        self.videos = {}
+        self.bytes_received = 0
+        self.active = 0
+        self.peak_active = 0
+        self.lock = threading.Lock()
+
+    def stats(self):
+        with self.lock:
+            return {
+                "videos": len(self.videos),
+                "open_sessions": len(self.sessions),
+                "bytes_received": self.bytes_received,
+                "quota_used": self.quota_used,
+                "quota": self.quota,
+                "peak_concurrent_uploads": self.peak_active,
+                "injected_failures": self.failures,
+            }
+
+    def should_fail(self):
+        """Whether to fail the current request (at failure_rate)."""
+        if self.failure_rate and random.random() < self.failure_rate:
+            with self.lock:
+                self.failures += 1
+            return True
+        return False
+
+class Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+    service = None  # set by make_server
+
+    def log_message(self, format, *args):
+        logger.debug(format % args)
+
+    def _reply(self, code, body=None, headers=None):
+        data = json.dumps(body).encode("utf-8") if body is not None else b""
+        self.send_response(code)
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        if body is not None:
+            self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def _backend_error(self):
+        self._reply(503, {"error": {"code": 503, "message": "Backend Error",
+                                    "errors": [{"reason": "backendError", "domain": "global"}]}})
+
+    def _read_body(self):
+        length = int(self.headers.get("Content-Length", 0))
+        data = self.rfile.read(length) if length else b""
+        if self.service.bandwidth:
+            time.sleep(len(data) / self.service.bandwidth)
+        return data
+
+    def do_GET(self):
+        if self.path == "/stats":
+            self._reply(200, self.service.stats())
+        else:
+            self._reply(404, {"error": {"code": 404, "message": "Not found"}})
+
+    def do_POST(self):
+        service = self.service
+        body = self._read_body()
+        if self.service.latency:
+            time.sleep(self.service.latency)
+        if not self.path.startswith("/upload/youtube/v3/videos"):
+            self._reply(404, {"error": {"code": 404, "message": "Not found"}})
+            return
+        if service.should_fail():
+            self._backend_error()
+            return
+        with service.lock:
+            if service.quota_used + service.upload_cost > service.quota:
+                over = True
+            else:
+                over = False
+                service.quota_used += service.upload_cost
+                session_id = uuid.uuid4().hex
+                service.sessions[session_id] = {"metadata": json.loads(body or b"{}"), "received": 0}
+        if over:
+            self._reply(403, {"error": {"code": 403, "message": "The request cannot be completed because you have exceeded your quota.",
+                                        "errors": [{"reason": "quotaExceeded", "domain": "youtube.quota"}]}})
+            return
+        host = self.headers.get("Host", f"127.0.0.1:{self.server.server_address[1]}")
+        self._reply(200, headers={"Location": f"http://{host}/upload/session/{session_id}"})
+
+    def do_PUT(self):
+        service = self.service
+        match = re.match(r"^/upload/session/(\w+)", self.path)
+        with service.lock:
+            session = service.sessions.get(match.group(1)) if match else None
+            if session:
+                service.active += 1
+                service.peak_active = max(service.peak_active, service.active)
+        if session is None:
+            self._reply(404, {"error": {"code": 404, "message": "Upload session not found"}})
+            return
+        try:
+            data = self._read_body()
+            if service.latency:
+                time.sleep(service.latency)
+            if service.should_fail():
+                # The chunk is lost; the client asks where to resume from
+                self._backend_error()
+                return
+            # "bytes first-last/total" (or "bytes */total" for a status query)
+            total = None
+            content_range = self.headers.get("Content-Range", "")
+            m = re.match(r"bytes (?:(\d+)-(\d+)|\*)/(\d+|\*)", content_range)
+            if m and m.group(3) != "*":
+                total = int(m.group(3))
+            with service.lock:
+                session["received"] += len(data)
+                service.bytes_received += len(data)
+                received = session["received"]
+                if total is None or received < total:
+                    headers = {"Range": f"bytes=0-{received - 1}"} if received else {}
+                    done = False
+                else:
+                    done = True
+                    video_id = uuid.uuid4().hex[:11]
+                    service.videos[video_id] = session["metadata"]
+                    del service.sessions[match.group(1)]
+        finally:
+            with service.lock:
+                service.active -= 1
+        if done:
+            self._reply(200, {"kind": "youtube#video", "id": video_id, **service.videos[video_id]})
+        else:
+            self._reply(308, headers=headers)
+
+def make_server(port=8099, host="127.0.0.1", **options):
+    """Builds (but does not start) a fake server. Its .service holds the state."""
+    handler = type("FakeYouTubeHandler", (Handler,), {"service": FakeYouTube(**options)})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.service = handler.service
+    return server
+
+def start_in_thread(port=0, **options):
+    """Starts a fake server on a background thread. Returns (server, endpoint URL)."""
+    server = make_server(port, **options)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server, f"http://127.0.0.1:{server.server_address[1]}"
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run a fake YouTube upload endpoint.")
+    parser.add_argument("--port", type=int, default=8099)
+    parser.add_argument("--quota", type=int, default=10000, help="Daily quota units")
+    parser.add_argument("--upload-cost", type=int, default=1600, help="Units per videos.insert")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds added to every request")
+    parser.add_argument("--bandwidth", type=float, default=None, help="Upload bytes per second")
+    parser.add_argument("--failure-rate", type=float, default=0.0, help="Share of requests answered with a 503")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    server = make_server(args.port, quota=args.quota, upload_cost=args.upload_cost,
+                         latency=args.latency, bandwidth=args.bandwidth, failure_rate=args.failure_rate)
+    print(f"Fake YouTube listening on http://127.0.0.1:{args.port} (GET /stats for counters)")
+    server.serve_forever()
@@ -0,0 +1,291 @@
+# golden.py
+# Golden-frame determinism suite: renders fixed games in deterministic mode and
+# checks every frame, and the soundtrack under it, against stored digests.
+#
+#   python golden.py            # verify against golden_digests.json
+#   python golden.py --update   # re-record after a change that is meant to alter the output
+#   python golden.py --tail-games 25   # game-over frames (Game.draw_tail) against full redraws
+#
+# Each frame gets digests of its pixels (whole frame, chat and facecam areas),
+# of the game state behind it (player, obstacles, particles, chat, facecam,
+# score) and of the soundtrack samples that play over it. A mismatch reports
+# the first frame that differs and in which of those components, so a drawing
+# change shows up as pixels differing over the same game state.
+#
+# Every frame is also drawn in full (reference mode) and must match what the
+# renderer drew with its shortcuts (see Game.draw_tail); goldens are only
+# recorded when it does, so they never store an artifact of a faster path.
+
+import argparse
+import hashlib
+import json
+import os
+import platform
+import struct
+import sys
+import tempfile
+
+import dodger
+
+GOLDEN_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "golden_digests.json")
+
+# Fixed games covering a time-out, a death with its particle burst, and a
+# windowed render (fast-forward, level-ups, audio offset)
+_SETTINGS = {"width": 480, "height": 854, "fps": 30, "max_duration": 40, "tail_duration": 3,
+             "base_speed": 12.0, "speed_ramp": 100.0}
+CASES = {
+    "timeout": {
+        "config": dict(_SETTINGS, seed=1, duration=6, ai_skill=1.1,
+                       theme={"bg": (10, 10, 18), "grid": (40, 0, 60), "accent": (0, 255, 255)}),
+    },
+    "death": {
+        "config": dict(_SETTINGS, seed=14, duration=12, ai_skill=1.05, base_speed=20.0,
+                       theme={"bg": (20, 5, 5), "grid": (60, 0, 0), "accent": (255, 50, 50)}),
+    },
+    "highlight": {
+        "config": dict(_SETTINGS, seed=11, duration=34, ai_skill=1.05,
+                       theme={"bg": (25, 10, 30), "grid": (80, 0, 80), "accent": (255, 100, 200)}),
+        "highlight_seconds": 2,
+    },
+}
+
+# Game state first, then pixels, then sound: the order mismatches are reported in
+COMPONENTS = ("player", "obstacles", "particles", "chat", "facecam", "score",
+              "pixels", "chat_pixels", "facecam_pixels", "audio")
+PIXEL_COMPONENTS = ("pixels", "chat_pixels", "facecam_pixels")
+
+def _digest(data):
+    if not isinstance(data, bytes):
+        data = repr(data).encode()
+    return hashlib.blake2b(data, digest_size=8).hexdigest()
+
+def environment():
+    """What besides the code decides the pixels; goldens only carry over between equal ones."""
+    import pygame
+    return {
+        "pygame": pygame.version.ver,
+        "sdl": ".".join(map(str, pygame.get_sdl_version())),
+        "python": platform.python_version(),
+    }
+
+def state_digests(game):
+    """Digests of the game state behind a frame, by component."""
+    player, chat, facecam, level_mgr = game.player, game.chat, game.facecam, game.level_mgr
+    return {
+        "player": _digest((tuple(player.rect), player.y_float, player.velocity, tuple(player.trail),
+                           player.wobble, player.blinking, player.face_seed)),
+        "obstacles": _digest([(tuple(o.rect), o.x_float, o.color, o.passed) for o in game.obstacles]),
+        "particles": _digest([(p.x, p.y, p.vx, p.vy, p.life, p.color) for p in game.particles]),
+        "chat": _digest(([(m.user, m.text, m.color, m.slide, m.alpha, m.life) for m in chat.messages],
+                         chat.timer, chat.next_msg_time)),
+        "facecam": _digest((facecam.state, facecam.shake, facecam.bob_timer, facecam.blink_timer,
+                            facecam.blinking, facecam.frozen)),
+        "score": _digest((game.score, level_mgr.level, level_mgr.xp, level_mgr.level_text_timer,
+                          game.speed, game.grid_offset, game.game_over, game.game_over_timer)),
+    }
+
+def pixel_digests(surface):
+    """Digests of a drawn frame: all of it, and its chat and facecam areas."""
+    import pygame
+    layout = dodger.Layout(*surface.get_size())
+    chat_area = dodger.get_chat_backdrop().get_rect(topleft=layout.chat_pos).clip(surface.get_rect())
+    facecam_area = pygame.Rect(*layout.facecam_pos, 160, 120).clip(surface.get_rect())
+    return {
+        "pixels": _digest(pygame.image.tobytes(surface, "RGB")),
+        "chat_pixels": _digest(pygame.image.tobytes(surface.subsurface(chat_area), "RGB")),
+        "facecam_pixels": _digest(pygame.image.tobytes(surface.subsurface(facecam_area), "RGB")),
+    }
+
+def audio_digests(wav, frames, fps):
+    """Digests of the soundtrack samples under each of `frames` video frames."""
+    sr = struct.unpack_from("<I", wav, 24)[0]
+    pcm = wav[44:]
+    digests = []
+    for i in range(frames):
+        # Mono 16-bit samples
+        start, end = 2 * (i * sr // fps), 2 * ((i + 1) * sr // fps)
+        digests.append(_digest(pcm[start:end]))
+    return digests
+
+def fingerprint(config, highlight_seconds=None):
+    """
+    Renders config in deterministic mode and returns two fingerprints, each
+    {"first_frame", "frames", "digests": {component: [digest per frame]}}:
+    the frames run_game drew and sent to FFmpeg, and the reference, the same
+    frames drawn in full (draw_playfield + draw_hud). Both share the game
+    state and audio digests; only their pixels can differ.
+    """
+    import pygame
+    dodger.set_deterministic(True)
+    digests = {name: [] for name in COMPONENTS}
+    reference = {name: [] for name in PIXEL_COMPONENTS}
+    indices = []
+    full = None
+
+    def hook(game, screen):
+        nonlocal full
+        if full is None or full.get_size() != screen.get_size():
+            full = pygame.Surface(screen.get_size())
+        game.draw_playfield(full)
+        game.draw_hud(full, dodger.Layout(*screen.get_size()))
+        indices.append(game.frame_count - 1)
+        for name, value in state_digests(game).items():
+            digests[name].append(value)
+        for name, value in pixel_digests(screen).items():
+            digests[name].append(value)
+        for name, value in pixel_digests(full).items():
+            reference[name].append(value)
+
+    fd, output_path = tempfile.mkstemp(suffix=".mp4", prefix="golden_")
+    os.close(fd)
+    try:
+        if dodger.run_game(config, output_path, highlight_seconds=highlight_seconds, frame_hook=hook) is None:
+            raise RuntimeError("FFmpeg not available")
+    finally:
+        if os.path.exists(output_path):
+            os.remove(output_path)
+    first = indices[0] if indices else 0
+    fps = config.get("fps", 30)
+    wav = dodger.soundtrack_pcm(config.get("seed", 12345), config.get("duration", 15), first / fps)
+    digests["audio"] = audio_digests(wav, len(indices), fps)
+    rendered = {"first_frame": first, "frames": len(indices), "digests": digests}
+    return rendered, {"first_frame": first, "frames": len(indices), "digests": dict(digests, **reference)}
+
+def first_divergence(expected, actual):
+    """
+    The first frame (absolute index) at which two fingerprints differ and the
+    components that differ there, or None if they match.
+    """
+    if expected["first_frame"] != actual["first_frame"]:
+        return min(expected["first_frame"], actual["first_frame"]), ["window"]
+    common = min(expected["frames"], actual["frames"])
+    for i in range(common):
+        differing = [name for name in COMPONENTS
+                     if expected["digests"][name][i] != actual["digests"][name][i]]
+        if differing:
+            return expected["first_frame"] + i, differing
+    if expected["frames"] != actual["frames"]:
+        return expected["first_frame"] + common, ["length"]
+    return None
+
+def describe(divergence, expected, actual):
+    frame, components = divergence
+    if components == ["window"]:
+        return f"render starts at frame {actual['first_frame']}, expected {expected['first_frame']}"
+    if components == ["length"]:
+        return f"{actual['frames']} frames rendered, expected {expected['frames']} (first extra/missing: {frame})"
+    state = [c for c in components if not c.endswith("pixels") and c != "audio"]
+    note = "" if state or "audio" in components else " (drawing only: same game state)"
+    return f"frame {frame} differs in {', '.join(components)}{note}"
+
+def tail_mismatches(config):
+    """
+    Frames of the game-over screen where Game.draw (which redraws only what
+    changed, see Game.draw_tail) differs from a full draw_playfield +
+    draw_hud. Returns their indices.
+    """
+    import pygame
+    dodger.load_config(config)
+    game = dodger.Game(config)
+    size = (dodger.WIDTH, dodger.HEIGHT)
+    screen, full = pygame.Surface(size), pygame.Surface(size)
+    layout = dodger.Layout(*size)
+    mismatches = []
+    while game.running:
+        game.step()
+        if not game.game_over:
+            continue
+        game.draw(screen)
+        game.draw_playfield(full)
+        game.draw_hud(full, layout)
+        if pygame.image.tobytes(screen, "RGB") != pygame.image.tobytes(full, "RGB"):
+            mismatches.append(game.frame_count - 1)
+    return mismatches
+
+def check_tails(games):
+    """Runs tail_mismatches over the golden cases and `games` generated games. Returns the failures."""
+    import random
+    import config_generator
+    rng_state = random.getstate()
+    random.seed(0)  # the same generated games every run
+    configs = [(name, case["config"]) for name, case in CASES.items()]
+    configs += [(f"generated {i}", config_generator.generate_config()) for i in range(games)]
+    random.setstate(rng_state)
+    failed = 0
+    for name, config in configs:
+        mismatches = tail_mismatches(config)
+        if mismatches:
+            failed += 1
+            print(f"tail {name} (seed {config['seed']}): MISMATCH, draw() differs from a full redraw "
+                  f"on {len(mismatches)} frames, first {mismatches[0]}")
+        else:
+            print(f"tail {name} (seed {config['seed']}): OK")
+    return failed
+
+def load_golden(path=None):
+    with open(path or GOLDEN_PATH) as f:
+        return json.load(f)
+
+def main():
+    parser = argparse.ArgumentParser(description="Check renders against the golden frame digests.")
+    parser.add_argument("--update", action="store_true", help="Record new golden digests instead of checking")
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="Only this case (repeatable)")
+    parser.add_argument("--golden", default=GOLDEN_PATH, help="Golden digests file")
+    parser.add_argument("--tail-games", type=int, default=None, metavar="N",
+                        help="Instead, check the game-over frames of the cases and N generated games against full redraws")
+    args = parser.parse_args()
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    os.environ.setdefault("SDL_AUDIODRIVER", "dummy")
+
+    if args.tail_games is not None:
+        import pygame
+        dodger.set_deterministic(True)
+        pygame.font.init()
+        sys.exit(1 if check_tails(args.tail_games) else 0)
+
+    names = args.case or list(CASES)
+    golden = {"environment": {}, "cases": {}}
+    if os.path.exists(args.golden):
+        golden = load_golden(args.golden)
+    elif not args.update:
+        sys.exit(f"No golden digests at {args.golden}; record them with --update")
+
+    failed = 0
+    for name in names:
+        case = CASES[name]
+        actual, reference = fingerprint(case["config"], case.get("highlight_seconds"))
+        # Reference mode: whatever shortcuts the renderer takes, it must draw what a full redraw does
+        divergence = first_divergence(reference, actual)
+        if divergence is not None:
+            print(f"{name}: MISMATCH with the full redraw, {describe(divergence, reference, actual)}")
+            failed += 1
+            continue
+        if args.update:
+            golden["cases"][name] = actual
+            print(f"{name}: recorded {actual['frames']} frames")
+            continue
+        expected = golden["cases"].get(name)
+        if expected is None:
+            print(f"{name}: no golden digests recorded")
+            failed += 1
+            continue
+        divergence = first_divergence(expected, actual)
+        if divergence is None:
+            print(f"{name}: OK ({actual['frames']} frames)")
+        else:
+            print(f"{name}: MISMATCH, {describe(divergence, expected, actual)}")
+            failed += 1
+
+    if args.update:
+        if failed:
+            sys.exit("Not recording: the renderer does not match its full redraws")
+        golden["environment"] = environment()
+        with open(args.golden, "w") as f:
+            json.dump(golden, f, separators=(",", ":"))
+        return
+    if failed and golden.get("environment") != environment():
+        print(f"Note: the goldens were recorded with {golden.get('environment')}, this is {environment()}")
+    sys.exit(1 if failed else 0)
+
+if __name__ == "__main__":
+    main()
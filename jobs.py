@@ -0,0 +1,250 @@
+# jobs.py
+# Durable job queue: SQLite on the local disk of one host, claimed by worker processes with leases.
+
+import json
+import os
+import sqlite3
+import time
+import uuid
+import logging
+
+logger = logging.getLogger("app.jobs")
+
+# Where the queue lives; point every API / worker process at the same file
+DB_PATH = os.environ.get("JOBS_DB_PATH", "jobs.db")
+
+# A worker must heartbeat within this many seconds or its job is handed to someone else
+LEASE_SECONDS = float(os.environ.get("JOBS_LEASE_SECONDS", 60))
+MAX_ATTEMPTS = int(os.environ.get("JOBS_MAX_ATTEMPTS", 3))
+
+# Job lifecycle: queued -> rendering -> uploading -> done, or failed once out of attempts.
+# A job whose lease runs out in rendering/uploading goes back to queued.
+QUEUED = "queued"
+RENDERING = "rendering"
+UPLOADING = "uploading"
+DONE = "done"
+FAILED = "failed"
+ACTIVE_STATES = (RENDERING, UPLOADING)
+
+# "generate" keeps the rendered video for download, "generate_and_upload" uploads it to YouTube
+KINDS = ("generate", "generate_and_upload")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id            TEXT PRIMARY KEY,
+    kind          TEXT NOT NULL,
+    params        TEXT NOT NULL,
+    state         TEXT NOT NULL,
+    attempts      INTEGER NOT NULL DEFAULT 0,
+    max_attempts  INTEGER NOT NULL,
+    worker        TEXT,
+    lease_expires REAL,
+    heartbeat_at  REAL,
+    output_path   TEXT,
+    progress      TEXT,
+    result        TEXT,
+    error         TEXT,
+    created_at    REAL NOT NULL,
+    updated_at    REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS jobs_state ON jobs (state, created_at);
+"""
+
+def _row_to_job(row):
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    job["result"] = json.loads(job["result"]) if job["result"] else None
+    job["progress"] = json.loads(job["progress"]) if job["progress"] else None
+    return job
+
+class JobQueue:
+    """
+    A persistent job queue in one SQLite file.
+
+    Every state change is a single transaction, so any number of API and
+    worker processes on the same host can share it. A
+    worker owns a job only while its lease lasts; heartbeat() extends the
+    lease, and claim() first returns jobs with expired leases to the queue,
+    so the work of a crashed worker is picked up again automatically.
+
+    The queue is single-host: it runs in WAL mode, whose shared-memory index
+    only works between processes on one machine. Keep the file on a local
+    disk, or a volume shared by containers on one host; never a network
+    filesystem (NFS, SMB, EFS) mounted by several nodes.
+    """
+    def __init__(self, path=None):
+        self.path = path or DB_PATH
+        db = sqlite3.connect(self.path, timeout=30)
+        try:
+            db.execute("PRAGMA journal_mode=WAL")
+            db.executescript(SCHEMA)
+            # Queues created before progress reporting
+            if "progress" not in [c[1] for c in db.execute("PRAGMA table_info(jobs)")]:
+                db.execute("ALTER TABLE jobs ADD COLUMN progress TEXT")
+        finally:
+            db.close()
+
+    def _connect(self, write=True):
+        """
+        A transaction on the queue. Writes take the database's write lock up
+        front (IMMEDIATE); reads don't take it at all, so status polls never
+        hold up claims, heartbeats or progress reports.
+        """
+        db = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        db.row_factory = sqlite3.Row
+        return _Transaction(db, "IMMEDIATE" if write else "DEFERRED")
+
+    def enqueue(self, kind, params=None, max_attempts=None):
+        """Adds a job. Returns its id."""
+        if kind not in KINDS:
+            raise ValueError(f"Unknown job kind: {kind}")
+        job_id = str(uuid.uuid4())
+        now = time.time()
+        with self._connect() as db:
+            db.execute(
+                "INSERT INTO jobs (id, kind, params, state, max_attempts, created_at, updated_at) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?)",
+                (job_id, kind, json.dumps(params or {}), QUEUED, max_attempts or MAX_ATTEMPTS, now, now)
+            )
+        logger.info(f"Queued {kind} job {job_id}")
+        return job_id
+
+    def get(self, job_id):
+        """Returns a job as a dict, or None."""
+        with self._connect(write=False) as db:
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (job_id,)).fetchone()
+        return _row_to_job(row) if row else None
+
+    def list(self, state=None, limit=100):
+        """Returns the most recent jobs, optionally only those in one state."""
+        with self._connect(write=False) as db:
+            if state:
+                rows = db.execute("SELECT * FROM jobs WHERE state = ? ORDER BY created_at DESC LIMIT ?",
+                                  (state, limit)).fetchall()
+            else:
+                rows = db.execute("SELECT * FROM jobs ORDER BY created_at DESC LIMIT ?", (limit,)).fetchall()
+        return [_row_to_job(r) for r in rows]
+
+    def counts(self):
+        """Returns the number of jobs in each state."""
+        with self._connect(write=False) as db:
+            rows = db.execute("SELECT state, COUNT(*) FROM jobs GROUP BY state").fetchall()
+        return {state: n for state, n in rows}
+
+    def requeue_expired(self, db=None):
+        """
+        Hands jobs whose worker stopped heartbeating back to the queue (or
+        fails them when they are out of attempts). Returns how many it found.
+        """
+        if db is None:
+            with self._connect() as db:
+                return self.requeue_expired(db)
+        now = time.time()
+        expired = db.execute(
+            f"SELECT id, worker, attempts, max_attempts FROM jobs "
+            f"WHERE state IN ({','.join('?' * len(ACTIVE_STATES))}) AND lease_expires < ?",
+            (*ACTIVE_STATES, now)
+        ).fetchall()
+        for job_id, worker, attempts, max_attempts in expired:
+            state = QUEUED if attempts < max_attempts else FAILED
+            db.execute(
+                "UPDATE jobs SET state = ?, worker = NULL, lease_expires = NULL, error = ?, updated_at = ? "
+                "WHERE id = ?",
+                (state, f"Lease expired on worker {worker}", now, job_id)
+            )
+            logger.warning(f"Job {job_id} lost its worker {worker}; now {state}")
+        return len(expired)
+
+    def claim(self, worker, lease_seconds=None):
+        """
+        Takes the oldest queued job for `worker` and moves it to rendering.
+        Returns the job, or None if the queue is empty.
+        """
+        lease = lease_seconds or LEASE_SECONDS
+        with self._connect() as db:
+            self.requeue_expired(db)
+            row = db.execute("SELECT * FROM jobs WHERE state = ? ORDER BY created_at LIMIT 1",
+                             (QUEUED,)).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            db.execute(
+                "UPDATE jobs SET state = ?, worker = ?, attempts = attempts + 1, lease_expires = ?, "
+                "heartbeat_at = ?, progress = NULL, updated_at = ? WHERE id = ?",
+                (RENDERING, worker, now + lease, now, now, row["id"])
+            )
+            row = db.execute("SELECT * FROM jobs WHERE id = ?", (row["id"],)).fetchone()
+        logger.info(f"Worker {worker} claimed job {row['id']} (attempt {row['attempts']})")
+        return _row_to_job(row)
+
+    def _update_owned(self, job_id, owner, **fields):
+        """Updates a job only if `owner` still holds its lease. Returns whether it did."""
+        fields["updated_at"] = time.time()
+        assignments = ", ".join(f"{name} = ?" for name in fields)
+        with self._connect() as db:
+            cur = db.execute(
+                f"UPDATE jobs SET {assignments} WHERE id = ? AND worker = ? "
+                f"AND state IN ({','.join('?' * len(ACTIVE_STATES))})",
+                (*fields.values(), job_id, owner, *ACTIVE_STATES)
+            )
+        return cur.rowcount == 1
+
+    def heartbeat(self, job_id, worker, lease_seconds=None):
+        """
+        Extends the lease of a running job. Returns False if the worker has
+        lost the job (its lease expired and it was requeued).
+        """
+        now = time.time()
+        return self._update_owned(job_id, worker, heartbeat_at=now,
+                                  lease_expires=now + (lease_seconds or LEASE_SECONDS))
+
+    def report_progress(self, job_id, worker, progress):
+        """
+        Records how far a running job has got (a JSON-able dict, see
+        worker.JobProgress). Returns False if the worker no longer owns it.
+        """
+        return self._update_owned(job_id, worker, progress=json.dumps(progress))
+
+    def set_state(self, job_id, worker, state, output_path=None):
+        """Moves a running job on to another active state (e.g. uploading)."""
+        if state not in ACTIVE_STATES:
+            raise ValueError(f"Not an active job state: {state}")
+        fields = {"state": state}
+        if output_path is not None:
+            fields["output_path"] = output_path
+        return self._update_owned(job_id, worker, **fields)
+
+    def complete(self, job_id, worker, result=None):
+        """Marks a job done. Returns False if the worker no longer owned it."""
+        return self._update_owned(job_id, worker, state=DONE, result=json.dumps(result or {}),
+                                  error=None, lease_expires=None)
+
+    def fail(self, job_id, worker, error):
+        """
+        Records a failed attempt. The job is queued again while it has
+        attempts left, otherwise it is failed for good.
+        """
+        with self._connect() as db:
+            cur = db.execute(
+                f"UPDATE jobs SET state = CASE WHEN attempts < max_attempts THEN ? ELSE ? END, "
+                f"worker = NULL, lease_expires = NULL, error = ?, updated_at = ? "
+                f"WHERE id = ? AND worker = ? AND state IN ({','.join('?' * len(ACTIVE_STATES))})",
+                (QUEUED, FAILED, str(error), time.time(), job_id, worker, *ACTIVE_STATES)
+            )
+        return cur.rowcount == 1
+
+class _Transaction:
+    """Runs a `with` block as one transaction (IMMEDIATE or DEFERRED) and closes the connection after."""
+    def __init__(self, db, mode="IMMEDIATE"):
+        self.db = db
+        self.mode = mode
+
+    def __enter__(self):
+        self.db.execute(f"BEGIN {self.mode}")
+        return self.db
+
+    def __exit__(self, exc_type, exc, tb):
+        try:
+            self.db.execute("ROLLBACK" if exc_type else "COMMIT")
+        finally:
+            self.db.close()
@@ -0,0 +1,366 @@
+# loadtest.py
+# Load test: drives the API with concurrent requests and reports how one instance holds up.
+#
+#   python loadtest.py --concurrency 1,2,4 --requests 8 --mix generate_video=3,generate_and_upload=1
+#
+# Starts the app with uvicorn (--app-workers processes) and points its uploads
+# at a fake YouTube (fake_youtube.py) with configurable latency, bandwidth and
+# failure rate, so nothing leaves the machine. Runs one step per concurrency
+# level and prints throughput, latency percentiles and error rates per route,
+# plus CPU and peak RSS of every app worker process (its FFmpeg children
+# included). Pass --url to load an instance that is already running instead.
+
+import argparse
+import itertools
+import json
+import os
+import random
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+import fake_youtube
+
+# What each route in a --mix sends; highlight_seconds keeps renders short
+ROUTES = {
+    "health": ("GET", "/health", lambda args: None),
+    "generate_video": ("POST", "/generate_video",
+                       lambda args: {"highlight_seconds": args.highlight_seconds}),
+    "generate_and_upload": ("POST", "/generate_and_upload",
+                            lambda args: {"highlight_seconds": args.highlight_seconds,
+                                          "privacy_status": "private"}),
+    "preview": ("POST", "/preview", lambda args: {}),
+    "jobs": ("POST", "/jobs", lambda args: {"kind": "generate",
+                                           "highlight_seconds": args.highlight_seconds}),
+}
+
+def parse_mix(text):
+    """'generate_video=3,health=1' -> {'generate_video': 3, 'health': 1}"""
+    mix = {}
+    for part in text.split(","):
+        name, _, weight = part.partition("=")
+        name = name.strip()
+        if name not in ROUTES:
+            raise argparse.ArgumentTypeError(f"Unknown route {name!r} (choose from {', '.join(ROUTES)})")
+        mix[name] = float(weight or 1)
+    return mix
+
+def percentile(values, p):
+    """Nearest-rank percentile of a list of numbers (None when empty)."""
+    if not values:
+        return None
+    ordered = sorted(values)
+    return ordered[min(len(ordered) - 1, max(0, round(p / 100 * len(ordered)) - 1))]
+
+# ===========================
+# PROCESS STATS (Linux /proc)
+# ===========================
+CLOCK_TICKS = os.sysconf("SC_CLK_TCK") if hasattr(os, "sysconf") else 100
+PAGE_SIZE = os.sysconf("SC_PAGE_SIZE") if hasattr(os, "sysconf") else 4096
+
+def _read_stat(pid):
+    """(ppid, cpu seconds incl. reaped children, rss bytes) of a process, or None if it is gone."""
+    try:
+        with open(f"/proc/{pid}/stat") as f:
+            # The command name may contain spaces; fields start after its closing paren
+            fields = f.read().rsplit(")", 1)[1].split()
+    except (OSError, IndexError):
+        return None
+    ppid = int(fields[1])
+    utime, stime, cutime, cstime = (int(x) for x in fields[11:15])
+    rss = int(fields[21]) * PAGE_SIZE
+    return ppid, (utime + stime + cutime + cstime) / CLOCK_TICKS, rss
+
+def _process_table():
+    table = {}
+    for name in os.listdir("/proc"):
+        if name.isdigit():
+            stat = _read_stat(int(name))
+            if stat:
+                table[int(name)] = stat
+    return table
+
+class ProcessSampler:
+    """
+    Samples CPU time and RSS of the app's worker processes, each with its
+    descendants (FFmpeg, soundtrack helpers), every `interval` seconds.
+    With a multi-process uvicorn the workers are the children of `root`,
+    otherwise `root` itself is the one worker.
+    """
+    def __init__(self, root, multi_worker, interval=0.5):
+        self.root = root
+        self.multi_worker = multi_worker
+        self.interval = interval
+        self.available = os.path.isdir("/proc")
+        self.stop_event = threading.Event()
+        self.thread = None
+        self.samples = []
+
+    def sample(self):
+        """{worker pid: (cpu seconds, rss bytes)} for the worker trees right now."""
+        table = _process_table()
+        children = {}
+        for pid, (ppid, _, _) in table.items():
+            children.setdefault(ppid, []).append(pid)
+        workers = children.get(self.root, []) if self.multi_worker else [self.root]
+        result = {}
+        for worker in workers:
+            cpu = rss = 0
+            stack = [worker]
+            while stack:
+                pid = stack.pop()
+                if pid in table:
+                    cpu += table[pid][1]
+                    rss += table[pid][2]
+                stack.extend(children.get(pid, []))
+            result[worker] = (cpu, rss)
+        return result
+
+    def start(self):
+        self.samples = []
+        self.stop_event.clear()
+        if self.available:
+            self.thread = threading.Thread(target=self._run, daemon=True)
+            self.thread.start()
+        return self
+
+    def _run(self):
+        while True:
+            self.samples.append((time.monotonic(), self.sample()))
+            if self.stop_event.wait(self.interval):
+                return
+
+    def stop(self):
+        """Stops sampling. Returns {worker pid: {"cpu_percent", "peak_rss_mb"}} over the run."""
+        if not self.thread:
+            return {}
+        self.stop_event.set()
+        self.thread.join()
+        self.samples.append((time.monotonic(), self.sample()))
+        (t0, first), (t1, last) = self.samples[0], self.samples[-1]
+        stats = {}
+        for pid, (cpu, _) in last.items():
+            start_cpu = first.get(pid, (cpu, 0))[0]
+            peak = max(sample.get(pid, (0, 0))[1] for _, sample in self.samples)
+            stats[pid] = {
+                "cpu_percent": round(100 * (cpu - start_cpu) / max(t1 - t0, 1e-6), 1),
+                "peak_rss_mb": round(peak / 2**20, 1),
+            }
+        return stats
+
+# ===========================
+# APP UNDER TEST
+# ===========================
+def free_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+def start_app(args, youtube_url, workdir):
+    """Starts uvicorn on a free port with uploads going to youtube_url. Returns (process, base URL)."""
+    port = free_port()
+    env = dict(os.environ)
+    env.update({
+        "SDL_VIDEODRIVER": "dummy",
+        "SDL_AUDIODRIVER": "dummy",
+        "YOUTUBE_API_ENDPOINT": youtube_url,
+        "JOBS_DB_PATH": os.path.join(workdir, "jobs.db"),
+        "JOBS_OUTPUT_DIR": workdir,
+        # The fake enforces its own quota; don't let the ledger hold uploads back
+        "YOUTUBE_DAILY_QUOTA": str(10**9),
+    })
+    cmd = [sys.executable, "-m", "uvicorn", "main:app", "--host", "127.0.0.1",
+           "--port", str(port), "--workers", str(args.app_workers), "--log-level", "warning"]
+    log = open(os.path.join(workdir, "app.log"), "wb")
+    proc = subprocess.Popen(cmd, env=env, stdout=log, stderr=subprocess.STDOUT,
+                            cwd=os.path.dirname(os.path.abspath(__file__)))
+    url = f"http://127.0.0.1:{port}"
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"The app exited with {proc.returncode}; see {log.name}")
+        try:
+            with urllib.request.urlopen(url + "/health", timeout=1):
+                return proc, url
+        except (urllib.error.URLError, OSError):
+            time.sleep(0.3)
+    proc.kill()
+    raise RuntimeError(f"The app did not come up within 60s; see {log.name}")
+
+# ===========================
+# LOAD
+# ===========================
+def send(base_url, route, args):
+    """Sends one request and reads the whole response. Returns a result dict."""
+    method, path, body = ROUTES[route]
+    payload = body(args)
+    data = json.dumps(payload).encode("utf-8") if payload is not None else None
+    request = urllib.request.Request(base_url + path, data=data, method=method,
+                                     headers={"Content-Type": "application/json"} if data else {})
+    start = time.monotonic()
+    status, size, error = None, 0, None
+    try:
+        with urllib.request.urlopen(request, timeout=args.timeout) as response:
+            status = response.status
+            while True:
+                chunk = response.read(1 << 16)
+                if not chunk:
+                    break
+                size += len(chunk)
+    except urllib.error.HTTPError as e:
+        status = e.code
+        error = e.read()[:200].decode("utf-8", "replace")
+    except Exception as e:
+        error = f"{type(e).__name__}: {e}"
+    return {"route": route, "status": status, "ok": status is not None and status < 400,
+            "latency": time.monotonic() - start, "bytes": size, "error": error}
+
+def run_step(base_url, args, concurrency, sampler=None, youtube=None):
+    """
+    Sends args.requests requests (or as many as fit in args.duration seconds)
+    from `concurrency` threads. Returns the step's summary.
+    """
+    rng = random.Random(args.seed + concurrency)
+    names, weights = zip(*args.mix.items())
+    lock = threading.Lock()
+    issued = itertools.count()
+    results = []
+    deadline = time.monotonic() + args.duration if args.duration else None
+
+    def client():
+        while True:
+            with lock:
+                n = next(issued)
+                route = rng.choices(names, weights)[0]
+            if deadline is None and n >= args.requests:
+                return
+            if deadline is not None and time.monotonic() >= deadline:
+                return
+            result = send(base_url, route, args)
+            with lock:
+                results.append(result)
+
+    before = youtube.stats() if youtube else None
+    if sampler:
+        sampler.start()
+    start = time.monotonic()
+    with ThreadPoolExecutor(concurrency) as pool:
+        for _ in range(concurrency):
+            pool.submit(client)
+    elapsed = time.monotonic() - start
+    workers = sampler.stop() if sampler else {}
+    return summarize(concurrency, elapsed, results, workers, before, youtube.stats() if youtube else None)
+
+def summarize(concurrency, elapsed, results, workers, youtube_before, youtube_after):
+    def stats(items):
+        latencies = [r["latency"] for r in items if r["ok"]]
+        errors = sum(not r["ok"] for r in items)
+        return {
+            "requests": len(items),
+            "errors": errors,
+            "error_rate": round(errors / len(items), 3) if items else 0.0,
+            "throughput": round(sum(r["ok"] for r in items) / elapsed, 3),
+            **{f"p{p}": percentile(latencies, p) for p in (50, 90, 99)},
+            "max": max(latencies) if latencies else None,
+        }
+
+    summary = {
+        "concurrency": concurrency,
+        "elapsed": round(elapsed, 2),
+        "total": stats(results),
+        "routes": {route: stats([r for r in results if r["route"] == route])
+                   for route in sorted({r["route"] for r in results})},
+        "workers": workers,
+        "sample_errors": sorted({r["error"] for r in results if r["error"]})[:5],
+    }
+    if youtube_after:
+        summary["youtube"] = {key: youtube_after[key] - youtube_before[key]
+                              for key in ("videos", "bytes_received", "quota_used", "injected_failures")}
+        summary["youtube"]["peak_concurrent_uploads"] = youtube_after["peak_concurrent_uploads"]
+    return summary
+
+def print_summary(summary):
+    def ms(value):
+        return "-" if value is None else f"{value * 1000:.0f}"
+
+    total = summary["total"]
+    print(f"\n== concurrency {summary['concurrency']}: {total['requests']} requests in {summary['elapsed']}s, "
+          f"{total['throughput']} ok/s, {total['error_rate']:.1%} errors")
+    print(f"   {'route':<22}{'n':>5}{'err%':>7}{'ok/s':>8}{'p50 ms':>9}{'p90 ms':>9}{'p99 ms':>9}{'max ms':>9}")
+    for route, s in summary["routes"].items():
+        print(f"   {route:<22}{s['requests']:>5}{s['error_rate'] * 100:>7.1f}{s['throughput']:>8.2f}"
+              f"{ms(s['p50']):>9}{ms(s['p90']):>9}{ms(s['p99']):>9}{ms(s['max']):>9}")
+    for pid, w in summary["workers"].items():
+        print(f"   worker {pid}: {w['cpu_percent']}% CPU, peak RSS {w['peak_rss_mb']} MB")
+    if "youtube" in summary:
+        y = summary["youtube"]
+        print(f"   fake YouTube: {y['videos']} uploads, {y['bytes_received'] / 2**20:.1f} MB, "
+              f"{y['injected_failures']} injected failures, peak {y['peak_concurrent_uploads']} concurrent")
+    for error in summary["sample_errors"]:
+        print(f"   error: {error}")
+
+def main():
+    parser = argparse.ArgumentParser(description="Load test the dodger API against a fake YouTube.")
+    parser.add_argument("--url", default=None, help="Load an already running instance (no app or fake is started)")
+    parser.add_argument("--concurrency", default="1,2,4",
+                        help="Comma-separated concurrency levels, one step each (default 1,2,4)")
+    parser.add_argument("--requests", type=int, default=8, help="Requests per step (default 8)")
+    parser.add_argument("--duration", type=float, default=None, help="Run each step this many seconds instead")
+    parser.add_argument("--mix", type=parse_mix, default=parse_mix("generate_video=3,generate_and_upload=1"),
+                        help=f"Weighted routes, e.g. generate_video=3,health=1 (routes: {', '.join(ROUTES)})")
+    parser.add_argument("--highlight-seconds", type=float, default=3.0,
+                        help="highlight_seconds sent with render requests, to keep them short (default 3)")
+    parser.add_argument("--timeout", type=float, default=600, help="Per-request timeout in seconds")
+    parser.add_argument("--app-workers", type=int, default=1, help="uvicorn worker processes")
+    parser.add_argument("--youtube-latency", type=float, default=0.05, help="Seconds added to each fake YouTube request")
+    parser.add_argument("--youtube-bandwidth", type=float, default=None, help="Fake YouTube upload bytes per second")
+    parser.add_argument("--youtube-failure-rate", type=float, default=0.0,
+                        help="Share of fake YouTube requests that fail with a 503")
+    parser.add_argument("--youtube-quota", type=int, default=10**9, help="Fake YouTube quota units")
+    parser.add_argument("--seed", type=int, default=1, help="Seed for the request mix")
+    parser.add_argument("--json", default=None, help="Also write the results to this file")
+    args = parser.parse_args()
+    levels = [int(c) for c in args.concurrency.split(",")]
+
+    app = youtube = sampler = None
+    workdir = tempfile.mkdtemp(prefix="dodger_loadtest_")
+    try:
+        if args.url:
+            base_url = args.url.rstrip("/")
+        else:
+            server, youtube_url = fake_youtube.start_in_thread(
+                quota=args.youtube_quota, latency=args.youtube_latency,
+                bandwidth=args.youtube_bandwidth, failure_rate=args.youtube_failure_rate)
+            youtube = server.service
+            app, base_url = start_app(args, youtube_url, workdir)
+            sampler = ProcessSampler(app.pid, args.app_workers > 1)
+            if not sampler.available:
+                print("No /proc here; CPU and memory are not reported")
+                sampler = None
+            print(f"App at {base_url} (log: {workdir}/app.log), fake YouTube at {youtube_url}")
+
+        summaries = []
+        for concurrency in levels:
+            summary = run_step(base_url, args, concurrency, sampler, youtube)
+            print_summary(summary)
+            summaries.append(summary)
+        if args.json:
+            with open(args.json, "w") as f:
+                json.dump({"args": {k: v for k, v in vars(args).items()}, "steps": summaries}, f, indent=2)
+            print(f"\nResults written to {args.json}")
+    finally:
+        if app:
+            app.terminate()
+            try:
+                app.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                app.kill()
+
+if __name__ == "__main__":
+    main()
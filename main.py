@@ -1,13 +1,17 @@
+import asyncio
+import json
 import logging
 import os
+import threading
+import time
 import uuid
-import datetime
 import tempfile
 from dotenv import load_dotenv
 from fastapi import FastAPI, BackgroundTasks, HTTPException, Body
-from fastapi.responses import FileResponse, JSONResponse
-from pydantic import BaseModel
-from typing import Optional
+from fastapi.responses import FileResponse, JSONResponse, StreamingResponse
+from starlette.concurrency import run_in_threadpool
+from pydantic import BaseModel, ConfigDict, Field, field_validator
+from typing import Optional, Union
 
 # Load environment variables from .env file
 load_dotenv()
@@ -15,7 +19,9 @@ load_dotenv()
 # Import our custom modules
 import config_generator
 import dodger
-import youtube_uploader
+import jobs
+import renderer
+import upload_scheduler
 
 # Setup Logging
 logging.basicConfig(level=logging.INFO)
@@ -52,6 +58,9 @@ def validate_environment():
 # Validate environment on startup
 validate_environment()
 
+# Durable queue for /jobs; run worker.py processes against the same database
+job_queue = jobs.JobQueue()
+
 def cleanup_file(path: str):
     """Deletes the temporary file after use."""
     try:
@@ -61,21 +70,142 @@ def cleanup_file(path: str):
     except Exception as e:
         logger.error(f"Error deleting file {path}: {e}")
 
-def generate_video_file(save_to_disk: bool = True) -> tuple[str, dict]:
+# ==========================================
+# ADMISSION CONTROL
+# ==========================================
+# When the queue backs up, new videos are rendered cheaper so the backlog
+# drains instead of latency growing without limit, and at full quality again
+# once it has. Load is the time a new job would wait: the jobs queued ahead
+# of it times what a render takes, shared between the workers.
+
+# Wait acceptable at full quality; quality level n is used from 2**(n-1) times this wait on
+ADMISSION_TARGET_WAIT = float(os.environ.get("ADMISSION_TARGET_WAIT", 300))
+# Cheapest quality level admission control may pick (0 turns it off)
+ADMISSION_MAX_LEVEL = min(3, int(os.environ.get("ADMISSION_MAX_LEVEL", 3)))
+# Limits of the cheapest level: resolution the playfield is drawn at (relative to the
+# video's, which it is upscaled to under a full-size HUD) and particles in the death burst
+ADMISSION_MIN_SCALE = float(os.environ.get("ADMISSION_MIN_SCALE", 0.75))
+ADMISSION_MIN_PARTICLES = int(os.environ.get("ADMISSION_MIN_PARTICLES", 30))
+# Worker processes rendering the queue; the jobs in "rendering" count instead when there are more
+ADMISSION_WORKERS = int(os.environ.get("ADMISSION_WORKERS", 1))
+
+_admission_level = 0
+_admission_lock = threading.Lock()
+
+def quality_settings(level: int) -> dict:
+    """
+    Render settings of a quality level, from 0 (full quality) to 3 (the
+    configured limits). Each level keeps the downgrades of the one before:
+      1: shortest duration in config_generator.DURATION_CHOICES, "draft" encoder profile
+      2: halfway to ADMISSION_MIN_SCALE and ADMISSION_MIN_PARTICLES
+      3: ADMISSION_MIN_SCALE and ADMISSION_MIN_PARTICLES
+    """
+    settings = {}
+    if level >= 1:
+        settings["duration"] = min(config_generator.DURATION_CHOICES)
+        settings["profile"] = "draft"
+    if level >= 2:
+        f = 1.0 if level >= 3 else 0.5
+        settings["scale"] = 1 - f * (1 - ADMISSION_MIN_SCALE)
+        settings["particles"] = round(dodger.BURST_PARTICLES - f * (dodger.BURST_PARTICLES - ADMISSION_MIN_PARTICLES))
+    return settings
+
+def degrade_config(config: dict, level: int, keep_game: bool = False) -> list:
+    """
+    Applies a quality level to config (in place). Returns the downgrades
+    made, each {"setting", "from", "to"}. keep_game leaves alone what changes
+    how the game plays (duration, resolution), for configs the caller chose.
+    """
+    settings = quality_settings(level)
+    downgrades = []
+    if not keep_game and settings.get("duration", float("inf")) < config.get("duration", 15):
+        downgrades.append({"setting": "duration", "from": config.get("duration", 15), "to": settings["duration"]})
+        config["duration"] = settings["duration"]
+    if not keep_game and settings.get("scale", 1) < 1 and not config.get("output_width"):
+        width, height = config.get("width", 854), config.get("height", 480)
+        # Even sizes, with the aspect ratio kept within rounding
+        scaled = (round(width * settings["scale"] / 2) * 2, round(height * settings["scale"] / 2) * 2)
+        downgrades.append({"setting": "resolution", "from": f"{width}x{height}", "to": f"{scaled[0]}x{scaled[1]}"})
+        config.update(width=scaled[0], height=scaled[1], output_width=width, output_height=height)
+    if "profile" in settings and config.get("profile", "standard") == "standard":
+        downgrades.append({"setting": "profile", "from": "standard", "to": settings["profile"]})
+        config["profile"] = settings["profile"]
+    if settings.get("particles", float("inf")) < config.get("particles", dodger.BURST_PARTICLES):
+        downgrades.append({"setting": "particles", "from": config.get("particles", dodger.BURST_PARTICLES),
+                           "to": settings["particles"]})
+        config["particles"] = settings["particles"]
+    return downgrades
+
+def measure_load() -> dict:
+    """Queue depth, what a render takes and the wait they add up to for a new job."""
+    import cost_model
+    counts = job_queue.counts()
+    queued, rendering = counts.get(jobs.QUEUED, 0), counts.get(jobs.RENDERING, 0)
+    # Median of the renders measured so far; until then, the longest game (renders run in real time)
+    render_seconds = (cost_model.CostModel(job_queue.path).typical_render_seconds()
+                      or float(max(config_generator.DURATION_CHOICES)))
+    workers = max(1, ADMISSION_WORKERS, rendering)
+    wait = queued * render_seconds / workers
+    return {"queued": queued, "rendering": rendering, "workers": workers,
+            "render_seconds": round(render_seconds, 1), "wait_seconds": round(wait, 1)}
+
+def admission_level(wait: float) -> int:
+    """
+    The quality level for a job that would wait `wait` seconds. Quality only
+    goes back up once the wait is below half of what took it down, so it
+    doesn't flap while the load hovers around a threshold.
+    """
+    global _admission_level
+    level = 0
+    while level < ADMISSION_MAX_LEVEL and wait >= ADMISSION_TARGET_WAIT * 2 ** level:
+        level += 1
+    # Routes admit jobs from the thread pool
+    with _admission_lock:
+        if level < _admission_level <= ADMISSION_MAX_LEVEL and wait >= ADMISSION_TARGET_WAIT * 2 ** (_admission_level - 2):
+            level = _admission_level
+        if level != _admission_level:
+            logger.info(f"Admission control: quality level {_admission_level} -> {level} (wait {wait:.0f}s)")
+        _admission_level = level
+    return level
+
+def admit(config: dict, keep_game: bool = False) -> dict:
+    """
+    Admission control for a render about to be queued or started: measures
+    the load and degrades config (in place) to the quality level it calls
+    for. Returns the report that goes into the job's result:
+    {"level", "load", "downgrades"}.
+    """
+    try:
+        load = measure_load()
+    except Exception as e:
+        # Render at full quality rather than refuse work over a busy database
+        logger.warning(f"Admission control could not measure the load: {e}")
+        return {"level": 0, "load": None, "downgrades": []}
+    level = admission_level(load["wait_seconds"])
+    downgrades = degrade_config(config, level, keep_game)
+    if downgrades:
+        logger.info(f"Rendering at quality level {level}: {downgrades}")
+    return {"level": level, "load": load, "downgrades": downgrades}
+
+def generate_video_file(save_to_disk: bool = True, highlight_seconds: float = None) -> tuple[str, dict, dict]:
     """
     Helper function to generate a video file.
     
     Args:
         save_to_disk: If True, saves to temp directory. If False, just returns config.
+        highlight_seconds: If set, only render that many seconds before the game over.
     
     Returns:
-        tuple: (output_path, config_dict) if save_to_disk, else (None, config_dict)
+        tuple: (output_path, config_dict, quality) if save_to_disk, else (None, config_dict, None);
+        quality is the admission control report (see admit)
     """
     config = config_generator.generate_config()
     
     if not save_to_disk:
-        return None, config
+        return None, config, None
     
+    quality = admit(config)
+
     filename = f"video_{uuid.uuid4()}.mp4"
     temp_dir = tempfile.gettempdir()
     output_path = os.path.join(temp_dir, filename)
@@ -85,9 +215,9 @@ def generate_video_file(save_to_disk: bool = True) -> tuple[str, dict]:
     
     try:
         logger.info(f"Generating video: {output_path}")
-        dodger.run_game(config, output_path)
+        renderer.render(config, output_path, highlight_seconds=highlight_seconds)
         logger.info(f"Video generated successfully: {output_path}")
-        return output_path, config
+        return output_path, config, quality
     except Exception as e:
         logger.error(f"Generation failed: {e}", exc_info=True)
         cleanup_file(output_path)
@@ -101,6 +231,8 @@ def upload_video_file(
 ) -> dict:
     """
     Helper function to upload a video file to YouTube.
+    Goes through the upload scheduler (ahead of queued jobs) and waits
+    for the upload to finish.
     
     Args:
         video_path: Path to the video file
@@ -111,55 +243,42 @@ def upload_video_file(
     Returns:
         dict: Contains video_id and url
     """
-    # Check if file exists
-    if not os.path.exists(video_path):
-        raise FileNotFoundError(f"Video file not found: {video_path}")
-    
-    # Generate default title if not provided
-    if not title:
-        today = datetime.datetime.now().strftime("%Y-%m-%d")
-        title = f"Insane Dodger Gameplay {today} #Shorts"
-    
-    # Generate default description if not provided
-    if not description:
-        description = (
-            "Can the AI survive this level? 😱\n\n"
-            "Generated by Python Code.\n"
-            "#gaming #coding #python #pygame #shorts"
-        )
-    
-    # Get privacy status
-    if not privacy_status:
-        privacy_status = os.environ.get("YOUTUBE_PRIVACY_STATUS", "private")
-    
-    logger.info(f"Uploading video: {video_path}")
-    video_id = youtube_uploader.upload_video(
-        file_path=video_path,
-        title=title,
-        description=description,
-        privacy_status=privacy_status
-    )
-    video_url = f"https://youtu.be/{video_id}"
-    logger.info(f"Upload successful! URL: {video_url}")
-    
-    return {
-        "video_id": video_id,
-        "url": video_url
-    }
+    # Don't hold a request open until tomorrow's quota
+    scheduler = upload_scheduler.get_scheduler()
+    if scheduler.ledger.remaining() < scheduler.cost:
+        raise Exception("YouTube upload failed: daily API quota used up, try again after it resets")
+    # Requests made directly against the API jump the queued batch
+    future = upload_scheduler.submit_video_upload(video_path, title, description, privacy_status, priority=1)
+    return upload_scheduler.upload_result(future.result())
 
 @app.get("/health")
 def health():
     return {"status": "ok", "service": "DodgerGen"}
 
+class GenerateVideoRequest(BaseModel):
+    highlight_seconds: Optional[float] = Field(None, ge=0)
+
+# Routes that render, upload or wait on the database are plain functions:
+# FastAPI runs them in its thread pool, so they never hold up the event loop
+# that streams /jobs/{job_id}/events.
 @app.post("/generate_video")
-async def generate_video(background_tasks: BackgroundTasks):
+def generate_video(
+    background_tasks: BackgroundTasks,
+    request: Optional[GenerateVideoRequest] = Body(None)
+):
     """
     Route 1: Generate Video
     Generates a new Dodger gameplay video and returns it for download.
     The video is automatically cleaned up after download.
+    
+    Optional request body:
+    - highlight_seconds: Only render this many seconds before the "WASTED" moment (plus the game-over screen)
     """
     try:
-        output_path, config = generate_video_file(save_to_disk=True)
+        output_path, config, quality = generate_video_file(
+            save_to_disk=True,
+            highlight_seconds=request.highlight_seconds if request else None
+        )
         filename = os.path.basename(output_path)
         
         # Schedule cleanup after download
@@ -168,7 +287,9 @@ async def generate_video(background_tasks: BackgroundTasks):
         return FileResponse(
             output_path,
             media_type="video/mp4",
-            filename=filename
+            filename=filename,
+            headers={"X-Quality-Level": str(quality["level"]),
+                     "X-Quality-Downgrades": json.dumps(quality["downgrades"])}
         )
     except Exception as e:
         logger.error(f"Generation endpoint failed: {e}")
@@ -184,7 +305,7 @@ class UploadVideoRequest(BaseModel):
     privacy_status: Optional[str] = None
 
 @app.post("/upload_video")
-async def upload_video_endpoint(request: UploadVideoRequest):
+def upload_video_endpoint(request: UploadVideoRequest):
     """
     Route 2: Upload Video
     Uploads an existing video file to YouTube.
@@ -234,9 +355,10 @@ class GenerateAndUploadRequest(BaseModel):
     title: Optional[str] = None
     description: Optional[str] = None
     privacy_status: Optional[str] = None
+    highlight_seconds: Optional[float] = Field(None, ge=0)
 
 @app.post("/generate_and_upload")
-async def generate_and_upload(
+def generate_and_upload(
     background_tasks: BackgroundTasks,
     request: Optional[GenerateAndUploadRequest] = Body(None)
 ):
@@ -253,6 +375,7 @@ async def generate_and_upload(
     - title: Video title (optional, auto-generated if not provided)
     - description: Video description (optional, auto-generated if not provided)
     - privacy_status: "public", "unlisted", or "private" (optional, uses env var or defaults to "private")
+    - highlight_seconds: Only render this many seconds before the "WASTED" moment (optional)
     """
     logger.info("Starting automated workflow: Generate → Upload")
     
@@ -261,7 +384,10 @@ async def generate_and_upload(
     try:
         # Step 1: Generate video (reusing Route 1 logic)
         logger.info("Step 1: Generating video...")
-        output_path, config = generate_video_file(save_to_disk=True)
+        output_path, config, quality = generate_video_file(
+            save_to_disk=True,
+            highlight_seconds=request.highlight_seconds if request else None
+        )
         logger.info(f"Video generated: {output_path}")
         
         # Step 2: Upload video (reusing Route 2 logic)
@@ -281,6 +407,7 @@ async def generate_and_upload(
             "action": "generated_and_uploaded",
             "video_id": upload_result["video_id"],
             "url": upload_result["url"],
+            "quality": quality,
             "message": "Video generated and uploaded successfully!"
         }
         
@@ -307,6 +434,280 @@ async def generate_and_upload(
                 content={"error": "Generate and upload failed", "details": error_msg}
             )
 
+class GameConfig(BaseModel):
+    """
+    A game config passed in a request (see config_generator.generate_config).
+    What sizes a render is bounded; other keys (theme, ai_skill, ...) pass
+    through as they are.
+    """
+    model_config = ConfigDict(extra="allow")
+    seed: Optional[int] = None
+    # yuv420p needs even dimensions
+    width: Optional[int] = Field(None, ge=64, le=1920, multiple_of=2)
+    height: Optional[int] = Field(None, ge=64, le=1920, multiple_of=2)
+    output_width: Optional[int] = Field(None, ge=64, le=1920, multiple_of=2)
+    output_height: Optional[int] = Field(None, ge=64, le=1920, multiple_of=2)
+    fps: Optional[int] = Field(None, ge=1, le=60)
+    duration: Optional[Union[int, float]] = Field(None, gt=0, le=60)
+    max_duration: Optional[Union[int, float]] = Field(None, gt=0, le=60)
+    tail_duration: Optional[Union[int, float]] = Field(None, ge=0, le=10)
+    particles: Optional[int] = Field(None, ge=0, le=1000)
+    profile: Optional[str] = None
+
+    @field_validator("profile")
+    @classmethod
+    def known_profile(cls, profile):
+        if profile is not None and profile not in dodger.ENCODER_PROFILES:
+            raise ValueError(f"must be one of {sorted(dodger.ENCODER_PROFILES)}")
+        return profile
+
+    def to_config(self) -> dict:
+        return self.model_dump(exclude_none=True)
+
+class PreviewRequest(BaseModel):
+    config: Optional[GameConfig] = None
+    scale: float = 0.25
+    fps: int = 10
+    keyframes_only: bool = False
+    format: str = "gif"
+
+PREVIEW_MEDIA_TYPES = {"gif": "image/gif", "webp": "image/webp"}
+# Previews nobody downloads are deleted after this long
+PREVIEW_TTL_SECONDS = float(os.environ.get("PREVIEW_TTL_SECONDS", 3600))
+
+def sweep_previews():
+    """Deletes preview files older than PREVIEW_TTL_SECONDS from the temp directory."""
+    temp_dir = tempfile.gettempdir()
+    cutoff = time.time() - PREVIEW_TTL_SECONDS
+    try:
+        for name in os.listdir(temp_dir):
+            path = os.path.join(temp_dir, name)
+            kind = name.rpartition(".")[2]
+            if (name.startswith("preview_") and (kind in PREVIEW_MEDIA_TYPES or kind == "jpg")
+                    and os.path.getmtime(path) < cutoff):
+                cleanup_file(path)
+    except OSError as e:
+        logger.warning(f"Failed to sweep old previews: {e}")
+
+def preview_paths(preview_id: str, fmt: str) -> tuple[str, str]:
+    """Returns the (animation, thumbnail) paths of a preview in the temp directory."""
+    temp_dir = tempfile.gettempdir()
+    return (
+        os.path.join(temp_dir, f"preview_{preview_id}.{fmt}"),
+        os.path.join(temp_dir, f"preview_{preview_id}.jpg")
+    )
+
+@app.post("/preview")
+def preview(request: Optional[PreviewRequest] = Body(None)):
+    """
+    Route 4: Preview
+    Renders a low-cost preview of a game: a small animated GIF/WebP plus a
+    poster-frame thumbnail of the death moment. Pass the returned config to
+    check a game before committing it to a full render.
+    
+    Optional request body:
+    - config: Game config to preview (optional, a new one is generated if not provided)
+    - scale: Preview size relative to the full render (default 0.25)
+    - fps: Preview frame rate (default 10)
+    - keyframes_only: Only sample level-ups, near-misses and the death moment (default false)
+    - format: "gif" or "webp" (default "gif")
+    """
+    request = request or PreviewRequest()
+    if request.format not in PREVIEW_MEDIA_TYPES:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Unsupported preview format", "details": request.format}
+        )
+    if not 0 < request.scale <= 1 or request.fps <= 0:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Invalid preview settings", "details": "scale must be in (0, 1] and fps positive"}
+        )
+    
+    sweep_previews()
+    config = request.config.to_config() if request.config else config_generator.generate_config()
+    preview_id = str(uuid.uuid4())
+    animation_path, thumbnail_path = preview_paths(preview_id, request.format)
+    
+    try:
+        logger.info(f"Generating preview: {animation_path}")
+        result = renderer.preview(
+            config,
+            animation_path,
+            thumbnail_path,
+            scale=request.scale,
+            fps=request.fps,
+            keyframes_only=request.keyframes_only
+        )
+        if result is None:
+            raise Exception("FFmpeg not available")
+    except Exception as e:
+        logger.error(f"Preview failed: {e}", exc_info=True)
+        cleanup_file(animation_path)
+        cleanup_file(thumbnail_path)
+        return JSONResponse(
+            status_code=500,
+            content={"error": "Preview generation failed", "details": str(e)}
+        )
+    
+    return {
+        "status": "success",
+        "action": "previewed",
+        "preview_id": preview_id,
+        "config": config,
+        "animation_url": f"/preview/{preview_id}/animation.{request.format}",
+        "thumbnail_url": f"/preview/{preview_id}/thumbnail.jpg"
+    }
+
+@app.get("/preview/{preview_id}/{name}")
+async def preview_file(preview_id: str, name: str, background_tasks: BackgroundTasks):
+    """
+    Downloads the animation or thumbnail of a preview.
+    Each file is cleaned up after it has been downloaded, or after
+    PREVIEW_TTL_SECONDS if it never is.
+    """
+    try:
+        uuid.UUID(preview_id)
+    except ValueError:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    
+    kind, _, fmt = name.partition(".")
+    if kind == "animation" and fmt in PREVIEW_MEDIA_TYPES:
+        path, media_type = preview_paths(preview_id, fmt)[0], PREVIEW_MEDIA_TYPES[fmt]
+    elif name == "thumbnail.jpg":
+        path, media_type = preview_paths(preview_id, "gif")[1], "image/jpeg"
+    else:
+        raise HTTPException(status_code=404, detail="Preview not found")
+    
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Preview not found")
+    
+    background_tasks.add_task(cleanup_file, path)
+    return FileResponse(path, media_type=media_type, filename=os.path.basename(path))
+
+class JobRequest(BaseModel):
+    kind: str = "generate_and_upload"
+    config: Optional[GameConfig] = None
+    title: Optional[str] = None
+    description: Optional[str] = None
+    privacy_status: Optional[str] = None
+    highlight_seconds: Optional[float] = Field(None, ge=0)
+
+def job_response(job: dict) -> dict:
+    """The public view of a queued job."""
+    response = {
+        "job_id": job["id"],
+        "kind": job["kind"],
+        "state": job["state"],
+        "attempts": job["attempts"],
+        "progress": job["progress"],
+        "result": job["result"],
+        "error": job["error"],
+    }
+    if job["kind"] == "generate" and job["state"] == jobs.DONE:
+        response["video_url"] = f"/jobs/{job['id']}/video"
+    return response
+
+@app.post("/jobs", status_code=202)
+def create_job(request: Optional[JobRequest] = Body(None)):
+    """
+    Route 5: Queue a Job
+    Queues a render (and upload) on the durable job queue and returns at once.
+    Jobs survive restarts: worker processes (python worker.py) claim them, and
+    a job whose worker dies is picked up again by another one.
+    
+    Optional request body:
+    - kind: "generate_and_upload" (default) or "generate" (keep the video for download)
+    - config: Game config to render (optional, a new one is generated if not provided)
+    - title, description, privacy_status: As for /generate_and_upload
+    - highlight_seconds: Only render this many seconds before the "WASTED" moment (optional)
+    """
+    request = request or JobRequest()
+    if request.kind not in jobs.KINDS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": "Unknown job kind", "details": request.kind}
+        )
+    
+    # The config is fixed now so every retry renders the same game, at the
+    # quality admission control picks for the current load
+    params = request.model_dump(exclude={"kind"})
+    params["config"] = request.config.to_config() if request.config else config_generator.generate_config()
+    params["quality"] = admit(params["config"], keep_game=request.config is not None)
+    job_id = job_queue.enqueue(request.kind, params)
+    return job_response(job_queue.get(job_id))
+
+@app.get("/jobs")
+def list_jobs(state: Optional[str] = None, limit: int = 50):
+    """Lists recent jobs (optionally in one state) and the number of jobs per state."""
+    return {
+        "counts": job_queue.counts(),
+        "jobs": [job_response(job) for job in job_queue.list(state, limit)]
+    }
+
+@app.get("/jobs/{job_id}")
+def get_job(job_id: str):
+    """Returns the state of a job."""
+    job = job_queue.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+    return job_response(job)
+
+# How often /jobs/{id}/events looks at the job, and sends a comment to keep idle connections open
+EVENTS_POLL_SECONDS = 0.5
+EVENTS_KEEPALIVE_SECONDS = 15
+
+@app.get("/jobs/{job_id}/events")
+async def job_events(job_id: str):
+    """
+    Streams a job as Server-Sent Events: a "job" event (the same JSON as
+    GET /jobs/{job_id}) whenever its state or progress changes, ending once
+    the job is done or failed.
+    
+    progress while rendering: frame / max_frames, fps (frames rendered per
+    second) and encoder_speed (FFmpeg's speed, 1.0 = real time); while
+    uploading: bytes_sent / total_bytes.
+    """
+    if await run_in_threadpool(job_queue.get, job_id) is None:
+        raise HTTPException(status_code=404, detail="Job not found")
+
+    async def events():
+        last = None
+        quiet = 0.0
+        while True:
+            job = await run_in_threadpool(job_queue.get, job_id)
+            if job is None:
+                return
+            data = job_response(job)
+            if data != last:
+                last = data
+                quiet = 0.0
+                yield f"event: job\ndata: {json.dumps(data)}\n\n"
+                if job["state"] in (jobs.DONE, jobs.FAILED):
+                    return
+            elif quiet >= EVENTS_KEEPALIVE_SECONDS:
+                quiet = 0.0
+                yield ": keep-alive\n\n"
+            await asyncio.sleep(EVENTS_POLL_SECONDS)
+            quiet += EVENTS_POLL_SECONDS
+
+    return StreamingResponse(events(), media_type="text/event-stream",
+                             headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"})
+
+@app.get("/jobs/{job_id}/video")
+def job_video(job_id: str):
+    """
+    Downloads the video of a finished "generate" job. Workers delete it
+    JOBS_OUTPUT_TTL_SECONDS (default a day) after the job finished.
+    """
+    job = job_queue.get(job_id)
+    if job is None or job["kind"] != "generate" or job["state"] != jobs.DONE:
+        raise HTTPException(status_code=404, detail="Video not found")
+    path = job["result"]["output_path"]
+    if not os.path.exists(path):
+        raise HTTPException(status_code=404, detail="Video not found")
+    return FileResponse(path, media_type="video/mp4", filename=os.path.basename(path))
+
 if __name__ == "__main__":
     import uvicorn
     port = int(os.environ.get("PORT", 10000))
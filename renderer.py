@@ -0,0 +1,225 @@
+# renderer.py
+# Warm renderer: a long-lived helper process that keeps pygame set up and renders games sent to it.
+#
+# A plain run_game sets up pygame (display, mixer, fonts) and its assets for
+# every game and throws them away after. A WarmRenderer starts a helper
+# process that does the setup once (dodger.pygame_session) and then renders
+# one request after another, sent over a local socket pair; only the Game is
+# new each time. The helper is replaced after RENDERER_MAX_JOBS games, and
+# after any failed render, so leaks and half-torn-down state don't pile up.
+
+import argparse
+import logging
+import os
+import signal
+import socket
+import subprocess
+import sys
+import threading
+from multiprocessing.connection import Connection
+
+import dodger
+
+logger = logging.getLogger("app.renderer")
+
+# Games a helper process renders before it is replaced by a fresh one
+RENDERER_MAX_JOBS = int(os.environ.get("RENDERER_MAX_JOBS", 50))
+
+# render() uses a warm helper process unless this is "0" (or on Windows, which can't pass the socket)
+WARM_RENDERER = os.environ.get("WARM_RENDERER", "1") != "0" and os.name != "nt"
+
+class WarmRenderer:
+    """
+    Client side of a helper process. render() takes the arguments of
+    dodger.run_game, runs it in the helper and returns its result. One
+    render at a time; concurrent callers wait their turn.
+    """
+    def __init__(self, max_jobs=None):
+        self.max_jobs = max_jobs or RENDERER_MAX_JOBS
+        self.proc = None
+        self.conn = None
+        self.jobs = 0
+        self.lock = threading.Lock()
+
+    def _start(self):
+        parent, child = socket.socketpair()
+        try:
+            self.proc = subprocess.Popen(
+                [sys.executable, os.path.abspath(__file__), "--fd", str(child.fileno())],
+                pass_fds=(child.fileno(),), cwd=os.path.dirname(os.path.abspath(__file__)),
+                # Its own process group, so kill() takes its FFmpeg and soundtrack helpers along
+                start_new_session=True
+            )
+        finally:
+            child.close()
+        self.conn = Connection(parent.detach())
+        self.jobs = 0
+        try:
+            self.conn.recv()  # ("ready", pid) once pygame is up
+        except (EOFError, OSError):
+            self._stop()
+            raise RuntimeError("Renderer process failed to start")
+        logger.info(f"Started renderer process {self.proc.pid}")
+
+    def _stop(self):
+        if self.conn:
+            self.conn.close()  # the helper exits once it sees the socket close
+            self.conn = None
+        if self.proc:
+            try:
+                self.proc.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                self.proc.kill()
+                self.proc.wait()
+            self.proc = None
+
+    # Popen-like, so a dodger.RenderProgress can cancel the render by killing the helper
+    def poll(self):
+        proc = self.proc
+        return proc.poll() if proc else 0
+
+    def kill(self):
+        proc = self.proc
+        if proc:
+            try:
+                os.killpg(proc.pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+
+    def render(self, config, output_file="output.mp4", progress=None, **options):
+        """
+        Renders a game in the helper process (see dodger.run_game for the
+        arguments). progress, a dodger.RenderProgress, follows the render as
+        it would in-process, and cancelling it kills the helper.
+        """
+        # What the helper's FFmpeg may have written if the render goes down
+        partials = [output_file] + [r['path'] for r in options.get('renditions') or []]
+        return self._call("render", config, output_file, options, partials, progress)
+
+    def preview(self, config, output_file="preview.gif", thumbnail_file="preview.jpg", **options):
+        """Renders a preview in the helper process (see dodger.run_preview for the arguments)."""
+        options = dict(options, thumbnail_file=thumbnail_file)
+        return self._call("preview", config, output_file, options, [output_file, thumbnail_file])
+
+    def _call(self, kind, config, output_file, options, partials, progress=None):
+        with self.lock:
+            if self.proc is None or self.proc.poll() is not None or self.jobs >= self.max_jobs:
+                self._stop()
+                self._start()
+            self.jobs += 1
+            if progress:
+                progress.process = self
+            self.conn.send((kind, config, output_file, options))
+            while True:
+                try:
+                    message = self.conn.recv()
+                except (EOFError, OSError):
+                    code = self.proc.wait()
+                    self._stop()
+                    _remove(partials)
+                    if progress and progress.cancelled:
+                        raise dodger.RenderCancelled(progress.cancelled)
+                    raise RuntimeError(f"Renderer process exited with {code} during a {kind}")
+                if message[0] == "progress":
+                    if progress:
+                        progress.update(message[1])
+                elif message[0] == "done":
+                    return message[1]
+                else:
+                    # The helper exits after a failed render; the next one starts a fresh one
+                    self._stop()
+                    _remove(partials)
+                    raise RuntimeError(message[1])
+
+    def close(self):
+        with self.lock:
+            self._stop()
+
+def _remove(paths):
+    """Deletes whatever a failed render left of its outputs."""
+    for path in paths:
+        if os.path.exists(path):
+            os.remove(path)
+
+def serve(conn):
+    """Helper process: sets pygame up once and renders requests from conn until it closes."""
+    with dodger.pygame_session():
+        conn.send(("ready", os.getpid()))
+        while True:
+            try:
+                kind, config, output_file, options = conn.recv()
+            except EOFError:
+                return
+            try:
+                if kind == "preview":
+                    result = dodger.run_preview(config, output_file, **options)
+                else:
+                    progress = dodger.RenderProgress(callback=lambda snapshot: conn.send(("progress", snapshot)))
+                    result = dodger.run_game(config, output_file, progress=progress, **options)
+            except Exception as e:
+                logger.error(f"Render of {output_file} failed: {e}", exc_info=True)
+                conn.send(("error", f"{type(e).__name__}: {e}"))
+                return
+            conn.send(("done", result))
+
+_renderers = {}
+_renderer_lock = threading.Lock()
+
+# WARM_RENDERER=0: renders run in this process, one at a time, in a pygame
+# session kept up until shutdown() (pygame can't be set up and torn down
+# from several threads at once)
+_local_lock = threading.Lock()
+_local_session = None
+
+def get_renderer(name="render"):
+    """
+    A process-wide warm renderer, started on first use. Previews get their
+    own ("preview"), so they don't wait behind full renders.
+    """
+    with _renderer_lock:
+        if name not in _renderers:
+            _renderers[name] = WarmRenderer()
+        return _renderers[name]
+
+def _in_process(fn, *args, **kwargs):
+    global _local_session
+    with _local_lock:
+        if _local_session is None:
+            _local_session = dodger.pygame_session()
+            _local_session.__enter__()
+        return fn(*args, **kwargs)
+
+def render(config, output_file="output.mp4", progress=None, **options):
+    """
+    dodger.run_game on the process-wide warm renderer, or in this process
+    when WARM_RENDERER is off.
+    """
+    if not WARM_RENDERER:
+        return _in_process(dodger.run_game, config, output_file, progress=progress, **options)
+    return get_renderer().render(config, output_file, progress=progress, **options)
+
+def preview(config, output_file="preview.gif", thumbnail_file="preview.jpg", **options):
+    """dodger.run_preview on the process-wide preview renderer, or in this process when WARM_RENDERER is off."""
+    if not WARM_RENDERER:
+        return _in_process(dodger.run_preview, config, output_file, thumbnail_file, **options)
+    return get_renderer("preview").preview(config, output_file, thumbnail_file, **options)
+
+def shutdown():
+    """Stops the process-wide warm renderers, and the in-process pygame session, if they were started."""
+    global _local_session
+    with _renderer_lock:
+        renderers = list(_renderers.values())
+        _renderers.clear()
+    for renderer in renderers:
+        renderer.close()
+    with _local_lock:
+        session, _local_session = _local_session, None
+    if session:
+        session.__exit__(None, None, None)
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Warm renderer helper process (started by WarmRenderer).")
+    parser.add_argument("--fd", type=int, required=True, help="Inherited socket to take requests on")
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    serve(Connection(args.fd))
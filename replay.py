@@ -0,0 +1,314 @@
+# replay.py
+# Compact replays: record a game once, re-render it at any size / FPS / encoder profile.
+
+import json
+import os
+import struct
+import subprocess
+import zlib
+import logging
+
+import pygame
+
+import dodger
+
+logger = logging.getLogger("app.replay")
+
+# ===========================
+# FILE FORMAT
+# ===========================
+# header:  MAGIC, then '<BII' (version, config json length, frame count), then the config json
+# body:    zlib of five column blocks, frame count entries each:
+#            player y deltas ('<h'), mood index ('B'), facecam shake ('b'), flags ('B'),
+#          followed by the payload bytes of all flagged frames, in frame order.
+#
+# Per flagged frame the payload fields appear in this order:
+#   F_SPAWN     '<hhB'  gap_y, gap, colour index
+#   F_TRAIL     'B'     trail dot size
+#   F_SCORE     '<I'    new score
+#   F_CHAT      'B' count, then count x 'BBBB' (user, colour, mood, text indices)
+#   F_BURST     '<I'    seed of the death particle burst
+# F_LEVEL_UP and F_GAME_OVER carry no payload.
+#
+# Only the decisions of the game logic (AI, spawning, collisions, RNG) are stored.
+# Obstacle motion, particles and animation timers are cheap and replayed from them.
+MAGIC = b'DODGREPL'
+VERSION = 1
+
+F_SPAWN = 1
+F_TRAIL = 2
+F_SCORE = 4
+F_LEVEL_UP = 8
+F_CHAT = 16
+F_GAME_OVER = 32
+F_BURST = 64
+
+class ReplayRecorder:
+    """Collects the per-frame log of a running dodger.Game."""
+    def __init__(self, config):
+        self.config = config
+        self.ys = []
+        self.moods = bytearray()
+        self.shakes = []
+        self.flags = bytearray()
+        self.payload = bytearray()
+
+    def record(self, game):
+        """Records the frame the game has just stepped."""
+        flags = 0
+        spawn = trail = score = burst = None
+        chats = []
+        for entry in game.log:
+            kind = entry[0]
+            if kind == 'spawn': flags |= F_SPAWN; spawn = entry[1:]
+            elif kind == 'trail': flags |= F_TRAIL; trail = entry[1]
+            elif kind == 'score': flags |= F_SCORE; score = entry[1]
+            elif kind == 'level_up': flags |= F_LEVEL_UP
+            elif kind == 'chat': flags |= F_CHAT; chats.append(entry[1:])
+            elif kind == 'game_over': flags |= F_GAME_OVER
+            elif kind == 'burst': flags |= F_BURST; burst = entry[1]
+
+        if spawn: self.payload += struct.pack('<hhB', *spawn)
+        if trail is not None: self.payload += struct.pack('B', trail)
+        if score is not None: self.payload += struct.pack('<I', score)
+        if chats:
+            self.payload += struct.pack('B', len(chats))
+            for user_i, color_i, mood, text_i in chats:
+                self.payload += struct.pack('BBBB', user_i, color_i, dodger.MOOD_STATES.index(mood), text_i)
+        if burst is not None: self.payload += struct.pack('<I', burst)
+
+        self.ys.append(game.player.rect.y)
+        self.moods.append(dodger.MOOD_STATES.index(game.facecam.state))
+        self.shakes.append(game.facecam.shake)
+        self.flags.append(flags)
+
+    def save(self, path):
+        n = len(self.flags)
+        deltas = [y - prev for y, prev in zip(self.ys, [0] + self.ys[:-1])]
+        body = (struct.pack(f'<{n}h', *deltas) + bytes(self.moods) +
+                struct.pack(f'<{n}b', *self.shakes) + bytes(self.flags) + bytes(self.payload))
+        config_json = json.dumps(self.config, separators=(',', ':')).encode('utf-8')
+        with open(path, 'wb') as f:
+            f.write(MAGIC)
+            f.write(struct.pack('<BII', VERSION, len(config_json), n))
+            f.write(config_json)
+            f.write(zlib.compress(body, 9))
+        return path
+
+class Replay:
+    """A decoded replay file."""
+    def __init__(self, config, ys, moods, shakes, flags, payload):
+        self.config = config
+        self.ys = ys
+        self.moods = moods
+        self.shakes = shakes
+        self.flags = flags
+        self.payload = payload
+
+    def __len__(self):
+        return len(self.flags)
+
+def load_replay(path):
+    """Reads a replay file written by ReplayRecorder.save."""
+    with open(path, 'rb') as f:
+        data = f.read()
+    if not data.startswith(MAGIC):
+        raise ValueError(f"Not a dodger replay: {path}")
+    offset = len(MAGIC)
+    version, config_len, n = struct.unpack_from('<BII', data, offset)
+    if version != VERSION:
+        raise ValueError(f"Unsupported replay version {version} (expected {VERSION})")
+    offset += struct.calcsize('<BII')
+    config = json.loads(data[offset:offset + config_len].decode('utf-8'))
+    body = zlib.decompress(data[offset + config_len:])
+
+    ys = []
+    y = 0
+    for d in struct.unpack_from(f'<{n}h', body, 0):
+        y += d
+        ys.append(y)
+    pos = 2 * n
+    moods = body[pos:pos + n]; pos += n
+    shakes = struct.unpack_from(f'<{n}b', body, pos); pos += n
+    flags = body[pos:pos + n]; pos += n
+    return Replay(config, ys, moods, shakes, flags, body[pos:])
+
+class ReplayGame(dodger.Game):
+    """
+    A Game driven by a replay instead of its own logic. It applies the recorded
+    decisions each frame and keeps the cosmetic state moving, so draw() produces
+    the frames of the original render.
+    """
+    def __init__(self, replay):
+        super().__init__(replay.config)
+        self.replay = replay
+        self.cursor = 0
+
+    def _read(self, fmt):
+        values = struct.unpack_from(fmt, self.replay.payload, self.cursor)
+        self.cursor += struct.calcsize(fmt)
+        return values
+
+    def step(self):
+        r = self.replay
+        i = self.frame_count
+        flags = r.flags[i]
+        events = []
+        self.log = []
+        level_mgr = self.level_mgr
+        player = self.player
+
+        if not self.game_over:
+            self.speed = self.compute_speed()
+            if flags & F_SPAWN: self.spawn_pair(*self._read('<hhB'))
+            active_obstacles = []
+            for o in self.obstacles:
+                o.update(self.speed)
+                if o.rect.right >= 0: active_obstacles.append(o)
+                else: self.obstacle_pool.release(o)
+            self.obstacles = active_obstacles
+
+            player.rect.y = r.ys[i]
+            player.y_float = float(player.rect.y)
+            if flags & F_TRAIL: player.add_trail(self._read('B')[0])
+            player.animate()
+        else:
+            self.game_over_timer += 1
+            if self.game_over_timer > (dodger.GAMEOVER_DURATION * dodger.FPS): self.running = False
+
+        if flags & F_SCORE: self.score = self._read('<I')[0]
+        if flags & F_LEVEL_UP:
+            level_mgr.level += 1
+            level_mgr.level_text_timer = 120
+            events.append('level_up')
+        if flags & F_CHAT:
+            for _ in range(self._read('B')[0]):
+                user_i, color_i, mood_i, text_i = self._read('BBBB')
+                self.chat.push(user_i, color_i, dodger.MOOD_STATES[mood_i], text_i)
+        if flags & F_GAME_OVER: self.game_over = True
+        if flags & F_BURST:
+            self.spawn_burst(self._read('<I')[0])
+            events.append('death')
+
+        self.update_particles()
+        was_scared = self.facecam.state == 'scared'
+        self.facecam.frozen = self.game_over_timer > 0
+        self.facecam.set_state(dodger.MOOD_STATES[r.moods[i]], r.shakes[i])
+        if self.facecam.state == 'scared' and not was_scared and not self.game_over:
+            events.append('near_miss')
+        self.chat.animate()
+        if level_mgr.level_text_timer > 0: level_mgr.level_text_timer -= 1
+
+        if self.game_over_timer == 0: self.grid_offset = (self.frame_count * self.speed) % 50
+        self.frame_count += 1
+        if self.frame_count >= len(r): self.running = False
+        return events
+
+def render_replay(replay_file, output_file="replay.mp4", width=None, height=None, fps=None, profile="standard"):
+    """
+    Re-renders a replay to video without re-running the game logic.
+
+    Frames are drawn at the resolution the game was recorded at and FFmpeg
+    scales / resamples them to the requested output. An output size with
+    another aspect ratio, or larger than the recording, is laid out for its
+    shape like a rendition of run_game (see dodger.Layout) instead of being
+    stretched, with the HUD drawn at the output size.
+
+    Args:
+        replay_file: Path of a replay written by run_game(..., replay_file=...).
+        output_file: Path of the MP4 to write.
+        width, height: Output size (either may be omitted to keep the aspect ratio).
+        fps: Output frame rate (defaults to the recorded one).
+        profile: Name of an encoder profile in dodger.ENCODER_PROFILES.
+
+    Returns:
+        str: output_file, or None if FFmpeg is missing.
+    """
+    if profile not in dodger.ENCODER_PROFILES:
+        raise ValueError(f"Unknown encoder profile: {profile}")
+    replay = load_replay(replay_file)
+    config = replay.config
+    dodger.load_config(config)
+    W, H, FPS = dodger.WIDTH, dodger.HEIGHT, dodger.FPS
+    size = f"{width or 'auto'}x{height or 'auto'}" if (width or height) else f"{W}x{H}"
+    print(f"Rendering replay | {len(replay)} frames | Res: {size} | Profile: {profile}")
+
+    dodger.init_pygame()
+    canvas = pygame.Surface((W, H))
+    layout = None
+    if width and height:
+        # yuv420p needs even dimensions
+        width, height = width // 2 * 2, height // 2 * 2
+        layouts, _ = dodger.plan_renditions([{"path": output_file, "width": width, "height": height}])
+        layout = layouts[0] if layouts else None
+    frames = pygame.Surface(layout.size) if layout else canvas
+
+    # Same soundtrack as the original render, usually straight from the cache
+    soundtrack = dodger.start_soundtrack(config.get('seed', 12345), config.get('duration', 15))
+    mux = dodger.SoundtrackMux(soundtrack, output_file)
+
+    filters = []
+    if (width or height) and not layout:
+        # yuv420p needs even dimensions
+        filters.append(f"scale={width // 2 * 2 if width else -2}:{height // 2 * 2 if height else -2}")
+    if fps: filters.append(f"fps={fps}")
+    cmd = [
+        dodger.FFMPEG_PATH, "-y",
+        "-f", "rawvideo", "-pix_fmt", "rgb24",
+        "-s", "{}x{}".format(*frames.get_size()), "-r", str(FPS),
+        "-i", "-",
+        *(["-vf", ",".join(filters)] if filters else []),
+        *dodger.ENCODER_PROFILES[profile],
+        *mux.output
+    ]
+    try:
+        ffmpeg = subprocess.Popen(cmd, stdin=subprocess.PIPE, pass_fds=mux.pass_fds)
+    except FileNotFoundError:
+        print(f"Error: FFmpeg not found at {dodger.FFMPEG_PATH}")
+        mux.close()
+        soundtrack.cancel()
+        return None
+    mux.start()
+
+    finished = False
+    try:
+        game = ReplayGame(replay)
+        frame = None
+        with dodger.gc_paused():
+            while game.running:
+                game.step()
+                if layout:
+                    game.draw_layouts(canvas, [(frames, layout)])
+                    changed = True
+                else:
+                    changed = game.draw(canvas)
+                if changed or frame is None: frame = pygame.image.tostring(frames, 'RGB')
+                try: ffmpeg.stdin.write(frame)
+                except BrokenPipeError: break
+
+        ffmpeg.stdin.close(); ffmpeg.wait()
+        if ffmpeg.returncode != 0:
+            raise RuntimeError(f"FFmpeg exited with code {ffmpeg.returncode} while rendering replay")
+        mux.close()
+        finished = True
+    finally:
+        if not finished:
+            if ffmpeg.poll() is None: ffmpeg.kill()
+            ffmpeg.wait()
+            mux.abort()
+            if os.path.exists(output_file): os.remove(output_file)
+        dodger.quit_pygame()
+    print(f"Done. Saved {output_file}")
+    return output_file
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="Re-render a dodger replay file.")
+    parser.add_argument("replay_file")
+    parser.add_argument("output_file")
+    parser.add_argument("--width", type=int)
+    parser.add_argument("--height", type=int)
+    parser.add_argument("--fps", type=int)
+    parser.add_argument("--profile", default="standard", choices=sorted(dodger.ENCODER_PROFILES))
+    args = parser.parse_args()
+    render_replay(args.replay_file, args.output_file, args.width, args.height, args.fps, args.profile)
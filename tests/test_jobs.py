@@ -0,0 +1,108 @@
+import sqlite3
+import time
+
+import pytest
+
+import jobs
+
+# Short enough to let leases run out within a test
+LEASE = 0.05
+
+@pytest.fixture
+def queue(tmp_path):
+    return jobs.JobQueue(str(tmp_path / "jobs.db"))
+
+def expire():
+    time.sleep(LEASE * 2)
+
+def test_claim_takes_the_oldest_queued_job(queue):
+    first = queue.enqueue("generate", {"n": 1})
+    queue.enqueue("generate", {"n": 2})
+    job = queue.claim("w1", lease_seconds=LEASE)
+    assert job["id"] == first
+    assert job["state"] == jobs.RENDERING
+    assert job["worker"] == "w1"
+    assert job["attempts"] == 1
+    assert queue.counts() == {jobs.RENDERING: 1, jobs.QUEUED: 1}
+
+def test_claim_on_an_empty_queue(queue):
+    assert queue.claim("w1") is None
+
+def test_heartbeat_keeps_the_lease(queue):
+    job_id = queue.enqueue("generate")
+    queue.claim("w1", lease_seconds=LEASE)
+    for _ in range(4):
+        time.sleep(LEASE / 2)
+        assert queue.heartbeat(job_id, "w1", lease_seconds=LEASE)
+    assert queue.claim("w2", lease_seconds=LEASE) is None
+    assert queue.get(job_id)["worker"] == "w1"
+
+def test_expired_lease_is_taken_over(queue):
+    job_id = queue.enqueue("generate_and_upload")
+    queue.claim("w1", lease_seconds=LEASE)
+    expire()
+    job = queue.claim("w2", lease_seconds=LEASE)
+    assert job["id"] == job_id
+    assert job["worker"] == "w2"
+    assert job["attempts"] == 2
+    assert "w1" in job["error"]
+    # The old worker has lost the job: nothing it does sticks
+    assert not queue.heartbeat(job_id, "w1")
+    assert not queue.report_progress(job_id, "w1", {"frame": 1})
+    assert not queue.set_state(job_id, "w1", jobs.UPLOADING)
+    assert not queue.complete(job_id, "w1", {"output_path": "stale.mp4"})
+    assert not queue.fail(job_id, "w1", "too late")
+    assert queue.complete(job_id, "w2", {"output_path": "new.mp4"})
+    job = queue.get(job_id)
+    assert job["state"] == jobs.DONE
+    assert job["result"] == {"output_path": "new.mp4"}
+
+def test_expired_lease_fails_the_job_out_of_attempts(queue):
+    job_id = queue.enqueue("generate", max_attempts=2)
+    for worker in ("w1", "w2"):
+        assert queue.claim(worker, lease_seconds=LEASE)["id"] == job_id
+        expire()
+    assert queue.requeue_expired() == 1
+    job = queue.get(job_id)
+    assert job["state"] == jobs.FAILED
+    assert job["attempts"] == 2
+    assert queue.claim("w3") is None
+
+def test_uploading_jobs_expire_too(queue):
+    job_id = queue.enqueue("generate_and_upload")
+    queue.claim("w1", lease_seconds=LEASE)
+    assert queue.set_state(job_id, "w1", jobs.UPLOADING, output_path="video.mp4")
+    expire()
+    job = queue.claim("w2", lease_seconds=LEASE)
+    assert job["id"] == job_id
+    # A retry finds the rendered video and only uploads it
+    assert job["output_path"] == "video.mp4"
+
+def test_fail_requeues_until_out_of_attempts(queue):
+    job_id = queue.enqueue("generate", max_attempts=2)
+    queue.claim("w1")
+    assert queue.fail(job_id, "w1", "boom")
+    assert queue.get(job_id)["state"] == jobs.QUEUED
+    queue.claim("w2")
+    assert queue.fail(job_id, "w2", "boom again")
+    job = queue.get(job_id)
+    assert job["state"] == jobs.FAILED
+    assert job["error"] == "boom again"
+
+def test_reads_do_not_wait_for_the_write_lock(queue):
+    job_id = queue.enqueue("generate")
+    writer = sqlite3.connect(queue.path, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        started = time.monotonic()
+        assert queue.get(job_id)["state"] == jobs.QUEUED
+        assert len(queue.list()) == 1
+        assert queue.counts() == {jobs.QUEUED: 1}
+        assert time.monotonic() - started < 1
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+def test_unknown_kind(queue):
+    with pytest.raises(ValueError):
+        queue.enqueue("transcode")
@@ -0,0 +1,45 @@
+import pytest
+
+import dodger
+import jobs
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    # main opens the job queue on import
+    jobs.DB_PATH = str(tmp_path_factory.mktemp("queue") / "jobs.db")
+    import main
+    return main
+
+def hud_layout(config):
+    """The Layout run_game draws the main output's HUD with."""
+    dodger.load_config(config)
+    output = {"path": "out.mp4", "width": config.get("output_width"), "height": config.get("output_height")}
+    layouts, stream_of = dodger.plan_renditions([output])
+    return layouts[stream_of[0] - 1] if stream_of[0] else dodger.Layout(dodger.WIDTH, dodger.HEIGHT)
+
+@pytest.mark.parametrize("level", range(4))
+def test_hud_boxes_do_not_overlap_at_any_admission_level(main, level):
+    import config_generator
+    config = dict(config_generator.STATIC_SETTINGS)
+    main.degrade_config(config, level)
+    layout = hud_layout(config)
+    # The HUD is laid out for the video's size, whatever size the game is drawn at
+    assert layout.size == (config_generator.STATIC_SETTINGS["width"], config_generator.STATIC_SETTINGS["height"])
+    canvas = dodger.pygame.Rect((0, 0), layout.size)
+    assert not layout.chat_rect().colliderect(layout.facecam_rect())
+    assert canvas.contains(layout.chat_rect())
+    assert canvas.contains(layout.facecam_rect())
+
+def test_full_quality_is_drawn_natively(main):
+    import config_generator
+    config = dict(config_generator.STATIC_SETTINGS)
+    main.degrade_config(config, 0)
+    _, stream_of = dodger.plan_renditions([{"path": "out.mp4"}])
+    assert stream_of == [0]
+    assert hud_layout(config).is_native()
+
+@pytest.mark.parametrize("size", [(480, 854), (854, 480), (1080, 1080), (720, 1280)])
+def test_rendition_layouts_do_not_overlap(size):
+    dodger.load_config({"width": 480, "height": 854})
+    layout = dodger.Layout(*size)
+    assert not layout.chat_rect().colliderect(layout.facecam_rect())
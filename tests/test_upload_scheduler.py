@@ -0,0 +1,188 @@
+import threading
+import time
+
+import pytest
+
+import upload_scheduler
+from upload_scheduler import QuotaLedger, UploadScheduler
+
+COST = 400
+
+@pytest.fixture
+def ledger(tmp_path):
+    return QuotaLedger(str(tmp_path / "jobs.db"), daily_quota=3 * COST)
+
+@pytest.fixture
+def reserve(monkeypatch):
+    monkeypatch.setattr(upload_scheduler, "PRIORITY_RESERVE", COST)
+
+class FakeUploads:
+    """upload_fn for the scheduler: records uploads and returns a video id per file."""
+    def __init__(self, fail=None):
+        self.uploaded = []
+        self.fail = fail or {}
+        self.lock = threading.Lock()
+
+    def __call__(self, file_path, **kwargs):
+        error = self.fail.pop(file_path, None)
+        if error:
+            raise error
+        with self.lock:
+            self.uploaded.append(file_path)
+        return f"id-{file_path}"
+
+def scheduler(ledger, uploads, concurrency=1):
+    return UploadScheduler(concurrency=concurrency, ledger=ledger, upload_fn=uploads, cost=COST,
+                           poll_interval=0.05)
+
+def submit(s, name, priority=0):
+    return s.submit(name, title=name, description="", priority=priority)
+
+def wait_until(condition, timeout=5):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "timed out"
+        time.sleep(0.01)
+
+def test_reserve_within_the_budget(ledger):
+    assert ledger.reserve(COST)
+    assert ledger.reserve(COST)
+    assert ledger.spent() == 2 * COST
+    assert ledger.remaining() == COST
+    assert ledger.reserve(COST)
+    assert not ledger.reserve(1)
+    assert ledger.spent() == 3 * COST
+
+def test_reserve_keeps_units_over(ledger):
+    assert ledger.reserve(COST, keep=COST)
+    assert not ledger.reserve(2 * COST, keep=1)
+    assert ledger.reserve(COST, keep=COST)
+    assert not ledger.reserve(COST, keep=COST)
+    assert ledger.reserve(COST, keep=0)
+
+def test_budget_is_per_quota_day(ledger, monkeypatch):
+    monkeypatch.setattr(upload_scheduler, "quota_day", lambda now=None: "2026-01-01")
+    assert ledger.reserve(3 * COST)
+    assert ledger.remaining() == 0
+    monkeypatch.setattr(upload_scheduler, "quota_day", lambda now=None: "2026-01-02")
+    assert ledger.remaining() == 3 * COST
+    assert ledger.spent("2026-01-01") == 3 * COST
+
+def test_exhaust_uses_up_the_day(ledger):
+    assert ledger.reserve(COST)
+    ledger.exhaust()
+    assert ledger.remaining() == 0
+    assert not ledger.reserve(1)
+    # Never lowers what was counted
+    ledger.daily_quota = COST // 2
+    ledger.exhaust()
+    assert ledger.spent() == 3 * COST
+
+def test_the_ledger_is_shared_between_instances(ledger):
+    other = QuotaLedger(ledger.path, daily_quota=ledger.daily_quota)
+    assert ledger.reserve(2 * COST)
+    assert not other.reserve(2 * COST)
+    assert other.reserve(COST)
+
+def test_uploads_are_charged_to_the_ledger(ledger, reserve):
+    uploads = FakeUploads()
+    s = scheduler(ledger, uploads, concurrency=2)
+    try:
+        futures = [submit(s, name) for name in ("a.mp4", "b.mp4")]
+        assert [f.result(timeout=5) for f in futures] == ["id-a.mp4", "id-b.mp4"]
+        assert ledger.spent() == 2 * COST
+        wait_until(lambda: s.backlog() == 0)
+    finally:
+        s.close(wait=False)
+
+def test_priority_reserve_holds_back_normal_uploads(ledger, reserve):
+    uploads = FakeUploads()
+    s = scheduler(ledger, uploads)
+    try:
+        assert submit(s, "a.mp4").result(timeout=5)
+        assert submit(s, "b.mp4").result(timeout=5)
+        # Only the reserve is left: a normal upload waits for the next day...
+        held = submit(s, "c.mp4")
+        time.sleep(0.2)
+        assert not held.done()
+        assert s.backlog() == 1
+        # ...while a priority one still goes out, ahead of it
+        assert submit(s, "d.mp4", priority=1).result(timeout=5) == "id-d.mp4"
+        assert uploads.uploaded == ["a.mp4", "b.mp4", "d.mp4"]
+        assert ledger.remaining() == 0
+        assert not held.done()
+    finally:
+        s.close(wait=False)
+
+def test_held_uploads_go_out_once_the_quota_resets(ledger, reserve, monkeypatch):
+    monkeypatch.setattr(upload_scheduler, "quota_day", lambda now=None: "2026-01-01")
+    ledger.exhaust()
+    s = scheduler(ledger, FakeUploads())
+    try:
+        held = submit(s, "a.mp4")
+        time.sleep(0.2)
+        assert not held.done()
+        monkeypatch.setattr(upload_scheduler, "quota_day", lambda now=None: "2026-01-02")
+        assert held.result(timeout=5) == "id-a.mp4"
+    finally:
+        s.close(wait=False)
+
+def test_quota_error_exhausts_the_ledger_and_holds_the_upload(ledger, reserve):
+    uploads = FakeUploads(fail={"a.mp4": Exception("HttpError 403: quotaExceeded")})
+    s = scheduler(ledger, uploads)
+    try:
+        future = submit(s, "a.mp4", priority=1)
+        wait_until(lambda: ledger.remaining() == 0)
+        time.sleep(0.2)
+        assert not future.done()
+        assert s.backlog() == 1
+    finally:
+        s.close(wait=False)
+
+def test_other_errors_fail_the_upload(ledger, reserve):
+    s = scheduler(ledger, FakeUploads(fail={"a.mp4": ValueError("bad file")}))
+    try:
+        with pytest.raises(ValueError):
+            submit(s, "a.mp4").result(timeout=5)
+    finally:
+        s.close(wait=False)
+
+def test_submit_does_not_wait_for_the_ledger(tmp_path):
+    class SlowLedger:
+        """A ledger whose database is busy until released."""
+        def __init__(self):
+            self.release = threading.Event()
+            self.reserving = threading.Event()
+
+        def reserve(self, units, keep=0):
+            self.reserving.set()
+            self.release.wait()
+            return True
+
+    ledger = SlowLedger()
+    s = scheduler(ledger, FakeUploads())
+    try:
+        first = submit(s, "a.mp4")
+        assert ledger.reserving.wait(5)
+        queued = []
+        caller = threading.Thread(target=lambda: queued.append((submit(s, "b.mp4"), s.backlog())), daemon=True)
+        caller.start()
+        caller.join(1)
+        assert queued, "submit() waited for the ledger"
+        second, backlog = queued[0]
+        assert backlog == 2
+        ledger.release.set()
+        assert first.result(timeout=5) == "id-a.mp4"
+        assert second.result(timeout=5) == "id-b.mp4"
+    finally:
+        ledger.release.set()
+        s.close(wait=False)
+
+def test_close_drains_the_queue(ledger, reserve):
+    uploads = FakeUploads()
+    s = scheduler(ledger, uploads)
+    futures = [submit(s, name) for name in ("a.mp4", "b.mp4")]
+    s.close()
+    assert all(f.done() for f in futures)
+    with pytest.raises(RuntimeError):
+        submit(s, "c.mp4")
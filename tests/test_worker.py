@@ -0,0 +1,66 @@
+import os
+import time
+
+import pytest
+
+import jobs
+import worker
+
+@pytest.fixture
+def queue(tmp_path):
+    return jobs.JobQueue(str(tmp_path / "jobs.db"))
+
+@pytest.fixture
+def output_dir(tmp_path, monkeypatch):
+    path = tmp_path / "out"
+    path.mkdir()
+    monkeypatch.setattr(worker, "OUTPUT_DIR", str(path))
+    return path
+
+def video(output_dir, job_id, attempt=1, age=0):
+    path = output_dir / f"video_{job_id}_{attempt}.mp4"
+    path.write_bytes(b"mp4")
+    mtime = time.time() - age
+    os.utime(path, (mtime, mtime))
+    return path
+
+def finished(queue, kind="generate"):
+    job_id = queue.enqueue(kind)
+    queue.claim("w1")
+    queue.complete(job_id, "w1", {"output_path": "x"})
+    return job_id
+
+def test_sweep_deletes_expired_videos_of_finished_jobs(queue, output_dir):
+    old = video(output_dir, finished(queue), age=worker.OUTPUT_TTL_SECONDS + 60)
+    fresh = video(output_dir, finished(queue))
+    worker.sweep_outputs(queue)
+    assert not old.exists()
+    assert fresh.exists()
+
+def test_sweep_deletes_expired_videos_of_failed_and_unknown_jobs(queue, output_dir):
+    job_id = queue.enqueue("generate", max_attempts=1)
+    queue.claim("w1")
+    queue.fail(job_id, "w1", "boom")
+    failed = video(output_dir, job_id, age=worker.OUTPUT_TTL_SECONDS + 60)
+    orphan = video(output_dir, "0f9c1c9e-0000-4000-8000-000000000000", age=worker.OUTPUT_TTL_SECONDS + 60)
+    worker.sweep_outputs(queue)
+    assert not failed.exists()
+    assert not orphan.exists()
+
+def test_sweep_keeps_videos_of_unfinished_jobs(queue, output_dir):
+    # Rendered, waiting for its upload (e.g. while the quota is spent)
+    uploading = queue.enqueue("generate_and_upload")
+    queue.claim("w1")
+    path = video(output_dir, uploading, age=worker.OUTPUT_TTL_SECONDS + 60)
+    queue.set_state(uploading, "w1", jobs.UPLOADING, output_path=str(path))
+    queued = video(output_dir, queue.enqueue("generate"), age=worker.OUTPUT_TTL_SECONDS + 60)
+    worker.sweep_outputs(queue)
+    assert path.exists()
+    assert queued.exists()
+
+def test_sweep_leaves_other_files_alone(queue, output_dir):
+    other = output_dir / "preview_1.gif"
+    other.write_bytes(b"gif")
+    os.utime(other, (0, 0))
+    worker.sweep_outputs(queue)
+    assert other.exists()
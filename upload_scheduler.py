@@ -0,0 +1,297 @@
+# upload_scheduler.py
+# Runs YouTube uploads off the render path: a few at a time, within the daily API quota.
+
+import datetime
+import heapq
+import itertools
+import logging
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import Future
+
+import jobs
+import youtube_uploader
+
+logger = logging.getLogger("app.uploads")
+
+# YouTube Data API quota: every project gets a daily budget of units that
+# resets at midnight Pacific time, and each videos.insert costs a fixed amount.
+DAILY_QUOTA = int(os.environ.get("YOUTUBE_DAILY_QUOTA", 10000))
+UPLOAD_COST = int(os.environ.get("YOUTUBE_UPLOAD_COST", 1600))
+# Units kept back for priority > 0 uploads once the budget runs low
+PRIORITY_RESERVE = int(os.environ.get("YOUTUBE_PRIORITY_RESERVE", UPLOAD_COST))
+UPLOAD_CONCURRENCY = int(os.environ.get("UPLOAD_CONCURRENCY", 2))
+
+try:
+    from zoneinfo import ZoneInfo
+    QUOTA_TZ = ZoneInfo("America/Los_Angeles")
+except Exception:
+    # No tz database in the image; Pacific standard time is close enough
+    QUOTA_TZ = datetime.timezone(datetime.timedelta(hours=-8))
+
+def quota_day(now=None):
+    """The quota day (in Pacific time) a timestamp falls in, as 'YYYY-MM-DD'."""
+    return datetime.datetime.fromtimestamp(now or time.time(), QUOTA_TZ).strftime("%Y-%m-%d")
+
+def seconds_until_reset(now=None):
+    """Seconds until the next quota day starts."""
+    now = datetime.datetime.fromtimestamp(now or time.time(), QUOTA_TZ)
+    midnight = (now + datetime.timedelta(days=1)).replace(hour=0, minute=0, second=0, microsecond=0)
+    return (midnight - now).total_seconds()
+
+class QuotaLedger:
+    """
+    Quota units spent per day, kept next to the job queue so every worker
+    process draws from the same budget.
+    """
+    def __init__(self, path=None, daily_quota=None):
+        self.path = path or jobs.DB_PATH
+        self.daily_quota = daily_quota or DAILY_QUOTA
+        self._execute("CREATE TABLE IF NOT EXISTS quota (day TEXT PRIMARY KEY, units INTEGER NOT NULL)")
+
+    def _connect(self):
+        return sqlite3.connect(self.path, timeout=30, isolation_level=None)
+
+    def _execute(self, sql, params=()):
+        db = self._connect()
+        try:
+            return db.execute(sql, params).fetchone()
+        finally:
+            db.close()
+
+    def spent(self, day=None):
+        row = self._execute("SELECT units FROM quota WHERE day = ?", (day or quota_day(),))
+        return row[0] if row else 0
+
+    def remaining(self):
+        return max(0, self.daily_quota - self.spent())
+
+    def reserve(self, units, keep=0):
+        """
+        Takes `units` from today's budget if that leaves at least `keep`
+        units over. Returns whether it did.
+        """
+        day = quota_day()
+        db = self._connect()
+        try:
+            db.execute("BEGIN IMMEDIATE")
+            row = db.execute("SELECT units FROM quota WHERE day = ?", (day,)).fetchone()
+            spent = row[0] if row else 0
+            if spent + units + keep > self.daily_quota:
+                db.execute("ROLLBACK")
+                return False
+            db.execute("INSERT INTO quota (day, units) VALUES (?, ?) "
+                       "ON CONFLICT(day) DO UPDATE SET units = units + excluded.units", (day, units))
+            db.execute("COMMIT")
+            return True
+        finally:
+            db.close()
+
+    def exhaust(self):
+        """Marks today's budget as used up (the API said so, whatever we counted)."""
+        self._execute("INSERT INTO quota (day, units) VALUES (?, ?) "
+                      "ON CONFLICT(day) DO UPDATE SET units = MAX(units, excluded.units)",
+                      (quota_day(), self.daily_quota))
+
+def is_quota_error(error):
+    """Whether an upload failed because the project is out of quota."""
+    text = str(error)
+    return "quotaExceeded" in text or "uploadLimitExceeded" in text
+
+class UploadScheduler:
+    """
+    Runs uploads on `concurrency` threads, highest priority first (then in
+    submission order), charging each one to the QuotaLedger before it starts.
+
+    When the budget cannot cover the next upload it is held until the quota
+    resets (re-checking every `poll_interval` seconds, since other processes
+    share the ledger). Once the budget is down to PRIORITY_RESERVE only
+    uploads with priority > 0 go out, so they can jump a held-back batch.
+
+    upload_fn is youtube_uploader.upload_video by default; point
+    YOUTUBE_API_ENDPOINT at a local fake to exercise the real client.
+    """
+    def __init__(self, concurrency=None, ledger=None, upload_fn=None, cost=None, poll_interval=60):
+        self.concurrency = concurrency or UPLOAD_CONCURRENCY
+        self.ledger = ledger or QuotaLedger()
+        self.upload_fn = upload_fn or youtube_uploader.upload_video
+        self.cost = cost or UPLOAD_COST
+        self.poll_interval = poll_interval
+        self.pending = []
+        self.counter = itertools.count()
+        self.active = 0
+        self.closed = False
+        self.cond = threading.Condition()
+        self.threads = [threading.Thread(target=self._run, daemon=True, name=f"upload-{i}")
+                        for i in range(self.concurrency)]
+        for t in self.threads:
+            t.start()
+
+    def submit(self, file_path, title, description, privacy_status="private", tags=None, priority=0,
+               progress=None):
+        """
+        Queues an upload. Returns a Future resolving to the video id.
+        progress is handed to upload_fn (see youtube_uploader.upload_video).
+        """
+        future = Future()
+        kwargs = dict(file_path=file_path, title=title, description=description,
+                      privacy_status=privacy_status, tags=tags, progress=progress)
+        with self.cond:
+            if self.closed:
+                raise RuntimeError("Upload scheduler is closed")
+            heapq.heappush(self.pending, (-priority, next(self.counter), kwargs, future))
+            self.cond.notify()
+        return future
+
+    def backlog(self):
+        """Uploads queued or in flight."""
+        with self.cond:
+            return len(self.pending) + self.active
+
+    def _next(self):
+        """Blocks until an upload may start (quota reserved) and returns it, or None once closed."""
+        while True:
+            with self.cond:
+                while not self.pending:
+                    if self.closed:
+                        return None
+                    self.cond.wait()
+                # Taken off the queue (and counted in flight) while its quota is reserved
+                item = heapq.heappop(self.pending)
+                self.active += 1
+            # The ledger may wait up to its timeout for the database; don't hold
+            # up submit() and backlog() meanwhile
+            keep = 0 if -item[0] > 0 else PRIORITY_RESERVE
+            try:
+                reserved = self.ledger.reserve(self.cost, keep)
+            except Exception as e:
+                logger.warning(f"Could not reserve upload quota: {e}")
+                reserved = False
+            if reserved:
+                return item
+            with self.cond:
+                heapq.heappush(self.pending, item)
+                self.active -= 1
+                # Something may have come in meanwhile that the budget does cover (priority > 0)
+                if -self.pending[0][0] > 0 and keep > 0:
+                    continue
+                wait = min(self.poll_interval, seconds_until_reset())
+                logger.info(f"Upload quota low; holding {len(self.pending)} uploads for {wait:.0f}s")
+                self.cond.wait(wait)
+
+    def _run(self):
+        while True:
+            item = self._next()
+            if item is None:
+                return
+            neg_priority, seq, kwargs, future = item
+            try:
+                # A future requeued for quota is already running
+                if future.running() or future.set_running_or_notify_cancel():
+                    future.set_result(self.upload_fn(**kwargs))
+            except Exception as e:
+                if is_quota_error(e):
+                    # Out of quota after all: hold this one for the next day
+                    logger.warning(f"Upload rejected for quota: {e}")
+                    self.ledger.exhaust()
+                    with self.cond:
+                        heapq.heappush(self.pending, (neg_priority, seq, kwargs, future))
+                else:
+                    future.set_exception(e)
+            finally:
+                with self.cond:
+                    self.active -= 1
+                    self.cond.notify_all()
+
+    def close(self, wait=True):
+        """Stops accepting uploads; with wait, returns once the queue has drained."""
+        with self.cond:
+            self.closed = True
+            self.cond.notify_all()
+        if wait:
+            for t in self.threads:
+                t.join()
+
+_scheduler = None
+_scheduler_lock = threading.Lock()
+
+def get_scheduler():
+    """The process-wide scheduler, started on first use."""
+    global _scheduler
+    with _scheduler_lock:
+        if _scheduler is None:
+            _scheduler = UploadScheduler()
+        return _scheduler
+
+def shutdown():
+    """Drains and stops the process-wide scheduler, if it was started."""
+    global _scheduler
+    with _scheduler_lock:
+        scheduler, _scheduler = _scheduler, None
+    if scheduler:
+        scheduler.close()
+
+def submit_video_upload(
+    video_path: str,
+    title: str = None,
+    description: str = None,
+    privacy_status: str = None,
+    priority: int = 0,
+    progress=None
+):
+    """
+    Queues a video file on the upload scheduler, which runs a few uploads at
+    a time within the daily YouTube API quota.
+    
+    Args:
+        video_path: Path to the video file
+        title: Video title (optional)
+        description: Video description (optional)
+        privacy_status: Privacy status (optional)
+        priority: Uploads with priority > 0 may use the last of the day's quota
+        progress: Called as progress(bytes_sent, total_bytes) while uploading
+    
+    Returns:
+        Future: Resolves to the YouTube video ID
+    """
+    # Check if file exists
+    if not os.path.exists(video_path):
+        raise FileNotFoundError(f"Video file not found: {video_path}")
+    
+    # Generate default title if not provided
+    if not title:
+        today = datetime.datetime.now().strftime("%Y-%m-%d")
+        title = f"Insane Dodger Gameplay {today} #Shorts"
+    
+    # Generate default description if not provided
+    if not description:
+        description = (
+            "Can the AI survive this level? 😱\n\n"
+            "Generated by Python Code.\n"
+            "#gaming #coding #python #pygame #shorts"
+        )
+    
+    # Get privacy status
+    if not privacy_status:
+        privacy_status = os.environ.get("YOUTUBE_PRIVACY_STATUS", "private")
+    
+    logger.info(f"Queueing upload: {video_path}")
+    return get_scheduler().submit(
+        video_path,
+        title=title,
+        description=description,
+        privacy_status=privacy_status,
+        priority=priority,
+        progress=progress
+    )
+
+def upload_result(video_id: str) -> dict:
+    """The response fields of a finished upload."""
+    video_url = f"https://youtu.be/{video_id}"
+    logger.info(f"Upload successful! URL: {video_url}")
+    return {
+        "video_id": video_id,
+        "url": video_url
+    }
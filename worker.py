@@ -0,0 +1,344 @@
+# worker.py
+# Job workers: claim jobs from the durable queue (jobs.py), render and upload them.
+#
+#   python worker.py --processes 2
+#
+# Run it on the host that has JOBS_DB_PATH on its local disk, next to the API (the queue is
+# single-host, see jobs.JobQueue); scale out with --processes.
+
+import argparse
+import logging
+import multiprocessing
+import os
+import socket
+import tempfile
+import threading
+import time
+import uuid
+
+import jobs
+import upload_scheduler
+
+logger = logging.getLogger("app.worker")
+
+# Rendered videos wait here between the render and upload steps, so a retry
+# on another worker can pick the file up instead of rendering again
+OUTPUT_DIR = os.environ.get("JOBS_OUTPUT_DIR", tempfile.gettempdir())
+
+# The video of a finished "generate" job stays in OUTPUT_DIR (served by
+# GET /jobs/{id}/video) for this long; workers delete it afterwards
+OUTPUT_TTL_SECONDS = float(os.environ.get("JOBS_OUTPUT_TTL_SECONDS", 86400))
+SWEEP_INTERVAL = 60
+
+# Rendered videos a worker process may have waiting for upload before it stops claiming jobs
+UPLOAD_BACKLOG = int(os.environ.get("UPLOAD_BACKLOG", 4))
+
+# A render that gets no frame further for this many seconds is hung: the
+# watchdog kills its FFmpeg and fails the attempt
+STALL_SECONDS = float(os.environ.get("RENDER_STALL_SECONDS", 30))
+
+class Heartbeat:
+    """Keeps a claimed job's lease alive from a background thread while the job runs."""
+    def __init__(self, queue, job_id, worker_id, lease_seconds):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+        self.lease_seconds = lease_seconds
+        self.lost = False
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._beat, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def _beat(self):
+        while not self.stop_event.wait(self.lease_seconds / 3):
+            try:
+                if not self.queue.heartbeat(self.job_id, self.worker_id, self.lease_seconds):
+                    logger.warning(f"Lost the lease on job {self.job_id}")
+                    self.lost = True
+                    return
+            except Exception as e:
+                # A busy database is not fatal; the lease covers a couple of missed beats
+                logger.error(f"Heartbeat failed for job {self.job_id}: {e}")
+
+class JobProgress:
+    """
+    Writes how far a job has got to its row in the queue, where the API
+    streams it from (GET /jobs/{id}/events): the render's RenderProgress
+    snapshots, then the bytes sent by the upload.
+    """
+    def __init__(self, queue, job_id, worker_id):
+        self.queue = queue
+        self.job_id = job_id
+        self.worker_id = worker_id
+
+    def report(self, progress):
+        try:
+            self.queue.report_progress(self.job_id, self.worker_id, progress)
+        except Exception as e:
+            # Progress is best effort; a busy database must not fail the job
+            logger.debug(f"Could not record progress of job {self.job_id}: {e}")
+
+    def upload(self, bytes_sent, total_bytes):
+        self.report({"stage": "uploading", "bytes_sent": bytes_sent, "total_bytes": total_bytes})
+
+class Watchdog:
+    """
+    Cancels a render (see dodger.RenderProgress.cancel) once it has made no
+    progress for `stall_seconds`. If the render still has not given up after
+    as long again, it is wedged somewhere cancelling does not reach: the
+    job is failed and the worker process exits (main() starts a new one).
+    """
+    def __init__(self, progress, stall_seconds, on_wedged):
+        self.progress = progress
+        self.stall_seconds = stall_seconds
+        self.on_wedged = on_wedged
+        self.stop_event = threading.Event()
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+
+    def start(self):
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.stop_event.set()
+        self.thread.join()
+
+    def _watch(self):
+        interval = min(5.0, self.stall_seconds / 4)
+        while not self.stop_event.wait(interval):
+            stalled = self.progress.stalled_for()
+            if self.progress.cancelled is None:
+                if stalled > self.stall_seconds:
+                    logger.error(f"Render stalled at frame {self.progress.frame} for {stalled:.0f}s; cancelling")
+                    self.progress.cancel(f"Render stalled: no frame rendered for {stalled:.0f}s "
+                                         f"(frame {self.progress.frame} of {self.progress.max_frames})")
+            elif stalled > 2 * self.stall_seconds:
+                self.on_wedged(self.progress.cancelled)
+                return
+
+def render_job(job, progress=None):
+    """
+    Renders the video of a job on this process's warm renderer. Returns the
+    output path. progress is a dodger.RenderProgress to report to; a
+    watchdog cancels the render through it if it stalls.
+    """
+    import renderer
+    params = job["params"]
+    output_path = os.path.join(OUTPUT_DIR, f"video_{job['id']}_{job['attempts']}.mp4")
+    os.makedirs(OUTPUT_DIR, exist_ok=True)
+    # Partial renders of earlier attempts whose worker died
+    for attempt in range(1, job["attempts"]):
+        stale = os.path.join(OUTPUT_DIR, f"video_{job['id']}_{attempt}.mp4")
+        if os.path.exists(stale):
+            os.remove(stale)
+    result = renderer.render(params["config"], output_path,
+                             highlight_seconds=params.get("highlight_seconds"), progress=progress)
+    if result is None:
+        raise RuntimeError("FFmpeg not available")
+    return output_path
+
+def sweep_outputs(queue, now=None):
+    """
+    Deletes videos in OUTPUT_DIR older than OUTPUT_TTL_SECONDS whose job is
+    finished (or gone). Videos of queued and running jobs are kept: a retry
+    may still upload them.
+    """
+    cutoff = (now or time.time()) - OUTPUT_TTL_SECONDS
+    try:
+        names = os.listdir(OUTPUT_DIR)
+    except OSError as e:
+        logger.warning(f"Failed to sweep old videos: {e}")
+        return
+    for name in names:
+        if not (name.startswith("video_") and name.endswith(".mp4")):
+            continue
+        job_id = name[len("video_"):-len(".mp4")].rpartition("_")[0]
+        path = os.path.join(OUTPUT_DIR, name)
+        try:
+            if os.path.getmtime(path) >= cutoff:
+                continue
+            job = queue.get(job_id)
+            if job is None or job["state"] in (jobs.DONE, jobs.FAILED):
+                os.remove(path)
+                logger.info(f"Deleted expired video {path}")
+        except OSError:
+            # Another worker process got to it first
+            pass
+
+def record_cost(job, render, output_path):
+    """Feeds a finished render to the render cost model (see cost_model.py)."""
+    import cost_model
+    params = job["params"]
+    try:
+        work = cost_model.render_work(params["config"], params.get("highlight_seconds"))
+        cost_model.CostModel().record(work, render.busy, time.monotonic() - render.started,
+                                      os.path.getsize(output_path),
+                                      profile=params["config"].get("profile", "standard"))
+    except Exception as e:
+        # Calibration data is nice to have; the job itself succeeded
+        logger.warning(f"Could not record the render cost of job {job['id']}: {e}")
+
+def job_result(job, result):
+    """A job's result, with what admission control downgraded to render it (see main.admit)."""
+    quality = job["params"].get("quality")
+    if quality:
+        result["quality"] = quality
+    return result
+
+def finish_job(queue, job_id, worker_id, heartbeat, result):
+    heartbeat.stop()
+    if heartbeat.lost or not queue.complete(job_id, worker_id, result):
+        logger.warning(f"Job {job_id} finished after its lease was lost; result discarded: {result}")
+        return
+    logger.info(f"Job {job_id} done: {result}")
+
+def run_job(queue, job, worker_id, lease_seconds):
+    """
+    Renders a claimed job and hands its upload to the upload scheduler, which
+    finishes the job when the upload is done; the worker moves on to the next
+    render meanwhile. A job that already has an output_path was rendered by
+    an earlier attempt and only needs uploading.
+    """
+    import dodger
+    job_id = job["id"]
+    params = job["params"]
+    progress = JobProgress(queue, job_id, worker_id)
+    heartbeat = Heartbeat(queue, job_id, worker_id, lease_seconds).start()
+    try:
+        output_path = job["output_path"]
+        if not (output_path and os.path.exists(output_path)):
+            render = dodger.RenderProgress(callback=progress.report)
+
+            def wedged(reason):
+                logger.critical(f"Render of job {job_id} did not stop after it was cancelled; exiting")
+                queue.fail(job_id, worker_id, reason)
+                os._exit(1)
+
+            watchdog = Watchdog(render, STALL_SECONDS, wedged).start()
+            try:
+                output_path = render_job(job, render)
+            finally:
+                watchdog.stop()
+            record_cost(job, render, output_path)
+
+        if job["kind"] == "generate":
+            # Kept for download until sweep_outputs expires it
+            finish_job(queue, job_id, worker_id, heartbeat, job_result(job, {"output_path": output_path}))
+            return
+        if not queue.set_state(job_id, worker_id, jobs.UPLOADING, output_path=output_path):
+            heartbeat.stop()
+            logger.warning(f"Job {job_id} was taken over during the render; dropping {output_path}")
+            os.remove(output_path)
+            return
+        progress.report({"stage": "upload_queued", "bytes_sent": 0,
+                         "total_bytes": os.path.getsize(output_path)})
+        future = upload_scheduler.submit_video_upload(
+            output_path,
+            title=params.get("title"),
+            description=params.get("description"),
+            privacy_status=params.get("privacy_status"),
+            priority=params.get("priority", 0),
+            progress=progress.upload
+        )
+    except Exception:
+        heartbeat.stop()
+        raise
+
+    def uploaded(future):
+        try:
+            result = job_result(job, upload_scheduler.upload_result(future.result()))
+        except Exception as e:
+            heartbeat.stop()
+            logger.error(f"Upload of job {job_id} failed: {e}")
+            queue.fail(job_id, worker_id, e)
+            return
+        try:
+            os.remove(output_path)
+        except OSError as e:
+            logger.warning(f"Could not delete {output_path}: {e}")
+        finish_job(queue, job_id, worker_id, heartbeat, result)
+    future.add_done_callback(uploaded)
+
+def run_worker(db_path=None, worker_id=None, poll_interval=2.0, lease_seconds=None, max_jobs=None):
+    """
+    Claims and runs jobs until max_jobs have been run (forever by default),
+    polling the queue every poll_interval seconds while it is empty.
+    """
+    queue = jobs.JobQueue(db_path)
+    worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+    lease_seconds = lease_seconds or jobs.LEASE_SECONDS
+    logger.info(f"Worker {worker_id} polling {queue.path}")
+    scheduler = upload_scheduler.get_scheduler()
+    done = 0
+    last_sweep = 0
+    while max_jobs is None or done < max_jobs:
+        if time.time() - last_sweep >= SWEEP_INTERVAL:
+            sweep_outputs(queue)
+            last_sweep = time.time()
+        # Keep rendering while uploads drain, but not without limit (e.g. while the quota is spent)
+        if scheduler.backlog() >= UPLOAD_BACKLOG:
+            time.sleep(poll_interval)
+            continue
+        job = queue.claim(worker_id, lease_seconds)
+        if job is None:
+            time.sleep(poll_interval)
+            continue
+        try:
+            run_job(queue, job, worker_id, lease_seconds)
+        except Exception as e:
+            logger.error(f"Job {job['id']} failed: {e}", exc_info=True)
+            queue.fail(job["id"], worker_id, e)
+        done += 1
+    if max_jobs is not None:
+        import renderer
+        renderer.shutdown()
+        upload_scheduler.shutdown()
+
+def _worker_process(db_path, poll_interval):
+    logging.basicConfig(level=logging.INFO)
+    run_worker(db_path, poll_interval=poll_interval)
+
+def main():
+    parser = argparse.ArgumentParser(description="Run dodger job workers.")
+    parser.add_argument("--processes", type=int, default=1, help="Worker processes on this host")
+    parser.add_argument("--db", default=None, help="Queue database (default: JOBS_DB_PATH or jobs.db)")
+    parser.add_argument("--poll-interval", type=float, default=2.0)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO)
+    if args.db:
+        # The upload quota ledger lives in the same database
+        os.environ["JOBS_DB_PATH"] = args.db
+
+    # Each worker gets a fresh interpreter; pygame and FFmpeg pipes don't mix well with fork
+    ctx = multiprocessing.get_context("spawn")
+    def start():
+        p = ctx.Process(target=_worker_process, args=(args.db, args.poll_interval), daemon=True)
+        p.start()
+        return p
+
+    procs = [start() for _ in range(args.processes)]
+    try:
+        while True:
+            time.sleep(5)
+            for i, p in enumerate(procs):
+                if not p.is_alive():
+                    # Its job (if any) is requeued once the lease runs out
+                    logger.warning(f"Worker process {p.pid} exited with {p.exitcode}; restarting")
+                    procs[i] = start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        for p in procs:
+            p.terminate()
+        for p in procs:
+            p.join()
+
+if __name__ == "__main__":
+    main()
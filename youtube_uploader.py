@@ -1,4 +1,5 @@
 import os
+import json
 import time
 import logging
 from dotenv import load_dotenv
@@ -14,7 +15,19 @@ logger = logging.getLogger("app.uploader")
 def get_youtube_client():
     """
     Builds the YouTube API client using environment variables.
+    Set YOUTUBE_API_ENDPOINT to send requests to another server
+    (e.g. fake_youtube.py) instead of Google, without credentials.
     """
+    endpoint = os.environ.get("YOUTUBE_API_ENDPOINT")
+    if endpoint:
+        # client_options api_endpoint keeps https for media uploads, so rewrite the root instead
+        from google.auth.credentials import AnonymousCredentials
+        from googleapiclient.discovery import build_from_document
+        from googleapiclient.discovery_cache import get_static_doc
+        doc = json.loads(get_static_doc("youtube", "v3"))
+        doc["rootUrl"] = endpoint.rstrip("/") + "/"
+        return build_from_document(doc, credentials=AnonymousCredentials())
+
     refresh_token = os.environ.get("YT_REFRESH_TOKEN")
     client_id = os.environ.get("YT_CLIENT_ID")
     client_secret = os.environ.get("YT_CLIENT_SECRET")
@@ -34,9 +47,11 @@ def get_youtube_client():
     
     return build("youtube", "v3", credentials=creds, cache_discovery=False)
 
-def upload_video(file_path: str, title: str, description: str, tags: list = None, privacy_status: str = "public"):
+def upload_video(file_path: str, title: str, description: str, tags: list = None, privacy_status: str = "public",
+                 progress=None):
     """
     Uploads the specified video file to YouTube.
+    progress, if given, is called as progress(bytes_sent, total_bytes) after each chunk.
     """
     youtube = get_youtube_client()
     
@@ -76,6 +91,8 @@ def upload_video(file_path: str, title: str, description: str, tags: list = None
             status, response = request.next_chunk()
             if status:
                 logger.info(f"Upload progress: {int(status.progress() * 100)}%")
+                if progress:
+                    progress(status.resumable_progress, status.total_size)
         except Exception as e:
             retry_count += 1
             if retry_count >= max_retries:
@@ -91,5 +108,8 @@ def upload_video(file_path: str, title: str, description: str, tags: list = None
     if not video_id:
         raise Exception("YouTube upload failed: No video ID in response")
     
+    if progress:
+        size = os.path.getsize(file_path)
+        progress(size, size)
     logger.info(f"Upload Complete! Video ID: {video_id}")
     return video_id
\ No newline at end of file